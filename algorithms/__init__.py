@@ -1,15 +1,79 @@
-from .euler_cycle import find_euler_cycle
-from .gamilton import make_way
-from .graph_painting import is_bipartite, three_coloring
-from .isomorphism import are_isomorphic
-from .read_graph_from_csv import read_graph_from_csv_to_dict, read_graph_from_csv_to_set
-
-__all__ = [
-    'find_euler_cycle',
-    'make_way',
-    'is_bipartite',
-    'three_coloring',
-    'are_isomorphic',
-    'read_graph_from_csv_to_dict',
-    'read_graph_from_csv_to_set',
-]
+'''
+Graph algorithms on adjacency dicts and CSR graphs.
+
+Submodules are imported on first use of one of their names (module
+__getattr__), so `import algorithms` stays cheap and a command only pays
+for the algorithms it runs.
+'''
+import importlib
+
+# public name -> submodule that defines it
+_EXPORTS = {
+    'expand_inputs': 'batch',
+    'run_batch': 'batch',
+    'Budget': 'budget',
+    'CancellationToken': 'budget',
+    'SearchUnknown': 'budget',
+    'CSRGraph': 'csr_graph',
+    'LabelTable': 'csr_graph',
+    'as_csr': 'csr_graph',
+    'component_subgraphs': 'components',
+    'map_components': 'components',
+    'convert_csv_to_binary': 'binary_graph',
+    'is_binary_graph_file': 'binary_graph',
+    'load_binary_graph': 'binary_graph',
+    'write_binary_graph': 'binary_graph',
+    'DynamicGraph': 'dynamic_graph',
+    'find_euler_cycle': 'euler_cycle',
+    'find_euler_path': 'euler_cycle',
+    'find_postman_tour': 'euler_cycle',
+    'iter_euler_cycle': 'euler_cycle',
+    'write_euler_cycle': 'euler_cycle',
+    'read_euler_cycle': 'euler_cycle',
+    'make_way': 'gamilton',
+    'hamiltonian_search': 'gamilton',
+    'held_karp': 'gamilton',
+    'choose_method': 'gamilton',
+    'is_biconnected': 'gamilton',
+    'is_bipartite': 'graph_painting',
+    'BipartiteResult': 'graph_painting',
+    'three_coloring': 'graph_painting',
+    'k_coloring': 'graph_painting',
+    'chromatic_number': 'graph_painting',
+    'labeled_coloring': 'graph_painting',
+    'greedy_coloring': 'graph_painting',
+    'are_isomorphic': 'isomorphism',
+    'find_isomorphism': 'isomorphism',
+    'graph_fingerprint': 'isomorphism',
+    'FingerprintIndex': 'isomorphism_index',
+    'Profile': 'profiling',
+    'ResultCache': 'result_cache',
+    'graph_digest': 'result_cache',
+    'SolverService': 'service',
+    'BFSForest': 'traversal',
+    'bfs_forest': 'traversal',
+    'connected_components': 'traversal',
+    'articulation_points': 'traversal',
+    'Graph': 'read_graph_from_csv',
+    'parse_graph_lines': 'read_graph_from_csv',
+    'read_graph_from_csv': 'read_graph_from_csv',
+    'read_graph_from_csv_parallel': 'read_graph_from_csv',
+    'read_graph_from_csv_to_csr': 'read_graph_from_csv',
+    'read_graph_from_csv_to_dict': 'read_graph_from_csv',
+    'read_graph_from_csv_to_set': 'read_graph_from_csv',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value      # later lookups do not come here
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,353 @@
+'''Running actions over many graph files in a process pool'''
+import glob
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import time
+from collections import deque
+
+import numpy as np
+
+from .binary_graph import is_binary_graph_file, load_binary_graph
+from .budget import Budget, SearchUnknown
+from .read_graph_from_csv import read_graph_from_csv
+
+# actions that run_batch knows, in the order they are run for one file
+ACTIONS = ('euler', 'hamilton', 'bipartite', 'coloring', 'chromatic')
+# files sent to a worker at once
+DEFAULT_CHUNKSIZE = 16
+# seconds a file may take beyond the timeouts of its actions (loading, the polynomial actions)
+FILE_TIMEOUT_GRACE = 30.0
+
+
+def expand_inputs(source: str) -> list[str]:
+    '''
+    Graph files of a batch: every file of a directory, the files matched
+    by a glob pattern, a single graph file (.csv or binary), or the paths
+    listed in a manifest file (any other file: one path per line,
+    relative to the manifest, empty lines and # comments skipped).
+
+    >>> import tempfile
+    >>> directory = tempfile.mkdtemp()
+    >>> for name in ('b.csv', 'a.csv'):
+    ...     _ = open(os.path.join(directory, name), 'w').write('A,B\\n')
+    >>> [os.path.basename(path) for path in expand_inputs(directory)]
+    ['a.csv', 'b.csv']
+    >>> manifest = os.path.join(directory, 'graphs.txt')
+    >>> _ = open(manifest, 'w').write('# nightly\\nb.csv\\n')
+    >>> [os.path.basename(path) for path in expand_inputs(manifest)]
+    ['b.csv']
+    >>> [os.path.basename(path) for path in expand_inputs(os.path.join(directory, 'a.csv'))]
+    ['a.csv']
+    '''
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name) for name in os.listdir(source)
+                      if os.path.isfile(os.path.join(source, name)))
+    if os.path.isfile(source):
+        if source.lower().endswith('.csv') or is_binary_graph_file(source):
+            return [source]
+        base = os.path.dirname(source)
+        with open(source, 'r', encoding='utf-8') as file:
+            return [os.path.join(base, line.strip()) for line in file
+                    if line.strip() and not line.lstrip().startswith('#')]
+    return sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+
+
+def run_batch(paths, output: str, actions=ACTIONS, oriented: bool = False,
+              multigraph: bool = False, timeout: float | None = None,
+              max_steps: int | None = None, workers: int | None = None,
+              chunksize: int = DEFAULT_CHUNKSIZE, file_timeout: float | None = None) -> dict:
+    '''
+    Runs the actions on every graph file in a ProcessPoolExecutor and
+    writes one JSON object per file to output (JSON Lines), in the order
+    of paths, as soon as it is ready.
+
+    Workers are started once (one per core by default) and get the files
+    in chunks of chunksize, so the interpreter start and the imports are
+    paid once per worker, not once per graph. timeout and max_steps make
+    a Budget for every exponential action (hamilton, coloring, chromatic)
+    of every file: a search that runs out of it is reported with status
+    "unknown" and the batch goes on.
+
+    The Budget is cooperative: only the searches look at it, so it does
+    not stop euler, bipartite or a worker stuck elsewhere. file_timeout
+    (by default, with timeout, the timeouts of all actions plus
+    FILE_TIMEOUT_GRACE) is a hard limit for a whole file: files are then
+    sent one by one, and a file over its limit is reported as an error,
+    its worker is killed and the pool is started again.
+
+    A worker that dies (e.g. killed by the system for memory) breaks the
+    whole pool. The pool is started again as well, and the files that
+    were running are sent again one at a time: only a file that kills a
+    worker on its own is reported as an error.
+
+    Returns the number of files per status ('ok' or 'error').
+
+    >>> import tempfile
+    >>> directory = tempfile.mkdtemp()
+    >>> _ = open(os.path.join(directory, 'triangle.csv'), 'w').write('A,B\\nB,C\\nC,A\\n')
+    >>> _ = open(os.path.join(directory, 'broken.csv'), 'w').write('A,B,C\\n')
+    >>> output = os.path.join(directory, 'results.jsonl')
+    >>> run_batch(expand_inputs(os.path.join(directory, '*.csv')), output,
+    ...           actions=('euler', 'bipartite'), workers=1)
+    {'ok': 1, 'error': 1}
+    >>> [json.loads(line)['status'] for line in open(output)]
+    ['error', 'ok']
+    >>> bipartite = json.loads(open(output).readlines()[1])['results']['bipartite']
+    >>> bipartite['status'], bipartite['result'], bipartite['odd_cycle']
+    ('ok', False, ['B', 'A', 'C', 'B'])
+    '''
+    unknown = [action for action in actions if action not in ACTIONS]
+    if unknown:
+        raise ValueError(f'Невідомі дії: {", ".join(unknown)}')
+    options = (tuple(actions), oriented, multigraph, timeout, max_steps)
+    if file_timeout is None and timeout is not None:
+        file_timeout = timeout * len(actions) + FILE_TIMEOUT_GRACE
+    counts = {'ok': 0, 'error': 0}
+
+    with open(output, 'w', encoding='utf-8') as file:
+        for record in _run_in_pool(paths, options, workers, chunksize, file_timeout):
+            counts[record['status']] += 1
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return counts
+
+
+def _run_in_pool(paths, options, workers: int | None, chunksize: int,
+                 file_timeout: float | None):
+    '''
+    Records of run_batch, in the order of paths. At most one chunk per
+    worker is in flight, so a chunk starts running when it is sent; with
+    file_timeout every chunk is one file, and its limit is counted from
+    then. After a broken pool only one file is in flight until the files
+    that were running in it are done.
+    '''
+    from concurrent.futures import FIRST_COMPLETED, wait
+    from concurrent.futures.process import BrokenProcessPool
+
+    workers = workers or os.cpu_count()
+    if file_timeout is not None:
+        chunksize = 1
+    items = enumerate(paths)
+    pending = iter(lambda: list(itertools.islice(items, chunksize)), [])
+    retry = deque()     # (index, path) of the files of a broken pool
+    running = {}        # future -> (chunk, start)
+    ready = {}          # index -> record, until the records before it are written
+    written = 0
+    pool = _WorkerPool(workers)
+
+    def send(chunk):
+        future = pool.submit(_run_files, ([path for _, path in chunk], options))
+        running[future] = (chunk, time.monotonic())
+
+    try:
+        while True:
+            while len(running) < (1 if retry else workers):
+                chunk = [retry.popleft()] if retry else next(pending, None)
+                if chunk is None:
+                    break
+                try:
+                    send(chunk)
+                except BrokenProcessPool:
+                    # an idle worker died; the running files fail below and restart the pool
+                    retry.extendleft(reversed(chunk))
+                    if running:
+                        break
+                    pool.close(kill=False)
+                    pool = _WorkerPool(workers)
+            if not running:
+                break
+
+            deadline = None
+            if file_timeout is not None:
+                first_start = min(start for _, start in running.values())
+                deadline = max(0.0, first_start + file_timeout - time.monotonic())
+            done, _ = wait(running, timeout=deadline, return_when=FIRST_COMPLETED)
+            if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+                # the pool fails every future that is left, so they are all collected
+                done = set(running)
+                wait(done)
+
+            broken = []
+            for future in done:
+                chunk, _ = running.pop(future)
+                error = future.exception()
+                if isinstance(error, BrokenProcessPool):
+                    broken.extend(chunk)
+                elif error is not None:
+                    for index, path in chunk:
+                        ready[index] = {'file': path, 'status': 'error',
+                                        'error': f'{type(error).__name__}: {error}'}
+                else:
+                    for (index, _), record in zip(chunk, future.result()):
+                        ready[index] = record
+            if broken:
+                if len(broken) == 1:
+                    # it was alone in the pool, so this file killed its worker
+                    index, path = broken[0]
+                    ready[index] = {'file': path, 'status': 'error',
+                                    'error': 'Процес, що обробляв файл, аварійно завершився'}
+                else:
+                    retry.extend(sorted(broken))
+                pool.close(kill=False)      # its workers are already stopped
+                pool = _WorkerPool(workers)
+
+            expired = []
+            if file_timeout is not None:
+                now = time.monotonic()
+                expired = [future for future, (_, start) in running.items()
+                           if now - start >= file_timeout]
+            if expired:
+                for future in expired:
+                    [(index, path)], _ = running.pop(future)
+                    ready[index] = {'file': path, 'status': 'error',
+                                    'error': f'Перевищено час на файл: {file_timeout} с'}
+                # a worker cannot be stopped in place: the pool is replaced, and the
+                # files that were still running in it are sent again
+                pool.close()
+                pool = _WorkerPool(workers)
+                restart = [chunk for chunk, _ in running.values()]
+                running.clear()
+                for chunk in restart:
+                    send(chunk)
+
+            while written in ready:
+                yield ready.pop(written)
+                written += 1
+    finally:
+        pool.close()
+
+
+class _WorkerPool:
+    '''
+    ProcessPoolExecutor whose workers record their pids (through the
+    initializer), so that close() can kill the busy ones: the executor
+    has no public way to do it before Python 3.14.
+    '''
+
+    def __init__(self, workers: int):
+        self.pids = multiprocessing.Array('l', workers)
+        from concurrent.futures import ProcessPoolExecutor     # main.py imports batch for one file too
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_record_pid,
+                                            initargs=(self.pids,))
+
+    def submit(self, function, *args):
+        return self.executor.submit(function, *args)
+
+    def close(self, kill: bool = True) -> None:
+        '''
+        Shuts the pool down without waiting for the files its workers are
+        running. kill=False is for a broken pool, whose workers the
+        executor has already stopped (their pids may be reused).
+        '''
+        if kill:
+            with self.pids.get_lock():
+                pids = [pid for pid in self.pids if pid]
+            for pid in pids:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except OSError:     # the worker has exited already
+                    pass
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _record_pid(pids) -> None:
+    '''Initializer of the workers of _WorkerPool: stores the pid in a free slot.'''
+    with pids.get_lock():
+        slot = list(pids).index(0)
+        pids[slot] = os.getpid()
+
+
+def _run_files(task) -> list[dict]:
+    '''Records of a chunk of files (in a worker process).'''
+    paths, options = task
+    return [_run_file((path, options)) for path in paths]
+
+
+def _run_file(task) -> dict:
+    '''Loads one graph and runs the actions on it (in a worker process).'''
+    path, (actions, oriented, multigraph, timeout, max_steps) = task
+    started = time.perf_counter()
+    try:
+        if is_binary_graph_file(path):
+            graph = load_binary_graph(path)
+            oriented = graph.oriented
+        else:
+            graph = read_graph_from_csv(path, 'directed' if oriented else 'undirected',
+                                        multigraph)
+    except (OSError, ValueError) as error:
+        return {'file': path, 'status': 'error', 'error': str(error)}
+
+    results = {}
+    for action in actions:
+        budget = None
+        if timeout is not None or max_steps is not None:
+            budget = Budget(timeout=timeout, max_steps=max_steps)
+        action_started = time.perf_counter()
+        try:
+            results[action] = run_action(action, graph, oriented, budget)
+        except Exception as error:      # one bad graph must not stop the batch
+            results[action] = {'status': 'error', 'error': f'{type(error).__name__}: {error}'}
+        results[action]['seconds'] = round(time.perf_counter() - action_started, 6)
+    return {'file': path, 'status': 'ok', 'results': results,
+            'seconds': round(time.perf_counter() - started, 6)}
+
+
+def run_action(action: str, graph, oriented: bool, budget) -> dict:
+    '''
+    Result of one of ACTIONS on a graph as a JSON-ready dict with 'status'
+    ('ok', or 'unknown' if the budget ran out) and the result, in the
+    format of the batch output; the service runs its jobs with it too.
+    Nodes are named by their labels.
+
+    >>> run_action('chromatic', {'A': ['B'], 'B': ['C']}, False, None)
+    {'status': 'ok', 'result': [2, {'A': 0, 'B': 1, 'C': 0}]}
+    '''
+    # the algorithms are imported in the workers, on their first graph
+    from .euler_cycle import find_euler_cycle
+    from .gamilton import make_way
+    from .graph_painting import chromatic_number, is_bipartite, labeled_coloring, three_coloring
+
+    if action == 'euler':
+        result = find_euler_cycle(graph, oriented=oriented)
+    elif action == 'hamilton':
+        result = make_way(graph, budget=budget)
+    elif action == 'bipartite':
+        result = is_bipartite(graph)
+        if result:
+            return {'status': 'ok', 'result': True, 'parts': jsonable(result.parts)}
+        return {'status': 'ok', 'result': False, 'odd_cycle': jsonable(result.odd_cycle)}
+    elif action == 'coloring':
+        result = three_coloring(graph, budget=budget)
+    else:
+        # node ids mean nothing outside this process: colors go by label
+        result = labeled_coloring(graph, chromatic_number(graph, budget=budget))
+
+    if isinstance(result, SearchUnknown):
+        return {'status': 'unknown', 'reason': result.reason,
+                'nodes_expanded': result.nodes_expanded, 'partial': jsonable(result.partial)}
+    return {'status': 'ok', 'result': jsonable(result)}
+
+
+def jsonable(value):
+    '''
+    Converts tuples and NumPy values of the results to JSON types.
+
+    >>> jsonable({'result': (np.int64(2), {1: np.array([0, 1])})})
+    {'result': [2, {'1': [0, 1]}]}
+    '''
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): jsonable(item) for key, item in value.items()}
+    return value
+
+
+if __name__ == '__main__':
+    import doctest
+    print(doctest.testmod())
@@ -0,0 +1,162 @@
+'''Memory-mapped binary graph format'''
+import mmap
+import struct
+from collections.abc import Sequence
+
+import numpy as np
+
+from .csr_graph import CSRGraph, LabelTable
+from .read_graph_from_csv import read_graph_from_csv_parallel
+
+# File layout (little-endian, every section starts at a multiple of 8 bytes):
+#   header          MAGIC, version, flags, id size, nodes, arcs and section offsets
+#   label offsets   uint64[nodes + 1], byte ranges of the labels in the blob
+#   label blob      UTF-8 labels written one after another
+#   offsets         int64[nodes + 1], CSR row offsets
+#   neighbors       int32 or int64 [arcs], CSR neighbor ids
+MAGIC = b'GRAPHCSR'
+VERSION = 1
+FLAG_ORIENTED = 1
+_HEADER = struct.Struct('<8sIIIQQQQQQ')
+
+
+class MappedLabels(Sequence):
+    '''
+    Node labels read from a memory-mapped file on demand.
+    Nothing is decoded until a label is asked for.
+    '''
+    def __init__(self, buffer, positions: np.ndarray, blob_start: int):
+        self._buffer = buffer
+        self._positions = positions
+        self._blob_start = blob_start
+
+    def __len__(self):
+        return len(self._positions) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('label index out of range')
+        start = self._blob_start + int(self._positions[index])
+        end = self._blob_start + int(self._positions[index + 1])
+        return self._buffer[start:end].decode('utf-8')
+
+
+class MappedCSRGraph(CSRGraph):
+    '''
+    CSRGraph whose arrays live in a memory-mapped file. The pages are shared
+    read-only by every process that opens the same file, and pickling it
+    only sends the path, so worker processes map the file themselves.
+    '''
+    __slots__ = ('path', 'oriented')
+
+    def __reduce__(self):
+        return load_binary_graph, (self.path,)
+
+
+def _align(position: int) -> int:
+    return (position + 7) // 8 * 8
+
+
+def write_binary_graph(graph: CSRGraph, filename: str, oriented: bool = False) -> None:
+    '''
+    Writes a CSRGraph to the binary format. Labels are stored as strings.
+
+    >>> import os, tempfile
+    >>> graph = CSRGraph.from_dict({'A': ['B'], 'B': ['C'], 'C': ['A']})
+    >>> path = os.path.join(tempfile.mkdtemp(), 'graph.bin')
+    >>> write_binary_graph(graph, path, oriented=True)
+    >>> loaded = load_binary_graph(path)
+    >>> loaded.to_dict(), loaded.oriented
+    ({'A': ['B'], 'B': ['C'], 'C': ['A']}, True)
+    >>> is_binary_graph_file(path)
+    True
+    '''
+    encoded = [str(label).encode('utf-8') for label in graph.labels]
+    positions = np.zeros(len(encoded) + 1, dtype='<u8')
+    np.cumsum([len(label) for label in encoded], out=positions[1:])
+    offsets = np.asarray(graph.offsets, dtype='<i8')
+    id_size = graph.neighbors.dtype.itemsize if graph.neighbors.dtype.kind == 'i' else 8
+    neighbors = np.asarray(graph.neighbors, dtype=f'<i{id_size}')
+
+    positions_start = _align(_HEADER.size)
+    blob_start = positions_start + positions.nbytes
+    offsets_start = _align(blob_start + int(positions[-1]))
+    neighbors_start = _align(offsets_start + offsets.nbytes)
+
+    header = _HEADER.pack(MAGIC, VERSION, FLAG_ORIENTED if oriented else 0, id_size,
+                          len(graph), graph.num_arcs, positions_start, blob_start,
+                          offsets_start, neighbors_start)
+    with open(filename, 'wb') as file:
+        file.write(header)
+        file.write(b'\0' * (positions_start - file.tell()))
+        file.write(positions.tobytes())
+        for label in encoded:
+            file.write(label)
+        file.write(b'\0' * (offsets_start - file.tell()))
+        file.write(offsets.tobytes())
+        file.write(b'\0' * (neighbors_start - file.tell()))
+        file.write(neighbors.tobytes())
+
+
+def load_binary_graph(filename: str) -> MappedCSRGraph:
+    '''
+    Opens a binary graph file without reading it: the arrays are
+    numpy.memmap views and labels are decoded lazily, so opening takes
+    the same time for any graph size.
+
+    Raises:
+        ValueError: If the file is not in the binary graph format.
+    '''
+    with open(filename, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(buffer) < _HEADER.size:
+        raise ValueError(f'{filename}: не бінарний файл графу')
+    (magic, version, flags, id_size, num_nodes, num_arcs, positions_start,
+     blob_start, offsets_start, neighbors_start) = _HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{filename}: не бінарний файл графу')
+
+    positions = np.frombuffer(buffer, dtype='<u8', count=num_nodes + 1, offset=positions_start)
+    offsets = np.memmap(filename, dtype='<i8', mode='r', offset=offsets_start,
+                        shape=(num_nodes + 1,))
+    if num_arcs:
+        neighbors = np.memmap(filename, dtype=f'<i{id_size}', mode='r',
+                              offset=neighbors_start, shape=(num_arcs,))
+    else:
+        # numpy cannot map an empty range
+        neighbors = np.empty(0, dtype=f'<i{id_size}')
+
+    graph = MappedCSRGraph(offsets, neighbors,
+                           LabelTable(MappedLabels(buffer, positions, blob_start)))
+    graph.path = filename
+    graph.oriented = bool(flags & FLAG_ORIENTED)
+    return graph
+
+
+def is_binary_graph_file(filename: str) -> bool:
+    '''Checks the magic bytes at the start of a file.'''
+    with open(filename, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def convert_csv_to_binary(csv_filename: str, binary_filename: str,
+                          oriented: str = 'undirected', multigraph: bool = False,
+                          workers: int | None = None) -> MappedCSRGraph:
+    '''
+    Converts a 'NodeA,NodeB' CSV edge list to the binary format and
+    returns the memory-mapped result. With multigraph, repeated lines
+    are kept as parallel arcs. A large CSV is parsed in chunks by
+    workers processes (one per core by default).
+    '''
+    graph = read_graph_from_csv_parallel(csv_filename, oriented, multigraph, workers)
+    write_binary_graph(graph, binary_filename, oriented == 'directed')
+    return load_binary_graph(binary_filename)
+
+
+if __name__ == '__main__':
+    import doctest
+    print(doctest.testmod())
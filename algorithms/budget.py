@@ -0,0 +1,95 @@
+'''Time and step limits for exponential searches'''
+import threading
+import time
+from typing import Any, NamedTuple
+
+
+class SearchUnknown(NamedTuple):
+    '''
+    Result of a search that was stopped before it found an answer.
+
+    reason is 'timeout', 'max_steps' or 'cancelled'; partial is the best
+    partial answer seen (the longest path or the largest partial coloring).
+    '''
+    reason: str
+    nodes_expanded: int
+    max_depth: int
+    partial: Any
+
+
+class CancellationToken:
+    '''
+    Flag that another thread (or process, if event is a multiprocessing
+    Event) sets to ask a running search to stop.
+
+    >>> token = CancellationToken()
+    >>> token.cancelled
+    False
+    >>> token.cancel()
+    >>> token.cancelled
+    True
+    '''
+    __slots__ = ('_event',)
+
+    def __init__(self, event=None):
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self) -> None:
+        '''Asks the searches that use this token to stop.'''
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        '''True once cancel() was called.'''
+        return self._event.is_set()
+
+
+class Budget:
+    '''
+    Limits for one search: a wall-clock timeout in seconds, a maximum
+    number of node expansions and a cancellation token. Any of them may
+    be None. The search calls spend() on every expansion and stops once
+    it returns True.
+
+    >>> budget = Budget(max_steps=2)
+    >>> budget.spend(1), budget.spend(2), budget.spend(1)
+    (False, False, True)
+    >>> budget.unknown(['a', 'b'])
+    SearchUnknown(reason='max_steps', nodes_expanded=3, max_depth=2, partial=['a', 'b'])
+    '''
+    # the clock and the token are looked at once per this many expansions
+    CHECK_INTERVAL = 256
+
+    def __init__(self, timeout: float | None = None, max_steps: int | None = None,
+                 token: CancellationToken | None = None):
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.max_steps = max_steps
+        self.token = token
+        self.steps = 0
+        self.max_depth = 0
+        self.reason = None
+
+    def spend(self, depth: int = 0, steps: int = 1) -> bool:
+        '''Counts expansions at the given depth. Returns True if the search must stop.'''
+        self.steps += steps
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if self.reason is not None:
+            return True
+        if self.max_steps is not None and self.steps > self.max_steps:
+            self.reason = 'max_steps'
+        elif steps > 1 or self.steps % self.CHECK_INTERVAL == 0:
+            if self.token is not None and self.token.cancelled:
+                self.reason = 'cancelled'
+            elif self.deadline is not None and time.monotonic() > self.deadline:
+                self.reason = 'timeout'
+        return self.reason is not None
+
+    def unknown(self, partial=None) -> SearchUnknown:
+        '''The "unknown" result with the statistics collected so far.'''
+        return SearchUnknown(self.reason, self.steps, self.max_depth, partial)
+
+
+if __name__ == '__main__':
+    import doctest
+    print(doctest.testmod())
@@ -0,0 +1,59 @@
+'''Splitting a graph into connected components and solving them in parallel'''
+import numpy as np
+
+from .csr_graph import CSRGraph
+from .traversal import bfs_forest
+
+# components sent to a worker at once
+COMPONENT_CHUNKSIZE = 64
+
+
+def component_subgraphs(graph: CSRGraph) -> list[CSRGraph]:
+    '''
+    Induced subgraph of every connected component of an undirected graph
+    (pass graph.undirected() otherwise), in order of the smallest node.
+    The labels of a subgraph are the node ids of graph, in increasing
+    order, so results map back with subgraph.labels.
+
+    >>> graph = CSRGraph.from_dict({0: [2], 1: [3], 2: [0], 3: [1]})
+    >>> [part.labels for part in component_subgraphs(graph)]
+    [[0, 2], [1, 3]]
+    >>> component_subgraphs(graph)[1].to_dict()
+    {1: [3], 3: [1]}
+    '''
+    forest = bfs_forest(graph)
+    position = np.empty(len(graph), dtype=np.int64)
+    parts = []
+    for nodes in forest.component_nodes():
+        nodes = np.sort(nodes)
+        position[nodes] = np.arange(len(nodes))
+        starts, ends = graph.offsets[nodes], graph.offsets[nodes + 1]
+        degrees = ends - starts
+        offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=offsets[1:])
+        arcs = np.repeat(starts - offsets[:-1], degrees) + np.arange(offsets[-1])
+        parts.append(CSRGraph(offsets, position[graph.neighbors[arcs]].astype(graph.neighbors.dtype),
+                              nodes.tolist()))
+    return parts
+
+
+def map_components(function, parts: list, workers: int | None = None,
+                   chunksize: int = COMPONENT_CHUNKSIZE) -> list:
+    '''
+    function(part) for every part, in a ProcessPoolExecutor with workers
+    processes (None: one per core) when there is more than one part.
+    function must be a module-level function so that it can be pickled.
+
+    >>> map_components(len, [[1], [1, 2]], workers=1)
+    [1, 2]
+    '''
+    if workers == 1 or len(parts) < 2:
+        return [function(part) for part in parts]
+    from concurrent.futures import ProcessPoolExecutor     # only a parallel run needs it
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, parts, chunksize=chunksize))
+
+
+if __name__ == '__main__':
+    import doctest
+    print(doctest.testmod())
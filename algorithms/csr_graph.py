@@ -0,0 +1,256 @@
+'''Compact integer-indexed graph in compressed sparse row (CSR) form'''
+from array import array
+from collections import Counter
+from collections.abc import Sequence
+
+import numpy as np
+
+from . import profiling
+
+
+class LabelTable:
+    '''
+    Interning table between node labels and dense integer ids 0..n-1.
+
+    >>> table = LabelTable()
+    >>> table.intern('A'), table.intern('B'), table.intern('A')
+    (0, 1, 0)
+    >>> table[1], table.id_of('B'), len(table)
+    ('B', 1, 2)
+    '''
+    __slots__ = ('labels', '_ids')
+
+    def __init__(self, labels=()):
+        # read-only sequences (e.g. labels of a memory-mapped file) are kept as is
+        self.labels = labels if isinstance(labels, Sequence) else list(labels)
+        self._ids = None
+
+    @property
+    def ids(self) -> dict:
+        '''Label -> id dict, built on first use.'''
+        if self._ids is None:
+            self._ids = {label: i for i, label in enumerate(self.labels)}
+        return self._ids
+
+    def intern(self, label) -> int:
+        '''Returns the id of a label, adding the label if it is new.'''
+        ids = self.ids
+        node_id = ids.get(label)
+        if node_id is None:
+            if not isinstance(self.labels, list):
+                self.labels = list(self.labels)
+            node_id = ids[label] = len(self.labels)
+            self.labels.append(label)
+        return node_id
+
+    def id_of(self, label) -> int:
+        '''Returns the id of an existing label (KeyError otherwise).'''
+        return self.ids[label]
+
+    def __getitem__(self, node_id):
+        return self.labels[node_id]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __iter__(self):
+        return iter(self.labels)
+
+
+class CSRGraph:
+    '''
+    Graph stored as two flat integer arrays instead of a dict of sets.
+
+    The out-neighbors of node i are neighbors[offsets[i]:offsets[i + 1]].
+    An undirected graph keeps both arcs (u, v) and (v, u), exactly like
+    the adjacency dicts produced by the CSV readers.
+
+    >>> g = CSRGraph.from_dict({'A': ['B', 'C'], 'B': ['C']})
+    >>> len(g), g.num_arcs
+    (3, 3)
+    >>> list(g.neighbors_of(0)), g.degree(2)
+    ([1, 2], 0)
+    >>> g.to_dict()
+    {'A': ['B', 'C'], 'B': ['C'], 'C': []}
+    >>> g.transpose().to_dict()
+    {'A': [], 'B': ['A'], 'C': ['A', 'B']}
+    >>> g.undirected().to_dict()
+    {'A': ['B', 'C'], 'B': ['A', 'C'], 'C': ['A', 'B']}
+    '''
+    __slots__ = ('offsets', 'neighbors', 'table', '_offsets_view', '_neighbors_view')
+
+    def __init__(self, offsets, neighbors, labels=None):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.neighbors = np.asarray(neighbors)
+        if labels is None:
+            labels = range(len(self.offsets) - 1)
+        self.table = labels if isinstance(labels, LabelTable) else LabelTable(labels)
+        self._offsets_view = None
+        self._neighbors_view = None
+
+    @classmethod
+    def from_dict(cls, connections: dict) -> 'CSRGraph':
+        '''
+        Builds a CSR graph from an adjacency dict. Node ids follow the key
+        order, then nodes that only appear as neighbors. Neighbor order is
+        the iteration order of each value. A Counter value (a multigraph)
+        gives every neighbor as many parallel arcs as its count.
+
+        >>> CSRGraph.from_dict({'A': Counter({'B': 2}), 'B': Counter()}).to_dict()
+        {'A': ['B', 'B'], 'B': []}
+        '''
+        table = LabelTable(connections)
+        intern = table.intern
+        offsets = array('q', [0])
+        neighbors = array('q')
+        for node in list(table.labels):
+            values = connections[node]
+            if isinstance(values, Counter):
+                values = values.elements()
+            neighbors.extend(intern(neighbor) for neighbor in values)
+            offsets.append(len(neighbors))
+        # nodes that were seen only as neighbors have no outgoing arcs
+        offsets.extend([len(neighbors)] * (len(table) + 1 - len(offsets)))
+        return cls(np.frombuffer(offsets, dtype=np.int64),
+                   _compact_ids(np.frombuffer(neighbors, dtype=np.int64), len(table)),
+                   table)
+
+    @classmethod
+    def from_arcs(cls, sources, targets, labels) -> 'CSRGraph':
+        '''
+        Builds a CSR graph from parallel arrays of arc ends (node ids).
+        Arcs keep their relative order within each source node.
+        '''
+        num_nodes = len(labels)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        order = np.argsort(sources, kind='stable')
+        offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=offsets[1:])
+        return cls(offsets, _compact_ids(targets[order], num_nodes), labels)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def labels(self):
+        '''Node labels indexed by id.'''
+        return self.table.labels
+
+    @property
+    def num_arcs(self) -> int:
+        '''Number of stored arcs (twice the edge count for undirected graphs).'''
+        return len(self.neighbors)
+
+    @property
+    def offsets_view(self) -> memoryview:
+        '''Offsets as a memoryview: indexing it yields plain ints quickly.'''
+        if self._offsets_view is None:
+            self._offsets_view = memoryview(np.ascontiguousarray(self.offsets))
+        return self._offsets_view
+
+    @property
+    def neighbors_view(self) -> memoryview:
+        '''Neighbors as a memoryview: indexing it yields plain ints quickly.'''
+        if self._neighbors_view is None:
+            self._neighbors_view = memoryview(np.ascontiguousarray(self.neighbors))
+        return self._neighbors_view
+
+    def neighbors_of(self, node_id: int) -> memoryview:
+        '''Out-neighbor ids of a node.'''
+        offsets = self.offsets_view
+        return self.neighbors_view[offsets[node_id]:offsets[node_id + 1]]
+
+    def degree(self, node_id: int) -> int:
+        '''Out-degree of a node.'''
+        offsets = self.offsets_view
+        return offsets[node_id + 1] - offsets[node_id]
+
+    def degrees(self) -> np.ndarray:
+        '''Out-degrees of all nodes.'''
+        return np.diff(self.offsets)
+
+    def sources(self) -> np.ndarray:
+        '''Source id of every arc, aligned with neighbors.'''
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.degrees())
+
+    def id_of(self, label) -> int:
+        '''Id of a node label.'''
+        return self.table.id_of(label)
+
+    def transpose(self) -> 'CSRGraph':
+        '''Graph with every arc reversed (in-neighbors become out-neighbors).'''
+        return CSRGraph.from_arcs(self.neighbors, self.sources(), self.table)
+
+    def undirected(self) -> 'CSRGraph':
+        '''
+        Underlying undirected graph: every arc in both directions, parallel
+        arcs merged. A self-loop is kept once.
+        '''
+        num_nodes = len(self)
+        sources, targets = self.sources(), self.neighbors.astype(np.int64)
+        keys = sorted_unique(np.concatenate((sources * num_nodes + targets,
+                                             targets * num_nodes + sources)))
+        return CSRGraph.from_arcs(keys // max(num_nodes, 1), keys % max(num_nodes, 1),
+                                  self.table)
+
+    def adjacency(self) -> list[list[int]]:
+        '''Out-neighbor id lists, for loops that index neighbors a lot.'''
+        offsets, neighbors = self.offsets_view, self.neighbors_view
+        return [neighbors[offsets[i]:offsets[i + 1]].tolist() for i in range(len(self))]
+
+    def to_dict(self) -> dict:
+        '''Adjacency dict with labels: node -> list of neighbor labels.'''
+        labels = self.labels
+        return {labels[i]: [labels[j] for j in neighbors]
+                for i, neighbors in enumerate(self.adjacency())}
+
+    def __repr__(self):
+        return f'CSRGraph(nodes={len(self)}, arcs={self.num_arcs})'
+
+
+def sorted_unique(keys: np.ndarray) -> np.ndarray:
+    '''
+    Sorted distinct values of an integer array, as np.unique(keys) but
+    with one sort: np.unique of large integer arrays is many times
+    slower in recent NumPy versions.
+
+    >>> sorted_unique(np.array([3, 1, 3, 2, 1])).tolist()
+    [1, 2, 3]
+    '''
+    keys = np.sort(keys)
+    if len(keys) < 2:
+        return keys
+    keep = np.empty(len(keys), dtype=bool)
+    keep[0] = True
+    np.not_equal(keys[1:], keys[:-1], out=keep[1:])
+    return keys[keep]
+
+
+def _compact_ids(ids: np.ndarray, num_nodes: int) -> np.ndarray:
+    '''Stores node ids as int32 when they fit.'''
+    if num_nodes < 2 ** 31:
+        return ids.astype(np.int32)
+    return ids
+
+
+def as_csr(graph) -> CSRGraph:
+    '''
+    Accepts any graph form used in the library and returns a CSRGraph:
+    a CSRGraph (returned as is), a (connections, edges) tuple or an
+    adjacency dict.
+
+    >>> as_csr(({'A': {'B'}, 'B': {'A'}}, {('A', 'B'), ('B', 'A')}))
+    CSRGraph(nodes=2, arcs=2)
+    '''
+    if isinstance(graph, CSRGraph):
+        return graph
+    if isinstance(graph, tuple):
+        graph = graph[0]
+    with profiling.phase('normalize'):
+        return CSRGraph.from_dict(graph)
+
+
+if __name__ == '__main__':
+    import doctest
+    print(doctest.testmod())
@@ -0,0 +1,276 @@
+'''Mutable graph that keeps its connected components and bipartiteness up to date'''
+from collections import Counter
+
+from .csr_graph import as_csr
+
+
+class DynamicGraph:
+    '''
+    Undirected (multi)graph with add_edge / remove_edge that answers "is
+    it bipartite?" and "are u and v connected?" without a new traversal.
+
+    Components are kept in a union-find with a parity bit: the parity of
+    a node is its side relative to the root of its component. An edge
+    between two components joins them (union by size) so that its ends
+    get different sides; an edge inside a component whose ends are on
+    the same side closes an odd cycle, and the component is marked
+    odd. The graph is bipartite while no component is odd, so
+    is_bipartite() is O(1) and an insertion is O(α(V)).
+
+    A deletion that removes the last copy of an edge recomputes only the
+    component of that edge with one BFS over its nodes: it may split in
+    two, and an odd component may become bipartite. remove_edges()
+    recomputes every affected component once for the whole batch.
+
+    As in is_bipartite, a directed graph is taken as its underlying
+    undirected graph, and a loop is an odd cycle.
+
+    >>> graph = DynamicGraph([(1, 2), (2, 3), (3, 4)])
+    >>> graph.is_bipartite(), graph.component_count
+    (True, 1)
+    >>> graph.add_edge(4, 1)          # even cycle
+    >>> graph.is_bipartite()
+    True
+    >>> graph.add_edge(1, 3)          # chord: triangles 1-2-3 and 1-3-4
+    >>> graph.is_bipartite()
+    False
+    >>> graph.remove_edge(1, 3)
+    >>> graph.is_bipartite(), graph.parts()
+    (True, ([1, 3], [2, 4]))
+    >>> graph.remove_edges([(2, 3), (4, 1)])
+    >>> graph.component_count, graph.connected(1, 2), graph.connected(1, 3)
+    (2, True, False)
+    '''
+
+    def __init__(self, edges=()):
+        self._adjacency = {}
+        self._parent = {}
+        self._parity = {}
+        self._members = {}      # root -> nodes of its component
+        self._odd = set()       # roots of the components with an odd cycle
+        self.num_edges = 0
+        self.add_edges(edges)
+
+    @classmethod
+    def from_graph(cls, graph) -> 'DynamicGraph':
+        '''
+        DynamicGraph of any graph form used in the library (an adjacency
+        dict, a (connections, edges) tuple or a CSRGraph). Parallel arcs
+        are merged, as in CSRGraph.undirected().
+
+        >>> graph = DynamicGraph.from_graph({'A': {'B'}, 'B': {'A'}, 'C': set()})
+        >>> graph.num_edges, graph.component_count
+        (1, 2)
+        '''
+        csr = as_csr(graph).undirected()
+        labels = csr.labels
+        dynamic = cls()
+        for node in labels:
+            dynamic.add_node(node)
+        sources = csr.sources().tolist()
+        dynamic.add_edges((labels[u], labels[v])
+                          for u, v in zip(sources, csr.neighbors.tolist()) if u <= v)
+        return dynamic
+
+    def __len__(self):
+        return len(self._adjacency)
+
+    def __contains__(self, node):
+        return node in self._adjacency
+
+    @property
+    def component_count(self) -> int:
+        '''Number of connected components.'''
+        return len(self._members)
+
+    def is_bipartite(self) -> bool:
+        '''True if no component has an odd cycle. O(1).'''
+        return not self._odd
+
+    def connected(self, node1, node2) -> bool:
+        '''True if both nodes are in the same component.'''
+        return self._find(node1)[0] == self._find(node2)[0]
+
+    def component(self, node) -> list:
+        '''Nodes of the component of node.'''
+        return list(self._members[self._find(node)[0]])
+
+    def components(self) -> list[list]:
+        '''Nodes of every component.'''
+        return [list(members) for members in self._members.values()]
+
+    def parts(self) -> tuple[list, list] | None:
+        '''
+        The two parts, as in is_bipartite (the side of the root of every
+        component comes first), or None if the graph is not bipartite.
+        '''
+        if self._odd:
+            return None
+        parts = ([], [])
+        for node in self._adjacency:
+            parts[self._find(node)[1]].append(node)
+        return parts
+
+    def to_dict(self) -> dict:
+        '''Adjacency dict node -> set of neighbors, for the other algorithms.'''
+        return {node: set(neighbors) for node, neighbors in self._adjacency.items()}
+
+    # updates
+
+    def add_node(self, node) -> None:
+        '''Adds an isolated node (nothing happens if it is already there).'''
+        if node not in self._adjacency:
+            self._adjacency[node] = Counter()
+            self._parent[node] = node
+            self._parity[node] = 0
+            self._members[node] = [node]
+
+    def add_edge(self, node1, node2) -> None:
+        '''Adds an edge (a parallel copy if it is already there). O(α(V)).'''
+        self.add_node(node1)
+        self.add_node(node2)
+        self._adjacency[node1][node2] += 1
+        if node1 != node2:
+            self._adjacency[node2][node1] += 1
+        self.num_edges += 1
+
+        root1, side1 = self._find(node1)
+        root2, side2 = self._find(node2)
+        if root1 == root2:
+            if side1 == side2:
+                self._odd.add(root1)
+            return
+        if len(self._members[root1]) < len(self._members[root2]):
+            root1, root2 = root2, root1
+        # the sides of node1 and node2 must differ once root2 hangs under root1
+        self._parent[root2] = root1
+        self._parity[root2] = side1 ^ side2 ^ 1
+        self._members[root1].extend(self._members.pop(root2))
+        if root2 in self._odd:
+            self._odd.discard(root2)
+            self._odd.add(root1)
+
+    def add_edges(self, edges) -> None:
+        '''Adds every (node1, node2) of edges.'''
+        for node1, node2 in edges:
+            self.add_edge(node1, node2)
+
+    def remove_edge(self, node1, node2) -> None:
+        '''
+        Removes one copy of an edge. If it was the last one, its component
+        is recomputed (O(size of the component)).
+
+        Raises:
+            ValueError: If there is no such edge.
+        '''
+        root = self._unlink(node1, node2)
+        if root is not None:
+            self._rebuild(root)
+
+    def remove_edges(self, edges) -> None:
+        '''
+        Removes every (node1, node2) of edges, recomputing each affected
+        component once. If an edge is missing, nothing is removed.
+
+        Raises:
+            ValueError: If the graph has fewer copies of an edge than the batch removes.
+
+        >>> graph = DynamicGraph([(1, 2), (2, 3)])
+        >>> graph.remove_edges([(1, 2), (5, 6)])
+        Traceback (most recent call last):
+        ...
+        ValueError: Немає ребра 5-6
+        >>> graph.num_edges, graph.connected(1, 3), graph.component_count
+        (2, True, 1)
+        '''
+        edges = list(edges)
+        # checked before anything is unlinked, so a failed batch changes nothing
+        wanted = Counter()
+        for node1, node2 in edges:
+            wanted[frozenset((node1, node2))] += 1
+            neighbors = self._adjacency.get(node1)
+            if neighbors is None or neighbors[node2] < wanted[frozenset((node1, node2))]:
+                raise ValueError(f'Немає ребра {node1}-{node2}')
+        roots = {self._unlink(node1, node2) for node1, node2 in edges}
+        roots.discard(None)
+        for root in roots:
+            self._rebuild(root)
+
+    def remove_node(self, node) -> None:
+        '''Removes a node with all its edges.'''
+        if node not in self._adjacency:
+            raise ValueError(f'Немає вершини {node}')
+        neighbors = self._adjacency[node]
+        self.remove_edges([(node, neighbor) for neighbor in list(neighbors.elements())
+                           if neighbor != node] + [(node, node)] * neighbors[node])
+        # isolated now, so the node is the root of a component of its own
+        del self._adjacency[node], self._parent[node], self._parity[node]
+        del self._members[node]
+        self._odd.discard(node)
+
+    def _unlink(self, node1, node2):
+        '''Removes the edge from the adjacency; the root to recompute, or None.'''
+        neighbors = self._adjacency.get(node1)
+        if neighbors is None or neighbors[node2] == 0:
+            raise ValueError(f'Немає ребра {node1}-{node2}')
+        self.num_edges -= 1
+        neighbors[node2] -= 1
+        if node1 != node2:
+            self._adjacency[node2][node1] -= 1
+        if neighbors[node2]:
+            return None         # a parallel copy keeps everything as it was
+        del neighbors[node2]
+        if node1 != node2:
+            del self._adjacency[node2][node1]
+        return self._find(node1)[0]
+
+    # union-find
+
+    def _find(self, node):
+        '''(root of node, side of node relative to the root), with path compression.'''
+        parent, parity = self._parent, self._parity
+        path = []
+        while parent[node] != node:
+            path.append(node)
+            node = parent[node]
+        side = 0
+        for item in reversed(path):
+            side ^= parity[item]
+            parity[item] = side
+            parent[item] = node
+        return node, parity[path[0]] if path else 0
+
+    def _rebuild(self, root) -> None:
+        '''Recomputes the components, sides and odd flags of the nodes of one component.'''
+        if root in self._members:
+            self._odd.discard(root)
+            self._rebuild_members(self._members.pop(root))
+
+    def _rebuild_members(self, members) -> None:
+        parent, parity, adjacency = self._parent, self._parity, self._adjacency
+        seen = set()
+        for start in members:
+            if start in seen:
+                continue
+            # BFS: the depth parity is the side; an edge inside a level is an odd cycle
+            seen.add(start)
+            parent[start], parity[start] = start, 0
+            group = [start]
+            odd = False
+            for node in group:
+                side = parity[node]
+                for neighbor in adjacency[node]:
+                    if neighbor not in seen:
+                        seen.add(neighbor)
+                        parent[neighbor], parity[neighbor] = start, side ^ 1
+                        group.append(neighbor)
+                    elif parity[neighbor] == side:
+                        odd = True
+            self._members[start] = group
+            if odd:
+                self._odd.add(start)
+
+
+if __name__ == '__main__':
+    import doctest
+    print(doctest.testmod())
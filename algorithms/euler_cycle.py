@@ -1,3 +1,24 @@
+import contextlib
+import os
+import struct
+import sys
+from array import array
+
+import numpy as np
+
+from . import profiling
+from .csr_graph import CSRGraph, as_csr
+
+# header of the binary cycle format: magic bytes and the size of one node id
+_CYCLE_MAGIC = b'EULERIDS'
+_CYCLE_HEADER = struct.Struct('<8sI')
+# nodes written to a file at once
+_CHUNK = 1 << 16
+# find_postman_tour pairs odd vertices over all their subsets (2^k memory)
+POSTMAN_MAX_ODD = 22
+
+
+@profiling.solve
 def find_euler_cycle(graph: tuple, oriented: bool = False):
     """
     An Eulerian cycle is a path in graph theory that visits every edge of a graph exactly once
@@ -16,10 +37,10 @@ def find_euler_cycle(graph: tuple, oriented: bool = False):
 
         Parameters:
             graph: tuple[dict[str, set[str]], set[tuple[str, str]]]
-            (connections, edges)
+            (connections, edges), or a CSRGraph
             oriented : bool
         Returns:
-            False : if Eulerian cycle is impossible.
+            None : if Eulerian cycle is impossible.
             list[str] : a list of edges in order of the path (cycle)
 
     Tests:
@@ -40,82 +61,508 @@ def find_euler_cycle(graph: tuple, oriented: bool = False):
     >>> graph_dir = ({'A': {'B'}, 'B': {'C'}, 'C': {'A'}}, {('A','B'), ('B','C'), ('C','A')})
     >>> find_euler_cycle(graph_dir, True)
     ['A', 'B', 'C', 'A']
+    >>> find_euler_cycle(CSRGraph.from_dict(graph_dir[0]), True)
+    ['A', 'B', 'C', 'A']
     """
-    original_connections, edges = graph
-    #create a deep copy, because we'll delete some edges and let's save the original dict as it is
-    #Adjacency – суміжність
-    adj = {node: neighbors.copy() for node, neighbors in original_connections.items()}
+    setup = _prepare(graph, oriented)
+    if setup is None:
+        return None
+    csr, edge_of_arc, start_node = setup
 
-    if not edges:
+    circuit = list(_hierholzer(csr, edge_of_arc, start_node))
+    labels = csr.labels
+    return [labels[node] for node in reversed(circuit)]
+
+
+@profiling.solve
+def find_euler_path(graph, oriented: bool = False):
+    """
+    An Eulerian path visits every edge exactly once, but may end at another
+    vertex than it started from. It exists if the graph is connected
+    (ignoring isolated vertices) and either every vertex has an even degree
+    (then the path is a cycle) or exactly two vertices have an odd degree
+    (the path goes from one to the other). In a directed graph one vertex
+    may have one more outgoing arc (the start) and one vertex one more
+    incoming arc (the end).
+
+        Parameters:
+            graph: (connections, edges), or a CSRGraph
+            oriented : bool
+        Returns:
+            None : if Eulerian path is impossible.
+            list[str] : vertices in order of the path
+
+    >>> find_euler_path(({'A': {'B'}, 'B': {'C'}, 'C': set()}, {('A', 'B'), ('B', 'C')}), True)
+    ['A', 'B', 'C']
+    >>> find_euler_path(({'A': {'B'}, 'B': {'A', 'C'}, 'C': {'B'}}, \
+{('A', 'B'), ('B', 'A'), ('B', 'C'), ('C', 'B')}))
+    ['A', 'B', 'C']
+    >>> find_euler_path(({'A': {'B', 'C', 'D'}, 'B': {'A'}, 'C': {'A'}, 'D': {'A'}}, \
+{('A', 'B'), ('B', 'A'), ('A', 'C'), ('C', 'A'), ('A', 'D'), ('D', 'A')}))
+    """
+    setup = _prepare(graph, oriented, path=True)
+    if setup is None:
         return None
+    csr, edge_of_arc, start_node = setup
 
-    all_nodes = list(adj.keys())
-    #if there are no nodes
-    if not all_nodes:
-        return []
+    trail = list(_hierholzer(csr, edge_of_arc, start_node))
+    labels = csr.labels
+    return [labels[node] for node in reversed(trail)]
 
-    #there are some nodes. is a cycle possible?
 
-    if not oriented:
-        #check whether every vertex has an even degree
-        for node in adj:
-            if len(adj[node]) % 2 != 0:
-                return None
-        #it is suitable to make a cycle (we will check if the graph is connected at the end)
+@profiling.solve
+def find_postman_tour(graph, oriented: bool = False):
+    """
+    Route inspection (Chinese postman problem): the shortest closed walk
+    that passes every edge at least once. Edges are duplicated along
+    shortest paths until an Eulerian cycle exists; the number of
+    duplicated edges is the smallest possible.
+
+    In an undirected graph the vertices of odd degree are paired so that
+    the paths between the pairs are shortest in total (exact dynamic
+    programming over subsets, at most POSTMAN_MAX_ODD odd vertices). In a
+    directed graph arcs are duplicated from the vertices with more incoming
+    arcs to the vertices with more outgoing arcs by a minimum cost flow.
+
+        Parameters:
+            graph: (connections, edges), or a CSRGraph
+            oriented : bool
+        Returns:
+            None : if no closed walk passes all edges (the graph is not
+            connected, or a directed graph is not strongly connected).
+            (list[str], list[tuple[str, str]]) : the walk and the
+            duplicated edges.
+        Raises:
+            ValueError : if an undirected graph has more than POSTMAN_MAX_ODD
+            vertices of odd degree.
+
+    >>> path = ({'A': {'B'}, 'B': {'A', 'C'}, 'C': {'B'}}, \
+{('A', 'B'), ('B', 'A'), ('B', 'C'), ('C', 'B')})
+    >>> find_postman_tour(path)
+    (['A', 'B', 'C', 'B', 'A'], [('B', 'C'), ('A', 'B')])
+    >>> find_postman_tour(({'A': {'B'}, 'B': {'C'}, 'C': {'A', 'B'}}, \
+{('A', 'B'), ('B', 'C'), ('C', 'A'), ('C', 'B')}), True)
+    (['A', 'B', 'C', 'B', 'C', 'A'], [('B', 'C')])
+    """
+    csr = _as_graph(graph)
+    if csr is None or not csr.num_arcs:
+        return None
+    if not _edges_connected(csr):
+        return None
+
+    if oriented:
+        extra = _directed_duplicates(csr)
     else:
-        #ins and outs must be the same (ins-outs = 0)
-        balance = {}
+        if _pair_undirected_arcs(csr)[0] is None:
+            return None
+        extra = _undirected_duplicates(csr)
+    if extra is None:
+        return None
+
+    sources = np.concatenate((csr.sources(), [u for u, _ in extra]
+                              + ([] if oriented else [v for _, v in extra]))).astype(np.int64)
+    targets = np.concatenate((csr.neighbors, [v for _, v in extra]
+                              + ([] if oriented else [u for u, _ in extra]))).astype(np.int64)
+    tour_graph = CSRGraph.from_arcs(sources, targets, csr.table)
+    tour = find_euler_cycle(tour_graph, oriented)
+    labels = csr.labels
+    return tour, [(labels[u], labels[v]) for u, v in extra]
+
+
+def iter_euler_cycle(graph, oriented: bool = False, ids: bool = False):
+    """
+    Yields the nodes of an Eulerian cycle one by one, without keeping the
+    cycle in memory: only the Hierholzer stack is stored.
+
+    Hierholzer's algorithm emits the cycle backwards, so the search walks
+    the reversed graph, whose backward cycle is a forward cycle of graph.
+
+    The degrees and the connectivity are checked before the first node
+    is yielded.
+
+        Parameters:
+            graph: (connections, edges) or a CSRGraph
+            oriented : bool
+            ids : bool, yield node ids of the CSR form instead of labels
+        Raises:
+            ValueError : if the graph has no Eulerian cycle.
+
+    >>> graph_dir = ({'A': {'B'}, 'B': {'C'}, 'C': {'A', 'D'}, 'D': {'E'}, 'E': {'C'}}, \
+{('A', 'B'), ('B', 'C'), ('C', 'A'), ('C', 'D'), ('D', 'E'), ('E', 'C')})
+    >>> list(iter_euler_cycle(graph_dir, True))
+    ['A', 'B', 'C', 'D', 'E', 'C', 'A']
+    >>> list(iter_euler_cycle(({'A': {'B'}, 'B': {'A'}, 'C': {'D'}, 'D': {'C'}}, \
+{('A', 'B'), ('B', 'A'), ('C', 'D'), ('D', 'C')}), True))
+    Traceback (most recent call last):
+    ...
+    ValueError: graph has no Eulerian cycle
+    """
+    setup = _prepare(graph, oriented)
+    if setup is None:
+        raise ValueError('graph has no Eulerian cycle')
+    csr, edge_of_arc, start_node = setup
+
+    labels = csr.labels
+    for node in _hierholzer(csr.transpose() if oriented else csr, edge_of_arc, start_node):
+        yield node if ids else labels[node]
+
 
-        for node, neighbors in adj.items():
-            #minus out
-            balance[node] = balance.get(node, 0) - len(neighbors)
+@profiling.solve
+def write_euler_cycle(graph, filename: str, oriented: bool = False, binary: bool = False):
+    """
+    Streams an Eulerian cycle to a file as it is found.
+
+    The CSV format has one node label per line. The binary format is the
+    magic bytes EULERIDS, the id size (4 or 8) as uint32, then the node
+    ids of the CSR form (ids of the binary graph file) as little-endian
+    integers; read_euler_cycle maps it back.
 
-            for one_neighbor in neighbors:
-                #add in
-                balance[one_neighbor] = balance.get(one_neighbor, 0) + 1
+    The cycle is written to filename + '.part' and renamed when it is
+    complete, so a failed search, a full disk or Ctrl+C leaves no file
+    behind.
+
+        Returns:
+            int : number of nodes written
+            None : if Eulerian cycle is impossible.
 
-        #is balance equival zero?
-        for node, count in balance.items():
-            if count != 0:
+    >>> import os, tempfile
+    >>> graph_dir = ({'A': {'B'}, 'B': {'C'}, 'C': {'A'}}, {('A','B'), ('B','C'), ('C','A')})
+    >>> path = os.path.join(tempfile.mkdtemp(), 'cycle.csv')
+    >>> write_euler_cycle(graph_dir, path, True)
+    4
+    >>> open(path).read().split()
+    ['A', 'B', 'C', 'A']
+    >>> write_euler_cycle(graph_dir, path + '.bin', True, binary=True)
+    4
+    >>> read_euler_cycle(path + '.bin').tolist()
+    [0, 1, 2, 0]
+    >>> from unittest import mock
+    >>> with mock.patch(f'{__name__}._write_chunk', side_effect=OSError('No space left')):
+    ...     write_euler_cycle(graph_dir, path + '.full', True)
+    Traceback (most recent call last):
+    ...
+    OSError: No space left
+    >>> os.path.exists(path + '.full.part')
+    False
+    """
+    csr = graph if isinstance(graph, CSRGraph) else None
+    id_size = 8 if csr is not None and csr.neighbors.dtype.itemsize == 8 else 4
+    nodes = iter_euler_cycle(graph, oriented, ids=binary)
+    part = filename + '.part'
+    count = 0
+    try:
+        with open(part, 'wb' if binary else 'w', encoding=None if binary else 'utf-8') as file:
+            if binary:
+                file.write(_CYCLE_HEADER.pack(_CYCLE_MAGIC, id_size))
+            chunk = array('i' if id_size == 4 else 'q') if binary else []
+            for node in nodes:
+                chunk.append(node)
+                if len(chunk) == _CHUNK:
+                    count += _write_chunk(file, chunk, binary)
+            count += _write_chunk(file, chunk, binary)
+    except BaseException as error:
+        with contextlib.suppress(FileNotFoundError):     # open() may have failed
+            os.remove(part)
+        if isinstance(error, ValueError):       # no Eulerian cycle
+            return None
+        raise
+    os.replace(part, filename)
+    return count
+
+
+def read_euler_cycle(filename: str) -> np.ndarray:
+    """Memory-maps the node ids of a cycle written by write_euler_cycle(binary=True)."""
+    with open(filename, 'rb') as file:
+        magic, id_size = _CYCLE_HEADER.unpack(file.read(_CYCLE_HEADER.size))
+    if magic != _CYCLE_MAGIC:
+        raise ValueError(f'{filename}: не бінарний файл циклу')
+    if os.path.getsize(filename) == _CYCLE_HEADER.size:
+        return np.empty(0, dtype=f'<i{id_size}')
+    return np.memmap(filename, dtype=f'<i{id_size}', mode='r', offset=_CYCLE_HEADER.size)
+
+
+def _write_chunk(file, chunk, binary: bool) -> int:
+    """Writes and empties a chunk of nodes; returns how many there were."""
+    count = len(chunk)
+    if binary:
+        if sys.byteorder != 'little':
+            chunk.byteswap()
+        chunk.tofile(file)
+    else:
+        file.writelines(f'{label}\n' for label in chunk)
+    del chunk[:]
+    return count
+
+
+def _prepare(graph, oriented: bool, path: bool = False):
+    """
+    Checks the degrees and the connectivity before any traversal, and
+    pairs the arcs of undirected edges.
+
+    Returns (csr, edge id of every arc or None, start node), or None if
+    an Eulerian cycle (or path) is impossible.
+    """
+    csr = _as_graph(graph)
+    if csr is None or not csr.num_arcs:
+        return None
+
+    #there are some nodes. is a cycle possible?
+    degrees = csr.degrees()
+    #start from the first node that has edges, unless a path must start elsewhere
+    start_node = int(np.flatnonzero(degrees)[0])
+    if not oriented:
+        #a cycle needs every vertex of even degree, a path at most two odd ones (a loop adds 2)
+        loops = np.bincount(csr.sources()[csr.sources() == csr.neighbors],
+                            minlength=len(csr))
+        odd = np.flatnonzero((degrees + loops) % 2)
+        if len(odd) > (2 if path else 0):
+            return None
+        if len(odd):
+            start_node = int(odd[0])
+        with profiling.phase('normalize'):
+            edge_of_arc, _ = _pair_undirected_arcs(csr)
+        if edge_of_arc is None:
+            return None
+    else:
+        #ins and outs must be the same (ins-outs = 0); a path may start with one extra out
+        balance = degrees - np.bincount(csr.neighbors, minlength=len(csr))
+        unbalanced = np.flatnonzero(balance)
+        if len(unbalanced):
+            if not path or len(unbalanced) != 2 or sorted(balance[unbalanced]) != [-1, 1]:
                 return None
+            start_node = int(unbalanced[balance[unbalanced] == 1][0])
+        #in a directed graph every arc is an edge of its own
+        edge_of_arc = None
+
+    #all edges must be in one component; this fails fast instead of after a traversal
+    if not _edges_connected(csr):
+        return None
+    return csr, edge_of_arc, start_node
+
+
+def _as_graph(graph):
+    """CSR form of (connections, edges) or a CSRGraph; None if there are no edges."""
+    if isinstance(graph, CSRGraph):
+        return graph
+    original_connections, edges = graph
+    if not edges:
+        return None
+    #Adjacency – суміжність. The CSR copy is compact and the original dict stays as it is
+    return as_csr(original_connections)
+
+
+def _edges_connected(csr: CSRGraph) -> bool:
+    """
+    True if all arcs lie in one component of the underlying undirected
+    graph (isolated vertices do not count). Union-find over the arcs with
+    path halving, O(V + E).
+    """
+    parent = list(range(len(csr)))
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    offsets, neighbors = csr.offsets_view, csr.neighbors_view
+    components = np.count_nonzero(csr.degrees() + np.bincount(csr.neighbors, minlength=len(csr)))
+    for u in range(len(csr)):
+        for arc in range(offsets[u], offsets[u + 1]):
+            root_u, root_v = find(u), find(neighbors[arc])
+            if root_u != root_v:
+                parent[root_u] = root_v
+                components -= 1
+    return components == 1
 
-    #start creating the cycle
-    start_node = all_nodes[0]
-    for node in all_nodes:
-        if len(adj[node]) > 0:
-            start_node = node
-            break
+
+def _bfs_tree(csr: CSRGraph, source: int) -> tuple[list, list]:
+    """Distances (-1 if unreachable) and BFS parents from source along out-arcs."""
+    offsets, neighbors = csr.offsets_view, csr.neighbors_view
+    dist = [-1] * len(csr)
+    parent = [-1] * len(csr)
+    dist[source] = 0
+    queue = [source]
+    for node in queue:
+        for arc in range(offsets[node], offsets[node + 1]):
+            neighbor = neighbors[arc]
+            if dist[neighbor] < 0:
+                dist[neighbor] = dist[node] + 1
+                parent[neighbor] = node
+                queue.append(neighbor)
+    return dist, parent
+
+
+def _undirected_duplicates(csr: CSRGraph) -> list:
+    """
+    Edges to duplicate so that every vertex of an undirected graph gets an
+    even degree: the odd vertices are paired with the smallest total BFS
+    distance, and the edges of the shortest paths between pairs are added.
+    """
+    loops = np.bincount(csr.sources()[csr.sources() == csr.neighbors], minlength=len(csr))
+    odd = np.flatnonzero((csr.degrees() + loops) % 2).tolist()
+    k = len(odd)
+    if k > POSTMAN_MAX_ODD:
+        raise ValueError(f'postman tour supports at most {POSTMAN_MAX_ODD} odd vertices, got {k}')
+    if not k:
+        return []
+
+    trees = [_bfs_tree(csr, node) for node in odd]
+    dist = np.array([[tree[0][other] for other in odd] for tree in trees], dtype=np.int64)
+
+    #best[mask]: cheapest pairing of the odd vertices in mask (pairs always take the lowest one)
+    masks = np.arange(1 << k, dtype=np.int64)
+    sizes = np.zeros(1 << k, dtype=np.int64)
+    for bit in range(k):
+        sizes += (masks >> bit) & 1
+    lowest = np.zeros(1 << k, dtype=np.int64)
+    for bit in range(k - 1, -1, -1):
+        lowest[(masks >> bit) & 1 == 1] = bit
+    best = np.full(1 << k, np.iinfo(np.int64).max // 2, dtype=np.int64)
+    best[0] = 0
+    partner = np.zeros(1 << k, dtype=np.int64)
+    for size in range(2, k + 1, 2):
+        layer = masks[sizes == size]
+        low = lowest[layer]
+        for other in range(k):
+            takes = ((layer >> other) & 1 == 1) & (low != other)
+            cost = best[layer ^ (1 << low) ^ (1 << other)] + dist[low, other]
+            better = takes & (cost < best[layer])
+            best[layer[better]] = cost[better]
+            partner[layer[better]] = other
+
+    extra = []
+    mask = (1 << k) - 1
+    while mask:
+        low = int(lowest[mask])
+        other = int(partner[mask])
+        #walk the BFS tree of the lower vertex back from its partner
+        parent = trees[low][1]
+        node = odd[other]
+        while node != odd[low]:
+            extra.append((parent[node], node))
+            node = parent[node]
+        mask ^= (1 << low) | (1 << other)
+    return extra
+
+
+def _directed_duplicates(csr: CSRGraph):
+    """
+    Arcs to duplicate so that every vertex of a directed graph has as many
+    incoming as outgoing arcs, by the successive shortest paths minimum
+    cost flow: every unit of flow is a duplicated path from a vertex with
+    more incoming arcs to a vertex with more outgoing arcs, and flow on an
+    arc may be sent back (cost -1) to reroute earlier paths.
+    Returns None if some excess cannot reach a deficit.
+    """
+    n = len(csr)
+    excess = (np.bincount(csr.neighbors, minlength=n) - csr.degrees()).tolist()
+    adjacency = csr.adjacency()
+    reverse = csr.transpose().adjacency()
+    flow = {}   #(u, v) -> number of duplicated copies of the arc u -> v
+
+    while any(amount > 0 for amount in excess):
+        #Bellman-Ford (queue based) from all vertices with excess at once
+        dist = [None] * n
+        parent = [None] * n
+        queue = [node for node in range(n) if excess[node] > 0]
+        for node in queue:
+            dist[node] = 0
+        in_queue = [False] * n
+        for node in queue:
+            in_queue[node] = True
+        head = 0
+        while head < len(queue):
+            u = queue[head]
+            head += 1
+            in_queue[u] = False
+            steps = [(v, 1, (u, v)) for v in adjacency[u]]
+            steps += [(v, -1, (v, u)) for v in reverse[u] if flow.get((v, u))]
+            for v, cost, arc in steps:
+                if dist[v] is None or dist[u] + cost < dist[v]:
+                    dist[v] = dist[u] + cost
+                    parent[v] = (u, cost, arc)
+                    if not in_queue[v]:
+                        in_queue[v] = True
+                        queue.append(v)
+
+        deficits = [node for node in range(n) if excess[node] < 0 and dist[node] is not None]
+        if not deficits:
+            return None
+        sink = min(deficits, key=lambda node: dist[node])
+        node = sink
+        while parent[node] is not None:
+            u, cost, arc = parent[node]
+            flow[arc] = flow.get(arc, 0) + cost
+            node = u
+        excess[node] -= 1
+        excess[sink] += 1
+
+    return [arc for arc, copies in sorted(flow.items()) for _ in range(copies)]
+
+
+def _hierholzer(csr: CSRGraph, edge_of_arc, start_node: int):
+    """
+    Yields the nodes of an Eulerian cycle (or of a path that starts at
+    start_node) backwards, as Hierholzer's algorithm finishes them.
+    """
+
+    offsets, neighbors = csr.offsets_view, csr.neighbors_view
+    #next[u]: position of the first arc of u that was not tried yet
+    next_arc = offsets.tolist()
+    used = bytearray(csr.num_arcs)
 
 #stack: tracks the current traversal path (allows backtracking)
-#circuit: stores the final path (nodes are added when they have no unused edges left)
+#finished nodes are yielded (nodes are given away when they have no unused edges left)
     stack = [start_node]    #як чернетка
-    circuit = []            #як чистовик
 
 #main part of Hierholzer's algorithm
-#go forward (deeper) while you can. If can't: save stack[-1] to circuit and go back
+#go forward (deeper) while you can. If can't: give away stack[-1] and go back
     while stack:
         u = stack[-1]
-        if u in adj and adj[u]:
-            v = adj[u].pop()
-            if not oriented:
-                if v in adj and u in adj[v]:
-                    adj[v].remove(u)
-            stack.append(v)
+        arc, end = next_arc[u], offsets[u + 1]
+        if edge_of_arc is not None:
+            #skip arcs whose edge was already passed from the other end
+            while arc < end and used[edge_of_arc[arc]]:
+                arc += 1
+        if arc < end:
+            next_arc[u] = arc + 1
+            if edge_of_arc is not None:
+                used[edge_of_arc[arc]] = 1
+            stack.append(neighbors[arc])
         else:
-            circuit.append(stack.pop())
+            next_arc[u] = arc
+            yield stack.pop()
+    #every passed edge was pushed and popped once; counted here, not in the loop
+    profiling.count('euler.edges_popped', csr.num_arcs if edge_of_arc is None else used.count(1))
 
-    path = circuit[::-1]
 
-    #now check if the grapg is connected
-    total_edges_count = len(edges)
-    if oriented:
-        total_edges_count = len(edges)
-    elif not oriented:
-        total_edges_count = len(edges) / 2
+def _pair_undirected_arcs(csr: CSRGraph) -> tuple:
+    """
+    Gives both arcs (u, v) and (v, u) of an undirected edge the same edge id.
+    A self-loop is stored as one arc and is an edge on its own.
 
-    if len(path) - 1 != total_edges_count:
-        return None
-    return path
+    Returns (edge id of every arc, number of edges), or (None, 0) if some
+    arc has no reverse pair, so the graph is not really undirected.
+    """
+    num_nodes = len(csr)
+    sources, targets = csr.sources(), csr.neighbors.astype(np.int64)
+    low, high = np.minimum(sources, targets), np.maximum(sources, targets)
+    keys = low * num_nodes + high
+
+    forward = np.flatnonzero(sources < targets)
+    backward = np.flatnonzero(sources > targets)
+    loops = np.flatnonzero(sources == targets)
+    forward = forward[np.argsort(keys[forward], kind='stable')]
+    backward = backward[np.argsort(keys[backward], kind='stable')]
+    if len(forward) != len(backward) or np.any(keys[forward] != keys[backward]):
+        return None, 0
+
+    edge_of_arc = np.empty(csr.num_arcs, dtype=np.int64)
+    edge_of_arc[forward] = np.arange(len(forward))
+    edge_of_arc[backward] = np.arange(len(forward))
+    edge_of_arc[loops] = np.arange(len(forward), len(forward) + len(loops))
+    return memoryview(edge_of_arc), len(forward) + len(loops)
 
 if __name__ == '__main__':
     import doctest
@@ -1,14 +1,38 @@
 """Gamilton's Scicle"""
 import time
-import matplotlib.pyplot as mp
+import numpy as np
 
+from . import profiling
+from .budget import Budget, SearchUnknown
+from .csr_graph import as_csr
+from .traversal import articulation_points, bfs_forest
 
-def make_way(graph: dict, passed_way = None)-> list|bool:
+
+# Held-Karp needs 2^(n-1) masks, so it is limited to small graphs
+HELD_KARP_MAX_NODES = 25
+# below this size backtracking is instant even in the worst case
+HELD_KARP_MIN_NODES = 10
+# arcs / (n * (n - 1)) from which a graph counts as dense
+HELD_KARP_MIN_DENSITY = 0.5
+
+
+@profiling.solve
+def make_way(graph, passed_way = None, method = 'auto', budget = None)-> list|bool|SearchUnknown:
     """
     This function help to make gamiltons way by list of tops.
     If this function has this way, than it return way.
     If not returns False.
 
+    graph is an adjacency dict or a CSRGraph.
+    method chooses the search: 'backtrack' (hamiltonian_search),
+    'dp' (held_karp) or 'auto' (choose_method decides by size and density).
+    budget (a Budget) limits the time and the number of expanded tops;
+    when it runs out, SearchUnknown is returned instead of an answer.
+
+    A gamiltons cycle keeps the graph connected after removing any top,
+    so a graph with more than one component or with an articulation point
+    (of the underlying undirected graph) gives False at once, without a search.
+
 
 
     >>> graph = {1: {2, 3}, 2: {4, 5}, 3: {2, 4}, 4: {1, 5}, 5: {2, 4}}
@@ -97,28 +121,266 @@ def make_way(graph: dict, passed_way = None)-> list|bool:
     >>> make_way(bad_graph)
     False
     """
-    if len(graph)<=2:
+    csr = as_csr(graph)
+    if len(csr)<=2:
+        return False
+    if not is_biconnected(csr):
+        return False
+    labels = csr.labels
+    if method == 'auto':
+        method = 'backtrack' if passed_way else choose_method(csr)
+    budget = profiling.counting_budget(budget)
+    steps = 0 if budget is None else budget.steps
+    if method == 'dp':
+        if passed_way:
+            raise ValueError('held_karp does not take passed_way')
+        res = held_karp(csr, budget)
+    elif method == 'backtrack':
+        # Цикл проходить через усі вершини, тож достатньо почати з першої
+        start_path = [csr.id_of(top) for top in passed_way] if passed_way else [0]
+        res = hamiltonian_search(csr, start_path, budget)
+    else:
+        raise ValueError(f'Unknown method: {method!r}')
+    if budget is not None:
+        profiling.count('make_way.nodes_expanded', budget.steps - steps)
+    if isinstance(res, SearchUnknown):
+        return res._replace(partial=[labels[top] for top in res.partial or []])
+    return [labels[top] for top in res] if res else False
+
+def is_biconnected(graph)-> bool:
+    """
+    Checks that the underlying undirected graph of a CSRGraph is connected
+    and has no articulation point, in O(V + E).
+
+    >>> is_biconnected(as_csr({1: {2, 3}, 2: {3}}))
+    True
+    >>> is_biconnected(as_csr({1: {2}, 2: {3}}))
+    False
+    """
+    undirected = graph.undirected()
+    if bfs_forest(undirected).count > 1:
+        return False
+    return not len(articulation_points(undirected))
+
+def choose_method(graph)-> str:
+    """
+    Picks the search for make_way: the exact DP for small dense graphs,
+    where backtracking has the most branches to try and the DP has a fixed
+    cost, and backtracking for everything else.
+
+    >>> choose_method(as_csr({i: [j for j in range(12) if j != i] for i in range(12)}))
+    'dp'
+    >>> choose_method(as_csr(generate_graph_n(12)))
+    'backtrack'
+    """
+    n = len(graph)
+    if not HELD_KARP_MIN_NODES <= n <= HELD_KARP_MAX_NODES:
+        return 'backtrack'
+    density = graph.num_arcs / (n * (n - 1))
+    return 'dp' if density >= HELD_KARP_MIN_DENSITY else 'backtrack'
+
+def held_karp(graph, budget = None)-> list|bool|SearchUnknown:
+    """
+    Exact gamiltons cycle search by dynamic programming over subsets
+    (Held-Karp) for a CSRGraph with at most HELD_KARP_MAX_NODES tops.
+    Returns the cycle as a list of ids (first id repeated at the end)
+    or False. With a Budget, every mask counts as one expansion and the
+    budget is checked between layers.
+
+    The cycle starts at top 0. For every set of other tops (a bitmask)
+    reach[mask] is a bitmask of tops where a path from 0 through exactly
+    this set can end. Masks are processed layer by layer (by the number of
+    tops), and each layer is extended by one top at a time with NumPy, so
+    the cost is O(2^n * n) array operations whatever the graph looks like.
+
+    >>> held_karp(as_csr({0: [1, 2], 1: [2, 3], 2: [3, 0], 3: [0, 1]}))
+    [0, 1, 2, 3, 0]
+    >>> held_karp(as_csr({0: [1], 1: [0, 2], 2: [1]}))
+    False
+    """
+    n = len(graph)
+    if n > HELD_KARP_MAX_NODES:
+        raise ValueError(f'held_karp supports at most {HELD_KARP_MAX_NODES} tops, got {n}')
+    if n <= 2:
         return False
-    if not passed_way:
-        for first_top in graph:     # Підбір початкової точки циклу
-            passed_way = [first_top]
-            res = make_way(graph, passed_way)
-            if res:
-                return res
-            passed_way = []                    # Повернення результату
-        return False    # У випадку перебору всіх варіантів і не знаходження правильного.
-
-    if passed_way:
-        if len(passed_way) == len(graph) and passed_way[0] in graph[passed_way[-1]]:
-            return passed_way + [passed_way[0]]
-    for top in graph[passed_way[-1]]: # Перебір наступних можливих точок
-        if top not in passed_way:
-            passed_way.append(top) #Якщо вони не пройдені, тоді вони додаються
-            res = make_way(graph, passed_way)
-            if res:
-                return res
-            passed_way.pop() # У випадку тупіка видаляємо останій елемент
-    return False # Якщо нам не підходить ні один варіант, тобто тупік
+
+    # top v > 0 is bit v - 1; in_bits[w] holds the tops that have an arc to w
+    m = n - 1
+    adjacency = graph.adjacency()
+    in_bits = [0] * n
+    for v, neighbors in enumerate(adjacency):
+        for w in neighbors:
+            if w != v and v > 0:
+                in_bits[w] |= 1 << (v - 1)
+
+    masks = np.arange(1 << m, dtype=np.uint32)
+    popcount = np.zeros(1 << m, dtype=np.uint8)
+    for bit in range(m):
+        popcount += ((masks >> bit) & 1).astype(np.uint8)
+    order = np.argsort(popcount, kind='stable').astype(np.uint32)
+    layer_ends = np.cumsum(np.bincount(popcount, minlength=m + 1))
+
+    reach = np.zeros(1 << m, dtype=np.uint32)
+    for w in adjacency[0]:
+        if w != 0:
+            reach[1 << (w - 1)] = 1 << (w - 1)
+
+    for size in range(1, m):
+        layer = order[layer_ends[size - 1]:layer_ends[size]]
+        if budget is not None and budget.spend(size, len(layer)):
+            return budget.unknown()
+        ends = reach[layer]
+        for w in range(1, n):
+            bit = np.uint32(1 << (w - 1))
+            can_add = ((ends & np.uint32(in_bits[w])) != 0) & ((layer & bit) == 0)
+            targets = layer[can_add] | bit
+            reach[targets] |= bit
+
+    full = (1 << m) - 1
+    last = [w for w in range(1, n) if reach[full] >> (w - 1) & 1 and 0 in adjacency[w]]
+    if not last:
+        return False
+
+    # walk back from the last top to 0
+    cycle = [0, last[0]]
+    mask, current = full, last[0]
+    while mask != 1 << (current - 1):
+        mask ^= 1 << (current - 1)
+        options = int(reach[mask]) & in_bits[current]
+        current = (options & -options).bit_length()
+        cycle.append(current)
+    cycle.append(0)
+    return cycle[::-1]
+
+def hamiltonian_search(graph, start_path = None, budget = None)-> list|bool|SearchUnknown:
+    """
+    Iterative search of a gamiltons cycle over node ids of a CSRGraph.
+    Returns the cycle as a list of ids (first id repeated at the end)
+    or False. With a Budget, returns SearchUnknown (partial is the longest
+    path of ids) once the budget runs out.
+
+    The search keeps its own stack instead of recursing, so the path can be
+    as long as the graph. Visited tops are flags in a bytearray, so the
+    check "is it passed?" is O(1). Next tops are tried in Warnsdorff order:
+    the one with the fewest free exits goes first.
+
+    Two prunings cut dead branches early:
+    * dead end: a free top that can no longer be entered or left;
+    * connectivity: after a backtrack, the free tops and the current end
+      of the path must still be connected.
+
+    >>> big = hamiltonian_search(as_csr(generate_graph_n(10000)))
+    >>> len(big), len(set(big))
+    (10001, 10000)
+    >>> hamiltonian_search(as_csr(generate_graph_n(100)), budget=Budget(max_steps=10))
+    SearchUnknown(reason='max_steps', nodes_expanded=11, max_depth=11, partial=[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10])
+    """
+    out = [list(dict.fromkeys(top for top in neighbors if top != node))
+           for node, neighbors in enumerate(graph.adjacency())]
+    incoming = [[] for _ in out]
+    for node, neighbors in enumerate(out):
+        for top in neighbors:
+            incoming[top].append(node)
+    n = len(out)
+    if n <= 2 or not all(out) or not all(incoming):
+        return False
+    symmetric = all(sorted(a) == sorted(b) for a, b in zip(out, incoming))
+
+    start_path = start_path or [0]
+    start = start_path[0]
+    visited = bytearray(n)
+    # free_out[u]: exits of u to free tops or back to start
+    # free_in[u]: entries to u from free tops
+    free_out = [len(neighbors) for neighbors in out]
+    free_in = [len(neighbors) for neighbors in incoming]
+    near = [0] * n     # near[u] == stamp: u is a neighbor of the current end
+    stamp = 0
+
+    def mark(top, passed):
+        """Marks a top as passed (or free again) and updates the counters."""
+        visited[top] = passed
+        delta = -1 if passed else 1
+        if top != start:
+            for before in incoming[top]:
+                free_out[before] += delta
+        if not symmetric:
+            for after in out[top]:
+                free_in[after] += delta
+
+    def is_dead_end(previous, current):
+        """Checks tops that lost a way in or out after moving previous -> current."""
+        nonlocal stamp
+        stamp += 1
+        for after in out[current]:
+            near[after] = stamp
+        if symmetric:
+            # a free neighbor of previous still needs two distinct free sides
+            return any(not visited[top] and free_out[top] + (near[top] == stamp) < 2
+                       for top in out[previous])
+        return (any(not visited[top] and not free_out[top] for top in incoming[current])
+                or any(not visited[top] and not free_in[top] and near[top] != stamp
+                       for top in out[previous]))
+
+    def is_split():
+        """Checks whether free tops are unreachable from the current end."""
+        remaining = n - len(path)
+        seen = {path[-1]}
+        queue = [path[-1]]
+        for top in queue:
+            for neighbor in out[top] + incoming[top]:
+                if not visited[neighbor] and neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+        return len(seen) - 1 < remaining
+
+    def ordered(top):
+        """Free next tops, the most constrained one first."""
+        return sorted((after for after in out[top] if not visited[after]),
+                      key=free_out.__getitem__)
+
+    path = []
+    for top in start_path:
+        mark(top, True)
+        path.append(top)
+    if len(path) == n:
+        return path + [start] if start in out[path[-1]] else False
+
+    frames = [[ordered(path[-1]), 0]]
+    check_split = False
+    best = []     # the longest path seen, for SearchUnknown.partial
+    while frames:
+        frame = frames[-1]
+        candidates, cursor = frame
+        if check_split:
+            check_split = False
+            if is_split():
+                cursor = len(candidates)    # the whole branch is dead
+        if cursor == len(candidates):
+            # тупік: повертаємось на крок назад
+            frames.pop()
+            if not frames:
+                break
+            if len(path) > len(best):
+                best = path.copy()
+            mark(path.pop(), False)
+            check_split = True
+            continue
+        frame[1] = cursor + 1
+        if budget is not None and budget.spend(len(path)):
+            return budget.unknown(max(best, path, key=len).copy())
+
+        top = candidates[cursor]
+        previous = path[-1]
+        mark(top, True)
+        path.append(top)
+        if len(path) == n:
+            if start in out[top]:
+                return path + [start]
+        elif not is_dead_end(previous, top):
+            frames.append([ordered(top), 0])
+            continue
+        mark(path.pop(), False)
+    return False
 
 def generate_graph_n(n):
     """
@@ -160,7 +422,10 @@ def build_schedule():
     This function help to ьфлу schedule about time of working.
     x-value: is amount of tops in graph
     y-value: is time for work with this graph
+    matplotlib is imported here, so that the search does not pay for it.
     """
+    import matplotlib.pyplot as mp
+
     x_values = [i for i in range(100, 1000, 50)]
     y_values = [time_for_n(n) for n in x_values]
     mp.plot(x_values, y_values)
@@ -1,209 +1,649 @@
-"""PAINTING GRAPH"""
-def is_bipartite(ghraph: dict) -> bool:
-    """
-    Checks whether the underlying undirected graph is bipartite using BFS coloring.
-
-    The function attempts to color each node using two colors ('1' and '2').
-    A graph is bipartite if no two adjacent nodes have the same color.
-    It first constructs the underlying undirected graph from the input
-    (which may be oriented or undirected) by adding reciprocal edges.
-
-    Parameters
-    ----------
-    graph : dict
-        A dictionary mapping each node (integer) to a list of its neighbors.
-
-    Returns
-    -------
-    bool
-        True if the graph is bipartite, False otherwise.
-
-    Doctests
-    --------
-    >>> is_bipartite({})          # empty graph
-    True
-
-    >>> is_bipartite({1: []})     # single node
-    True
-
-    >>> is_bipartite({            # simple chain 1 - 2 - 3 (undirected input)
-    ...     1: [2],
-    ...     2: [1, 3],
-    ...     3: [2]
-    ... })
-    True
-
-    >>> is_bipartite({            # even cycle: 1-2-3-4-1 (undirected input)
-    ...     1: [2, 4],
-    ...     2: [1, 3],
-    ...     3: [2, 4],
-    ...     4: [1, 3]
-    ... })
-    True
-
-    >>> is_bipartite({            # odd cycle: 1-2-3-1 (undirected input)
-    ...     1: [2, 3],
-    ...     2: [1, 3],
-    ...     3: [1, 2]
-    ... })
-    False
-
-    >>> is_bipartite({            # oriented odd cycle: 1 -> 2 -> 3 -> 1
-    ...     1: [2],
-    ...     2: [3],
-    ...     3: [1]
-    ... })
-    False
-    """
-    adj = {node: set(neighbors) for node, neighbors in ghraph.items()}
-
-    all_nodes = set(ghraph.keys())
-    for neighbors in ghraph.values():
-        all_nodes.update(neighbors)
-
-    for node in all_nodes:
-        if node not in adj:
-            adj[node] = set()
-
-    for u in ghraph:
-        for v in ghraph[u]:
-            adj[v].add(u)
-
-    adj = {node: list(neighbors) for node, neighbors in adj.items()}
-
-    color = {}
-    queue = []
-    #BFS
-    for node in adj:
-        if node not in color:
-            queue = [node]
-            color[node] = '1'
-
-            while queue:
-                current_node = queue.pop(0)
-                for adjacent in adj.get(current_node, []):
-                    if adjacent not in color:
-                        if color[current_node] == '1':
-                            color[adjacent] = '2'
-                        elif color[current_node] == '2':
-                            color[adjacent] = '1'
-                        queue.append(adjacent)
-                    else:
-                        if color[current_node] == color[adjacent]:
-                            return False
-    return True
-
-def three_coloring(graph: dict) -> list:
-    """
-    Attempts to find a 3-coloring for the underlying undirected graph.
-
-    The function uses Depth-First Search (DFS) with backtracking to assign
-    one of three colors ('r', 'b', 'g') to each node such that no two
-    adjacent nodes share the same color. It first converts the input (which
-    may be oriented) into its underlying undirected graph.
-
-    Parameters
-    ----------
-    graph : dict
-        A dictionary where keys are nodes and values are lists of adjacent nodes.
-
-    Returns
-    -------
-    list[tuple] | str
-        A list of (node, color) pairs if coloring is possible, otherwise
-        "Impossible to paint".
-
-    Doctests
-    --------
-    >>> three_coloring({})              # empty graph
-    []
-
-    >>> three_coloring({1: []})         # one node
-    [(1, 'r')]
-
-    >>> result = three_coloring({       # path: 1 - 2 - 3 (undirected input)
-    ...     1: [2],
-    ...     2: [1, 3],
-    ...     3: [2]
-    ... })
-    >>> len(result)
-    3
-    >>> all(color in {'r', 'b', 'g'} for _, color in result)
-    True
-
-    >>> result = three_coloring({       # triangle: 1-2-3 fully connected (undirected input)
-    ...     1: [2, 3],
-    ...     2: [1, 3],
-    ...     3: [1, 2]
-    ... })
-    >>> len(result)
-    3
-    >>> all(color in {'r', 'b', 'g'} for _, color in result)
-    True
-
-    >>> three_coloring({                # K4 – 4 fully connected nodes → impossible
-    ...     1: [2, 3, 4],
-    ...     2: [1, 3, 4],
-    ...     3: [1, 2, 4],
-    ...     4: [1, 2, 3]
-    ... })
-    'Impossible to paint'
-
-    >>> three_coloring({                # Oriented path 1 -> 2 -> 3 (Underlying graph is P3)
-    ...     1: [2],
-    ...     2: [3],
-    ...     3: []
-    ... })
-    [(1, 'r'), (2, 'b'), (3, 'r')]
-    """
-    adj = {node: set(neighbors) for node, neighbors in graph.items()}
-
-    all_nodes = set(graph.keys())
-    for neighbors in graph.values():
-        all_nodes.update(neighbors)
-
-    for node in all_nodes:
-        if node not in adj:
-            adj[node] = set()
-
-    for u in graph:
-        for v in graph[u]:
-            adj[v].add(u)
-
-    adj = {node: list(neighbors) for node, neighbors in adj.items()}
-
-    color = {item: None for item in adj} #all aren`t painted
-    nodes = list(adj.keys())
-
-    def is_to_paint(node_to_paint, color_to_try):
-        """
-        Check if we can safely color a node with a specific color.
-        """
-        for item in adj.get(node_to_paint, []):
-            if color.get(item) == color_to_try:
-                return False
-        return True
-
-    def paint(node_index):
-        """
-        DFS
-        """
-        if node_index == len(color): #found a complete and valid coloring of the graph
-            return True
-        node_to_paint = nodes[node_index]
-        for color_to_try in 'rbg':
-            if is_to_paint(node_to_paint, color_to_try):
-                color[node_to_paint] = color_to_try
-                if paint(node_index + 1): #checking for next node
-                    return True
-                #next interation try another color
-                color[node_to_paint] = None #if we are in situation when we can`t paint any of colors`
-        return False #no color matched
-
-    if paint(0): #start painting with first node
-        return [(node, color[node]) for node in nodes]
-    return 'Impossible to paint'
-
-if __name__ == '__main__':
-    import doctest
-    print(doctest.testmod())
+"""PAINTING GRAPH"""
+import heapq
+
+from typing import NamedTuple
+
+import numpy as np
+
+from . import profiling
+from .budget import Budget, SearchUnknown
+from .components import component_subgraphs, map_components
+from .csr_graph import as_csr
+from .traversal import bfs_forest, odd_cycle
+
+
+class BipartiteResult(NamedTuple):
+    """
+    Answer of is_bipartite. It is truthy exactly when the graph is
+    bipartite, so it can be used as a bool.
+
+    parts: the two parts (lists of nodes) if the graph is bipartite.
+    odd_cycle: nodes of an odd cycle [a, ..., a] that proves it is not.
+    """
+    parts: tuple[list, list] | None
+    odd_cycle: list | None
+
+    def __bool__(self):
+        return self.odd_cycle is None
+
+
+@profiling.solve
+def is_bipartite(ghraph: dict, workers: int = 1) -> BipartiteResult:
+    """
+    Checks whether the underlying undirected graph is bipartite using BFS coloring.
+
+    The BFS (see traversal.bfs_forest) gives every node a depth in its
+    component; a graph is bipartite exactly when no edge joins two nodes
+    whose depths have the same parity. The parities become the two parts,
+    and a bad edge together with the BFS tree gives an odd cycle.
+
+    Parameters
+    ----------
+    graph : dict | CSRGraph
+        A dictionary mapping each node (integer) to a list of its neighbors,
+        or the same graph in CSR form.
+    workers : int, optional
+        If not 1, the connected components are checked in a process pool
+        of that many processes (None: one per core), see components.py.
+        The parts are the same as without workers.
+
+    Returns
+    -------
+    BipartiteResult
+        Truthy with the two parts if the graph is bipartite, falsy with
+        an odd cycle otherwise.
+
+    Doctests
+    --------
+    >>> bool(is_bipartite({}))          # empty graph
+    True
+
+    >>> is_bipartite({1: []})     # single node
+    BipartiteResult(parts=([1], []), odd_cycle=None)
+
+    >>> is_bipartite({            # simple chain 1 - 2 - 3 (undirected input)
+    ...     1: [2],
+    ...     2: [1, 3],
+    ...     3: [2]
+    ... })
+    BipartiteResult(parts=([1, 3], [2]), odd_cycle=None)
+
+    >>> bool(is_bipartite({            # even cycle: 1-2-3-4-1 (undirected input)
+    ...     1: [2, 4],
+    ...     2: [1, 3],
+    ...     3: [2, 4],
+    ...     4: [1, 3]
+    ... }))
+    True
+
+    >>> is_bipartite({            # odd cycle: 1-2-3-1 (undirected input)
+    ...     1: [2, 3],
+    ...     2: [1, 3],
+    ...     3: [1, 2]
+    ... })
+    BipartiteResult(parts=None, odd_cycle=[2, 1, 3, 2])
+
+    >>> bool(is_bipartite({            # oriented odd cycle: 1 -> 2 -> 3 -> 1
+    ...     1: [2],
+    ...     2: [3],
+    ...     3: [1]
+    ... }))
+    False
+    """
+    with profiling.phase('normalize'):
+        csr = as_csr(ghraph).undirected()
+    labels = csr.labels
+    if workers != 1:
+        return _merge_bipartite(map_components(is_bipartite, component_subgraphs(csr), workers),
+                                labels)
+    forest = bfs_forest(csr)
+
+    side = forest.depth & 1 # 0 and 1 - the two parts
+    sources = csr.sources()
+    same = np.flatnonzero(side[sources] == side[csr.neighbors])
+    if len(same):
+        cycle = odd_cycle(forest, int(sources[same[0]]), int(csr.neighbors[same[0]]))
+        return BipartiteResult(None, [labels[node] for node in cycle])
+    return BipartiteResult(tuple([labels[node] for node in np.flatnonzero(side == part)]
+                                 for part in (0, 1)), None)
+
+def _merge_bipartite(results: list, labels) -> BipartiteResult:
+    """Joins the answers for the components (whose labels are node ids)."""
+    for result in results:
+        if not result:
+            return BipartiteResult(None, [labels[node] for node in result.odd_cycle])
+    return BipartiteResult(tuple([labels[node] for node in sorted(node for result in results
+                                                                  for node in result.parts[part])]
+                                 for part in (0, 1)), None)
+
+class _OutOfBudget(Exception):
+    """Unwinds the coloring search when its budget runs out."""
+    def __init__(self, colors: dict):
+        super().__init__()
+        self.colors = colors
+
+
+@profiling.solve
+def three_coloring(graph: dict, budget: Budget | None = None, workers: int = 1) -> list:
+    """
+    Attempts to find a 3-coloring for the underlying undirected graph.
+
+    The function assigns one of three colors ('r', 'b', 'g') to each node
+    such that no two adjacent nodes share the same color. It first converts
+    the input (which may be oriented) into its underlying undirected graph,
+    then colors every connected component on its own with the DSATUR
+    search (see _dsatur_color). Colors are named in order of first use,
+    so the first node is always 'r'.
+
+    Parameters
+    ----------
+    graph : dict | CSRGraph
+        A dictionary where keys are nodes and values are lists of adjacent nodes,
+        or the same graph in CSR form.
+    budget : Budget, optional
+        Limits on time and on the number of tried colors (search steps).
+    workers : int, optional
+        Colors the components in a process pool, see k_coloring.
+
+    Returns
+    -------
+    list[tuple] | str | SearchUnknown
+        A list of (node, color) pairs if coloring is possible, otherwise
+        "Impossible to paint". SearchUnknown if the budget ran out first;
+        its partial is the largest partial coloring found.
+
+    Doctests
+    --------
+    >>> three_coloring({})              # empty graph
+    []
+
+    >>> three_coloring({1: []})         # one node
+    [(1, 'r')]
+
+    >>> result = three_coloring({       # path: 1 - 2 - 3 (undirected input)
+    ...     1: [2],
+    ...     2: [1, 3],
+    ...     3: [2]
+    ... })
+    >>> len(result)
+    3
+    >>> all(color in {'r', 'b', 'g'} for _, color in result)
+    True
+
+    >>> result = three_coloring({       # triangle: 1-2-3 fully connected (undirected input)
+    ...     1: [2, 3],
+    ...     2: [1, 3],
+    ...     3: [1, 2]
+    ... })
+    >>> len(result)
+    3
+    >>> all(color in {'r', 'b', 'g'} for _, color in result)
+    True
+
+    >>> three_coloring({                # K4 – 4 fully connected nodes → impossible
+    ...     1: [2, 3, 4],
+    ...     2: [1, 3, 4],
+    ...     3: [1, 2, 4],
+    ...     4: [1, 2, 3]
+    ... })
+    'Impossible to paint'
+
+    >>> three_coloring({                # Oriented path 1 -> 2 -> 3 (Underlying graph is P3)
+    ...     1: [2],
+    ...     2: [3],
+    ...     3: []
+    ... })
+    [(1, 'r'), (2, 'b'), (3, 'r')]
+
+    >>> k4 = {1: [2, 3, 4], 2: [3, 4], 3: [4]}
+    >>> three_coloring(k4, Budget(max_steps=2))
+    SearchUnknown(reason='max_steps', nodes_expanded=3, max_depth=3, partial=[(1, 'r'), (2, 'b')])
+    """
+    csr = as_csr(graph).undirected()
+    labels = csr.labels
+    colors = k_coloring(csr, 3, budget, workers)
+    if isinstance(colors, SearchUnknown):
+        return colors._replace(partial=[(labels[node], 'rbg'[c])
+                                        for node, c in enumerate(colors.partial) if c >= 0])
+    if colors is None:
+        return 'Impossible to paint'
+    return [(node, 'rbg'[c]) for node, c in zip(labels, colors.tolist())]
+
+
+@profiling.solve
+def k_coloring(graph, k: int, budget: Budget | None = None, workers: int = 1):
+    """
+    Colors the underlying undirected graph with at most k colors.
+
+    The greedy DSATUR heuristic is tried first; the exact search runs only
+    if the heuristic needed more than k colors.
+
+    Parameters
+    ----------
+    graph : dict | CSRGraph
+        The graph; node i is as_csr(graph).labels[i].
+    k : int
+        Number of colors.
+    budget : Budget, optional
+        Limits for the exact search.
+    workers : int, optional
+        If not 1, every connected component is colored on its own in a
+        process pool of that many processes (None: one per core). Every
+        worker gets a copy of the budget, so max_steps is counted per
+        component. A budget with a cancellation token keeps the search in
+        this process, since the token can not be sent to workers.
+
+    Returns
+    -------
+    numpy.ndarray | None | SearchUnknown
+        colors[i] in 0..k-1 is the color of node i, numbered in order of
+        first use. None if k colors are not enough. SearchUnknown if the
+        budget ran out; its partial has -1 for nodes without a color.
+
+    Doctests
+    --------
+    >>> k_coloring({1: [2], 2: [3], 3: [1]}, 3).tolist()
+    [0, 1, 2]
+    >>> k_coloring({1: [2], 2: [3], 3: [1]}, 2) is None
+    True
+    >>> k_coloring({1: [2, 3], 4: [2, 3]}, 2).tolist()     # nodes 1, 4, 2, 3
+    [0, 0, 1, 1]
+    """
+    with profiling.phase('normalize'):
+        csr = as_csr(graph).undirected()
+    if workers != 1 and (budget is None or budget.token is None):
+        parts = component_subgraphs(csr)
+        results = map_components(_k_coloring_task, [(part, k, budget) for part in parts],
+                                 workers)
+        if any(result is None for result in results):
+            return None
+        colors = _merge_colors(len(csr), parts, [result.partial if isinstance(result, SearchUnknown)
+                                                 else result for result in results])
+        unknown = _merge_unknown(results, colors)
+        return colors if unknown is None else unknown._replace(partial=colors)
+
+    with profiling.phase('normalize'):
+        adj = csr.adjacency()
+    if any(node in neighbors for node, neighbors in enumerate(adj)):
+        return None #a loop can't be painted at all
+    colors = greedy_coloring(adj, 'dsatur')
+    if max(colors, default=-1) < k:
+        return _color_array(colors, k)
+    budget = profiling.counting_budget(budget)
+    steps = 0 if budget is None else budget.steps
+    try:
+        colors = _dsatur_color(adj, bfs_forest(csr).component_nodes(), k, budget)
+    except _OutOfBudget as stop:
+        partial = [-1] * len(adj)
+        for node, c in stop.colors.items():
+            partial[node] = c
+        return budget.unknown(_color_array(partial, k))
+    finally:
+        if budget is not None:
+            profiling.count('coloring.nodes_expanded', budget.steps - steps)
+    return None if colors is None else _color_array(colors, k)
+
+
+@profiling.solve
+def chromatic_number(graph, budget: Budget | None = None, workers: int = 1):
+    """
+    Finds the smallest number of colors for the underlying undirected graph.
+
+    The greedy largest-first and DSATUR colorings give an upper bound, a
+    greedy clique (and an odd cycle) gives a lower bound. If they meet, no
+    search is needed; otherwise the exact search tries only the numbers
+    between them, from the smallest.
+
+    With workers other than 1 every connected component gets its own
+    chromatic number in a process pool (as in k_coloring), and the graph
+    needs the largest of them.
+
+    Returns
+    -------
+    tuple[int, numpy.ndarray] | None | SearchUnknown
+        (number of colors, colors of nodes as in k_coloring). None if the
+        graph has a loop. SearchUnknown if the budget ran out; its partial
+        is (lower bound, upper bound, best coloring found).
+
+    Doctests
+    --------
+    >>> chromatic_number({})
+    (0, array([], dtype=uint8))
+    >>> k, colors = chromatic_number({1: [2, 3, 4], 2: [3, 4], 3: [4], 5: [1]})
+    >>> k, colors.tolist()      # nodes 1, 2, 3, 5, 4
+    (4, [0, 1, 2, 1, 3])
+    >>> chromatic_number({i: [(i + 1) % 5] for i in range(5)})[0]    # odd cycle
+    3
+    """
+    with profiling.phase('normalize'):
+        csr = as_csr(graph).undirected()
+    if workers != 1 and (budget is None or budget.token is None):
+        parts = component_subgraphs(csr)
+        results = map_components(_chromatic_task, [(part, budget) for part in parts], workers)
+        if any(result is None for result in results):
+            return None
+        lower = max((result.partial[0] if isinstance(result, SearchUnknown) else result[0]
+                     for result in results), default=0)
+        upper = max((result.partial[1] if isinstance(result, SearchUnknown) else result[0]
+                     for result in results), default=0)
+        colors = _merge_colors(len(csr), parts, [result.partial[2] if isinstance(result, SearchUnknown)
+                                                 else result[1] for result in results])
+        unknown = _merge_unknown(results, colors)
+        if unknown is not None and lower < upper:
+            return unknown._replace(partial=(lower, upper, colors))
+        return upper, colors
+
+    with profiling.phase('normalize'):
+        adj = csr.adjacency()
+    if any(node in neighbors for node, neighbors in enumerate(adj)):
+        return None
+    if not adj:
+        return 0, _color_array([], 1)
+
+    upper_colors = min((greedy_coloring(adj, order) for order in ('largest_first', 'dsatur')),
+                       key=max)
+    upper = max(upper_colors) + 1
+    lower = max(len(_greedy_clique(adj)), 2 if any(adj) else 1)
+    if lower < 3 <= upper and not is_bipartite(csr):
+        lower = 3
+
+    components = bfs_forest(csr).component_nodes()
+    budget = profiling.counting_budget(budget)
+    steps = 0 if budget is None else budget.steps
+    try:
+        for k in range(lower, upper):
+            try:
+                colors = _dsatur_color(adj, components, k, budget)
+            except _OutOfBudget:
+                return budget.unknown((k, upper, _color_array(upper_colors, upper)))
+            if colors is not None:
+                return k, _color_array(colors, k)
+    finally:
+        if budget is not None:
+            profiling.count('coloring.nodes_expanded', budget.steps - steps)
+    return upper, _color_array(upper_colors, upper)
+
+
+def labeled_coloring(graph, result):
+    """
+    A result of k_coloring or chromatic_number with its color array
+    (indexed by node id) replaced by a dict label -> color, also inside
+    a SearchUnknown partial; nodes without a color are left out. Node ids
+    follow the order of the input lines, so only this form may outlive
+    the graph it came from (in a cache, in JSON).
+
+    >>> graph = {'b': ['c'], 'c': ['a']}
+    >>> labeled_coloring(graph, chromatic_number(graph))
+    (2, {'b': 0, 'c': 1, 'a': 0})
+    >>> labeled_coloring(graph, k_coloring({'b': ['c', 'b']}, 2)) is None
+    True
+    """
+    if result is None:
+        return None
+    if isinstance(result, SearchUnknown):
+        return result._replace(partial=labeled_coloring(graph, result.partial))
+    if isinstance(result, tuple):
+        return (*result[:-1], labeled_coloring(graph, result[-1]))
+    return {label: c for label, c in zip(as_csr(graph).labels, result.tolist()) if c >= 0}
+
+
+def _k_coloring_task(task):
+    """k_coloring of one component (in a worker process)."""
+    part, k, budget = task
+    return k_coloring(part, k, budget)
+
+
+def _chromatic_task(task):
+    """chromatic_number of one component (in a worker process)."""
+    part, budget = task
+    return chromatic_number(part, budget)
+
+
+def _merge_colors(n: int, parts: list, colorings: list) -> np.ndarray:
+    """One coloring of the whole graph from the colorings of its components."""
+    colors = np.full(n, -1, dtype=np.int64)
+    for part, part_colors in zip(parts, colorings):
+        colors[part.labels] = part_colors
+    colors = colors.tolist()
+    return _color_array(colors, max(colors, default=0) + 1)
+
+
+def _merge_unknown(results: list, partial) -> SearchUnknown | None:
+    """One SearchUnknown for the components that ran out of budget, or None."""
+    unknown = [result for result in results if isinstance(result, SearchUnknown)]
+    if not unknown:
+        return None
+    return SearchUnknown(unknown[0].reason, sum(result.nodes_expanded for result in unknown),
+                         max(result.max_depth for result in unknown), partial)
+
+
+def greedy_coloring(adj: list, order: str = 'dsatur') -> list[int]:
+    """
+    First-fit coloring of an undirected adjacency list without backtracking.
+    order is 'largest_first' (by degree) or 'dsatur' (the node with the most
+    distinct colors around it first). Gives an upper bound on the number
+    of colors.
+
+    >>> greedy_coloring([[1, 2], [0, 2], [0, 1], []], 'largest_first')
+    [0, 1, 2, 0]
+    """
+    n = len(adj)
+    colors = [-1] * n
+
+    def first_fit(node):
+        used = {colors[other] for other in adj[node]}
+        c = 0
+        while c in used:
+            c += 1
+        colors[node] = c
+
+    if order == 'largest_first':
+        for node in sorted(range(n), key=lambda node: -len(adj[node])):
+            first_fit(node)
+        return colors
+    if order != 'dsatur':
+        raise ValueError(f'Unknown order: {order!r}')
+
+    around = [set() for _ in range(n)] #distinct colors of painted neighbors
+    heap = [(0, -len(adj[node]), node) for node in range(n)]
+    heapq.heapify(heap)
+    while heap:
+        saturation, _, node = heapq.heappop(heap)
+        if colors[node] >= 0 or -saturation != len(around[node]):
+            continue #lazy deletion of outdated entries
+        first_fit(node)
+        for other in adj[node]:
+            if colors[other] < 0 and colors[node] not in around[other]:
+                around[other].add(colors[node])
+                heapq.heappush(heap, (-len(around[other]), -len(adj[other]), other))
+    return colors
+
+
+# how many of the largest-degree nodes _greedy_clique starts from
+CLIQUE_STARTS = 64
+
+
+def _greedy_clique(adj: list) -> list[int]:
+    """A large clique found greedily from the nodes of the largest degree."""
+    best = []
+    starts = sorted(range(len(adj)), key=lambda node: -len(adj[node]))[:CLIQUE_STARTS]
+    neighbor_sets = {}
+    for start in starts:
+        if len(adj[start]) < len(best):
+            break #no larger clique can contain this node
+        clique = [start]
+        for other in sorted(adj[start], key=lambda node: -len(adj[node])):
+            if other not in neighbor_sets:
+                neighbor_sets[other] = set(adj[other])
+            if all(node in neighbor_sets[other] for node in clique):
+                clique.append(other)
+        if len(clique) > len(best):
+            best = clique
+    return best
+
+
+def _color_array(colors: list, k: int) -> np.ndarray:
+    """Colors renumbered in order of first use, in the smallest integer dtype."""
+    renumber = {}
+    for c in colors:
+        if c >= 0 and c not in renumber:
+            renumber[c] = len(renumber)
+    renumber[-1] = -1
+    dtype = np.min_scalar_type(max(k - 1, 0))
+    if -1 in colors:
+        dtype = np.promote_types(dtype, np.int8)
+    return np.array([renumber[c] for c in colors], dtype=dtype)
+
+
+def _dsatur_color(adj: list, components: list, k: int,
+                  budget: Budget | None = None) -> list | None:
+    """
+    Colors an undirected adjacency list with colors 0..k-1.
+    Returns the color of every node, or None if it is impossible.
+    Raises _OutOfBudget (with the partial coloring) if the budget runs out.
+
+    Components (arrays of nodes, see BFSForest.component_nodes) are colored
+    one after another and independently, so a failure in one never makes
+    the search revisit another.
+    """
+    n = len(adj)
+    if any(node in neighbors for node, neighbors in enumerate(adj)):
+        return None #a loop can't be painted at all
+    color = [-1] * n
+    state = _SearchState(adj, k, color, budget)
+    for component in components:
+        if not state.color_component(component.tolist()):
+            return None
+    return color
+
+
+class _SearchState:
+    """
+    DSATUR search with forward checking and conflict-directed backjumping.
+
+    * DSATUR: the next node is the one with the fewest colors left (ties:
+      the largest degree), taken from a heap with lazy deletion.
+    * forward checking: every node keeps a bitmask of colors that are
+      still allowed. Painting a node removes its color from the masks of
+      its neighbors at once; an empty mask is a dead end right away.
+    * backjumping: every decision level remembers which earlier levels
+      caused its failures, and when it runs out of colors the search jumps
+      straight to the latest of them instead of the previous level.
+    """
+    def __init__(self, adj, k, color, budget):
+        self.adj = adj
+        self.color = color
+        self.budget = budget
+        self.full = (1 << k) - 1
+        self.domain = [self.full] * len(adj)
+        self.level_of = [-1] * len(adj)
+        self.heap = []
+        self.trail = []     # (node, removed color bit) for undo
+        self.best = {}      # the deepest partial coloring of the current component
+
+    def push(self, node):
+        heapq.heappush(self.heap,
+                       (self.domain[node].bit_count(), -len(self.adj[node]), node))
+
+    def pick(self):
+        """The uncolored node with the smallest domain, or None."""
+        heap, color, domain = self.heap, self.color, self.domain
+        while heap:
+            size, _, node = heapq.heappop(heap)
+            if color[node] < 0 and domain[node].bit_count() == size:
+                return node
+        return None
+
+    def undo(self, trail_start):
+        """Gives back the colors removed after trail_start."""
+        trail, domain = self.trail, self.domain
+        while len(trail) > trail_start:
+            node, bit = trail.pop()
+            domain[node] |= bit
+            self.push(node)
+
+    def color_component(self, nodes) -> bool:
+        adj, color, domain, level_of = self.adj, self.color, self.domain, self.level_of
+        budget, trail = self.budget, self.trail
+        for node in nodes:
+            self.push(node)
+        self.best = {}
+
+        # every level: [node, colors left to try, trail length before it, conflict levels]
+        levels = []
+        new_level = True
+        while True:
+            if new_level:
+                node = self.pick()
+                if node is None:
+                    for level in levels:
+                        level_of[level[0]] = -1 #the component is finished
+                    return True
+                conflicts = {level_of[other] for other in adj[node] if color[other] >= 0}
+                levels.append([node, domain[node], len(trail), conflicts])
+                level_of[node] = len(levels) - 1
+            level = levels[-1]
+            node, left, trail_start, conflicts = level
+            if not new_level:
+                # take back the previous color of this node
+                self.undo(trail_start)
+                color[node] = -1
+            new_level = False
+
+            if not left:
+                # no color fits: jump back to the latest level in conflict
+                if not conflicts:
+                    self._drop_levels(levels, 0)
+                    return False
+                target = max(conflicts)
+                self._drop_levels(levels, target + 1)
+                levels[target][3] |= conflicts - {target}
+                continue
+
+            bit = left & -left
+            level[1] = left ^ bit
+            if budget is not None and budget.spend(len(levels)):
+                raise _OutOfBudget(self.partial(levels))
+            color[node] = bit.bit_length() - 1
+
+            # forward checking
+            wiped = None
+            for other in adj[node]:
+                if color[other] < 0 and domain[other] & bit:
+                    domain[other] ^= bit
+                    trail.append((other, bit))
+                    self.push(other)
+                    if not domain[other]:
+                        wiped = other
+                        break
+            if wiped is None:
+                new_level = True
+            else:
+                conflicts |= {level_of[other] for other in adj[wiped]
+                              if color[other] >= 0 and other != node}
+
+    def partial(self, levels) -> dict:
+        """Finished components plus the deepest coloring of the current one."""
+        color = self.color
+        current = {level[0]: color[level[0]] for level in levels if color[level[0]] >= 0}
+        colors = {node: c for node, c in enumerate(color)
+                  if c >= 0 and self.level_of[node] < 0}
+        colors.update(max(self.best, current, key=len))
+        return colors
+
+    def _drop_levels(self, levels, keep):
+        """Uncolors the nodes of all levels from keep on."""
+        if len(levels) - 1 > len(self.best):
+            # the top level has no color now, the ones below are kept
+            self.best = {level[0]: self.color[level[0]] for level in levels[:-1]}
+        while len(levels) > keep:
+            node, _, trail_start, _ = levels.pop()
+            self.undo(trail_start)
+            self.color[node] = -1
+            self.level_of[node] = -1
+            self.push(node)
+
+
+if __name__ == '__main__':
+    import doctest
+    print(doctest.testmod())
@@ -1,21 +1,37 @@
 '''isomorphism'''
 import hashlib
+from collections import Counter
 
-def are_isomorphic(graph1: dict, graph2: dict) -> bool:
+import numpy as np
+
+from . import profiling
+from .budget import Budget, SearchUnknown
+from .csr_graph import CSRGraph, as_csr
+
+# changes whenever graph_fingerprint starts to give other digests,
+# so that stored fingerprints can be recomputed
+FINGERPRINT_VERSION = 3
+
+@profiling.solve
+def are_isomorphic(graph1: dict, graph2: dict, budget: Budget | None = None):
     '''
-    Determines if two directed graphs are isomorphic using the Weisfeiler-Lehman (1-WL) test.
+    Determines if two directed graphs are isomorphic.
 
-    This function first performs fast-fail checks (e.g., node count comparison).
-    If they pass, it computes canonical structural hashes for both graphs by
-    aggregating both incoming and outgoing neighbor information to handle edge direction correctly.
+    This function first performs fast-fail checks (node and arc counts) and
+    compares the Weisfeiler-Lehman (1-WL) colors of both graphs, which
+    aggregate both incoming and outgoing neighbor information to handle
+    edge direction correctly. If the colors match, the answer is confirmed
+    by find_isomorphism, so a True is never a guess.
 
     Args:
         graph1: dict of the first graph
-            (keys are nodes, values are sets of outgoing neighbors).
-        graph2: dict of the second graph.
+            (keys are nodes, values are sets of outgoing neighbors), or a CSRGraph.
+        graph2: dict or CSRGraph of the second graph.
+        budget: optional Budget for the exact search.
 
     Returns:
-        bool: True if the graphs are likely isomorphic (structurally identical), False otherwise.
+        bool: True if the graphs are isomorphic, False otherwise,
+        or SearchUnknown if the budget ran out.
 
     Examples:
         >>> G_A = {'a': ['b'], 'b': []}
@@ -35,40 +51,309 @@ def are_isomorphic(graph1: dict, graph2: dict) -> bool:
         >>> G_Tri2 = {10: [20], 20: [30], 30: [10]}
         >>> are_isomorphic(G_Tri1, G_Tri2)
         True
+
+        A 6-cycle and two triangles have equal WL colors, but are not isomorphic:
+
+        >>> C6 = {i: [(i - 1) % 6, (i + 1) % 6] for i in range(6)}
+        >>> two_triangles = {i: [3 * (i // 3) + (i + 1) % 3, 3 * (i // 3) + (i + 2) % 3]
+        ...                  for i in range(6)}
+        >>> graph_fingerprint(C6) == graph_fingerprint(two_triangles)
+        True
+        >>> are_isomorphic(C6, two_triangles)
+        False
     '''
-    if len(graph1) != len(graph2): # check number of nodes
-        return False
+    result = find_isomorphism(graph1, graph2, budget)
+    if isinstance(result, SearchUnknown):
+        return result
+    return result is not None
+
+
+@profiling.solve
+def find_isomorphism(graph1, graph2, budget: Budget | None = None):
+    '''
+    Exact isomorphism test that returns the node mapping.
+
+    Nodes may only be mapped to nodes of the same stable WL color, so
+    the search only branches inside color classes that refinement could
+    not split. Nodes of graph1 are matched in BFS order (VF2 style): every
+    node after the first of its component has a matched neighbor, and
+    its candidates are the matching neighbors of that neighbor's image.
+    Each candidate is checked against the arcs to all matched nodes,
+    counting parallel arcs and loops.
+
+    Args:
+        graph1: dict, (connections, edges) tuple or CSRGraph.
+        graph2: graph in any of the same forms.
+        budget: optional Budget; one step is one candidate pair tried.
+
+    Returns:
+        dict: label of graph1 -> label of graph2, or None if the graphs
+        are not isomorphic, or SearchUnknown (partial is the mapping of
+        the search state it stopped in) if the budget ran out.
+
+    Examples:
+        >>> find_isomorphism({'a': ['b'], 'b': ['c']}, {1: [2], 0: [1]})
+        {'a': 0, 'b': 1, 'c': 2}
+        >>> find_isomorphism({0: [1], 1: [0]}, {0: [0], 1: [1]}) is None
+        True
+    '''
+    graph1, graph2 = as_csr(graph1), as_csr(graph2)
+    if len(graph1) != len(graph2) or graph1.num_arcs != graph2.num_arcs:
+        return None
+    # both graphs are refined together, so that equal ids mean equal colors
+    colors = _wl_colors(_disjoint_union(graph1, graph2)).tolist()
+    colors1, colors2 = colors[:len(graph1)], colors[len(graph1):]
+    if sorted(colors1) != sorted(colors2):
+        return None
+
+    out1, in1 = _arc_counts(graph1), _arc_counts(graph1.transpose())
+    out2, in2 = _arc_counts(graph2), _arc_counts(graph2.transpose())
+    classes = {}
+    for node, color in enumerate(colors2):
+        classes.setdefault(color, []).append(node)
 
-    def hash_wl(graph: dict) -> list:
-        '''
-        Computes the canonical sorted hash list for a single graph.
-        '''
-        incoming = {node: [] for node in graph}
+    order, parent = _match_order(out1, in1, colors1, classes)
+    n = len(order)
+    if n == 0:
+        return {}
+    mapping = [-1] * n          # node of graph1 -> node of graph2
+    used = bytearray(n)         # nodes of graph2 that are already images
+    budget = budget if budget is not None else Budget()
+    steps = budget.steps
 
-        for key, values in graph.items():
-            for value in values:
-                if value in incoming:
-                    incoming[value].append(key)
+    def candidates(depth):
+        node, anchor = order[depth], parent[depth]
+        color = colors1[node]
+        if anchor < 0:
+            pool = classes[color]
+        else:
+            image = mapping[anchor]
+            pool = (out2[image] if node in out1[anchor] else in2[image]).keys()
+        return iter([v for v in pool if not used[v] and colors2[v] == color])
 
-        colors = {node: str(len(graph[node])) for node in graph}
+    def feasible(node, image):
+        if out1[node].get(node, 0) != out2[image].get(image, 0):
+            return False
+        for counts1, counts2 in ((out1, out2), (in1, in2)):
+            mapped = 0
+            for neighbor, count in counts1[node].items():
+                if neighbor != node and mapping[neighbor] >= 0:
+                    if counts2[image].get(mapping[neighbor]) != count:
+                        return False
+                    mapped += 1
+            # graph2 must not have arcs to matched nodes that graph1 lacks
+            if mapped != sum(1 for neighbor in counts2[image]
+                             if neighbor != image and used[neighbor]):
+                return False
+        return True
 
-        for _ in range(3):
-            new_colors = {}
+    try:
+        depth = 0
+        stack = [candidates(0)]
+        while stack:
+            node = order[depth]
+            if mapping[node] >= 0:
+                used[mapping[node]] = 0
+                mapping[node] = -1
+            for image in stack[-1]:
+                if budget.spend(depth + 1):
+                    labels1, labels2 = graph1.labels, graph2.labels
+                    return budget.unknown({labels1[u]: labels2[mapping[u]] for u in order[:depth]})
+                if feasible(node, image):
+                    mapping[node] = image
+                    used[image] = 1
+                    break
+            else:
+                stack.pop()
+                depth -= 1
+                continue
+            depth += 1
+            if depth == n:
+                labels1, labels2 = graph1.labels, graph2.labels
+                return {labels1[u]: labels2[mapping[u]] for u in range(n)}
+            stack.append(candidates(depth))
+        return None
+    finally:
+        profiling.count('isomorphism.candidates', budget.steps - steps)
 
-            for node in graph:
-                out_colors = sorted([colors[n] for n in graph[node]])
-                in_colors = sorted([colors[n] for n in incoming[node]])
 
-                nickname = colors[node] + ''.join(in_colors) + ''.join(out_colors)
-                new_colors[node] = hashlib.sha256(nickname.encode()).hexdigest()
+def _disjoint_union(graph1: CSRGraph, graph2: CSRGraph) -> CSRGraph:
+    '''Graph with the nodes of graph1 followed by the nodes of graph2.'''
+    offsets = np.concatenate((graph1.offsets, graph2.offsets[1:] + graph1.num_arcs))
+    neighbors = np.concatenate((graph1.neighbors.astype(np.int64),
+                                graph2.neighbors.astype(np.int64) + len(graph1)))
+    return CSRGraph(offsets, neighbors)
 
-            colors = new_colors
 
-        return sorted(colors.values())
+def _arc_counts(graph: CSRGraph) -> list[Counter]:
+    '''Number of arcs from every node to each of its neighbors.'''
+    return [Counter(neighbors) for neighbors in graph.adjacency()]
 
-    h1 = hash_wl(graph1)
-    h2 = hash_wl(graph2)
-    return h1 == h2
+
+def _match_order(out_counts, in_counts, colors, classes):
+    '''
+    Order in which find_isomorphism matches the nodes of the first graph,
+    and for every position the already ordered neighbor that anchors the
+    node (-1 for the first node of a component).
+
+    Every component starts at a node of the smallest remaining color
+    class, then goes breadth-first; nodes of one BFS level with small
+    color classes and many arcs go first, since they have fewest
+    candidates and prune the most.
+    '''
+    n = len(colors)
+    placed = bytearray(n)
+    order, parent = [], []
+
+    def rank(node):
+        return (len(classes[colors[node]]), -len(out_counts[node]) - len(in_counts[node]))
+
+    for root in sorted(range(n), key=rank):
+        if placed[root]:
+            continue
+        placed[root] = 1
+        order.append(root)
+        parent.append(-1)
+        level = [root]
+        while level:
+            next_level = {}
+            for node in level:
+                for neighbor in list(out_counts[node]) + list(in_counts[node]):
+                    if not placed[neighbor] and neighbor not in next_level:
+                        next_level[neighbor] = node
+            level = sorted(next_level, key=rank)
+            for node in level:
+                placed[node] = 1
+                order.append(node)
+                parent.append(next_level[node])
+    return order, parent
+
+
+def _wl_colors(graph: CSRGraph, digest=None) -> np.ndarray:
+    '''
+    Stable 1-WL color of every node as a small integer. Refinement starts
+    from the out-degree and stops once a round does not split any color
+    class.
+
+    Every round a node gets a 64-bit key built from its color and the sums
+    of mixed codes of its in- and out-neighbor colors, and its new color is
+    the rank of that key, so colors stay dense ids 0..k-1 instead of growing
+    strings. Each new class is then checked exactly against its first node
+    (same old color, same neighbor multisets), and the round is redone with
+    other codes if two different nodes got the same key.
+
+    Color ids only mean something together with the keys of all rounds:
+    if digest (a hashlib object) is given, the keys of every round are
+    fed to it.
+    '''
+    sides = []
+    for side in (graph, graph.transpose()):
+        sides.append((side.offsets, side.neighbors.astype(np.int64), side.sources()))
+
+    keys, colors = np.unique(graph.degrees(), return_inverse=True)
+    if digest is not None:
+        digest.update(keys.astype(np.int64).tobytes())
+    salt = rounds = 0
+
+    while len(colors):
+        node_keys = _mix(colors, salt)
+        for offsets, neighbors, _ in sides:
+            node_keys = _mix(node_keys, salt) ^ _segment_sums(_mix(colors[neighbors], salt), offsets)
+        keys, new_colors, representatives = _rank(node_keys)
+        if not (np.array_equal(colors, colors[representatives])
+                and all(_same_multisets(side, colors, representatives) for side in sides)):
+            salt += 1
+            continue
+
+        rounds += 1
+        if digest is not None:
+            digest.update(keys.tobytes())
+        stable = len(keys) == colors.max() + 1
+        colors = new_colors
+        if stable:
+            break
+    profiling.count('wl.rounds', rounds)
+    profiling.count('wl.colors', len(keys))
+    profiling.count('wl.retries', salt)
+    return colors
+
+
+def _rank(values: np.ndarray):
+    '''
+    Distinct values, the rank of every value among them and, for every
+    position, some position that holds the same value.
+    '''
+    order = np.argsort(values)
+    ordered = values[order]
+    starts = np.empty(len(values), dtype=bool)
+    starts[:1] = True
+    np.not_equal(ordered[1:], ordered[:-1], out=starts[1:])
+    ranks = np.cumsum(starts) - 1
+    inverse = np.empty_like(ranks)
+    inverse[order] = ranks
+    return ordered[starts], inverse, order[np.flatnonzero(starts)][inverse]
+
+
+def _mix(values: np.ndarray, salt: int) -> np.ndarray:
+    '''splitmix64 of every value: spreads small color ids over 64 bits.'''
+    with np.errstate(over='ignore'):
+        z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15) * np.uint64(salt + 1)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def _segment_sums(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    '''Sum (mod 2^64) of values[offsets[i]:offsets[i + 1]] for every node i.'''
+    starts = offsets[:-1]
+    # the padding keeps the start of trailing empty segments in range
+    sums = np.add.reduceat(np.append(values, np.uint64(0)), starts)
+    sums[starts == offsets[1:]] = 0
+    return sums
+
+
+def _same_multisets(side, colors: np.ndarray, representatives: np.ndarray) -> bool:
+    '''
+    True if every node has the same multiset of neighbor colors as its
+    representative node. side is (offsets, neighbors, sources) of a CSR graph.
+    '''
+    offsets, neighbors, sources = side
+    degrees = np.diff(offsets)
+    if not np.array_equal(degrees, degrees[representatives]):
+        return False
+    # arcs are grouped by source, so one sort orders the colors of every node
+    base = sources * (colors.max() + 1)
+    ordered = np.sort(base + colors[neighbors]) - base
+    positions = offsets[representatives][sources] + np.arange(len(sources)) - offsets[sources]
+    return np.array_equal(ordered, ordered[positions])
+
+
+@profiling.solve
+def graph_fingerprint(graph) -> str:
+    '''
+    Isomorphism-invariant fingerprint of a graph: a sha256 hex digest of
+    its 1-WL refinement (the color keys of every round and the size of
+    every stable color class). Isomorphic graphs always get the same
+    fingerprint; different fingerprints mean the graphs are not isomorphic.
+    Equal fingerprints only put graphs in the same bucket, they still need
+    an exact check.
+
+    Args:
+        graph: dict, (connections, edges) tuple or CSRGraph.
+
+    Examples:
+        >>> graph_fingerprint({'a': ['b'], 'b': []}) == graph_fingerprint({1: [2], 2: []})
+        True
+        >>> graph_fingerprint({0: [1], 1: [2], 2: []}) == graph_fingerprint({0: [1], 2: [1]})
+        False
+        >>> len(graph_fingerprint({}))
+        64
+    '''
+    graph = as_csr(graph)
+    digest = hashlib.sha256(f'{len(graph)}:{graph.num_arcs}'.encode())
+    colors = _wl_colors(graph, digest)
+    digest.update(np.bincount(colors).astype(np.int64).tobytes())
+    return digest.hexdigest()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,122 @@
+'''Persistent fingerprint index for finding isomorphic graphs in a corpus'''
+import os
+import sqlite3
+
+import numpy as np
+
+from .csr_graph import CSRGraph, as_csr
+from .isomorphism import FINGERPRINT_VERSION, are_isomorphic, graph_fingerprint
+
+
+class FingerprintIndex:
+    '''
+    On-disk index of graphs by their isomorphism fingerprint, kept in an
+    SQLite file inside a directory.
+
+    A new graph is looked up by its fingerprint (one indexed query) and is
+    compared exactly only with the graphs of the same bucket, so
+    deduplicating N graphs takes N lookups instead of N^2 comparisons.
+    The structure of every graph is stored as well: when graph_fingerprint
+    changes, the fingerprints are recomputed from it on open.
+
+    >>> import tempfile
+    >>> with FingerprintIndex(tempfile.mkdtemp()) as index:
+    ...     index.add('path', {'a': ['b'], 'b': ['c']})
+    ...     index.add('other path', {1: [2], 2: [3]})
+    ...     index.add('star', {0: [1, 2]})
+    ...     index.find({'x': ['y'], 'y': ['z']}), len(index)
+    'path'
+    ('path', 2)
+    '''
+    FILENAME = 'fingerprints.sqlite'
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, self.FILENAME)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS graphs (
+                id TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                offsets BLOB NOT NULL,
+                neighbors BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS graphs_fingerprint ON graphs (fingerprint);
+        ''')
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or int(row[0]) != FINGERPRINT_VERSION:
+            self._refingerprint()
+
+    def _refingerprint(self) -> None:
+        '''Recomputes stored fingerprints after graph_fingerprint changed.'''
+        with self.connection:
+            rows = self.connection.execute(
+                'SELECT id, offsets, neighbors FROM graphs').fetchall()
+            self.connection.executemany(
+                'UPDATE graphs SET fingerprint = ? WHERE id = ?',
+                [(graph_fingerprint(_decode(offsets, neighbors)), graph_id)
+                 for graph_id, offsets, neighbors in rows])
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('version', ?)",
+                (str(FINGERPRINT_VERSION),))
+
+    def _match(self, graph: CSRGraph, fingerprint: str) -> str | None:
+        '''Id of a stored graph isomorphic to graph, or None.'''
+        rows = self.connection.execute(
+            'SELECT id, offsets, neighbors FROM graphs WHERE fingerprint = ?',
+            (fingerprint,))
+        for graph_id, offsets, neighbors in rows:
+            if are_isomorphic(graph, _decode(offsets, neighbors)):
+                return graph_id
+        return None
+
+    def find(self, graph) -> str | None:
+        '''Id of an indexed graph isomorphic to graph, or None.'''
+        graph = as_csr(graph)
+        return self._match(graph, graph_fingerprint(graph))
+
+    def add(self, graph_id: str, graph) -> str | None:
+        '''
+        Adds a graph unless an isomorphic one is already indexed.
+
+        Returns:
+            The id of the isomorphic graph that is already in the index,
+            or None if graph was new and got stored under graph_id.
+        '''
+        graph = as_csr(graph)
+        fingerprint = graph_fingerprint(graph)
+        duplicate = self._match(graph, fingerprint)
+        if duplicate is None:
+            with self.connection:
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO graphs VALUES (?, ?, ?, ?)',
+                    (graph_id, fingerprint,
+                     np.asarray(graph.offsets, dtype='<i8').tobytes(),
+                     np.asarray(graph.neighbors, dtype='<i8').tobytes()))
+        return duplicate
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM graphs').fetchone()[0]
+
+    def close(self) -> None:
+        '''Closes the database file.'''
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _decode(offsets: bytes, neighbors: bytes) -> CSRGraph:
+    '''Graph structure stored in the index (labels are not kept).'''
+    return CSRGraph(np.frombuffer(offsets, dtype='<i8'),
+                    np.frombuffer(neighbors, dtype='<i8'))
+
+
+if __name__ == '__main__':
+    import doctest
+    print(doctest.testmod())
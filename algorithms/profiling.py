@@ -0,0 +1,114 @@
+'''Opt-in timings of the phases of a run and counters of the searches'''
+import functools
+import time
+from contextlib import contextmanager, nullcontext
+
+from .budget import Budget
+
+# the Profile that records, or None while profiling is off
+_active = None
+# returned by phase() while profiling is off, so a phase costs one check
+_OFF = nullcontext()
+
+
+class Profile:
+    '''
+    Seconds spent in every phase ('load', 'normalize', 'solve') and the
+    counters of the algorithms. A phase inside another one is not counted
+    twice: the outer phase only gets the time outside the inner one.
+
+    Searches that run in worker processes (workers != 1) report their
+    counters in the workers, so these counters are missing here.
+
+    >>> profile = Profile()
+    >>> with profile.phase('solve'):
+    ...     profile.count('wl.rounds', 2)
+    >>> sorted(profile.phases), profile.counters
+    (['solve'], {'wl.rounds': 2})
+    '''
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+        self._nested = []      # time of the inner phases of every open phase
+
+    @contextmanager
+    def phase(self, name: str):
+        '''Adds the time of the with block to phase name.'''
+        self._nested.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            own = elapsed - self._nested.pop()
+            self.phases[name] = self.phases.get(name, 0.0) + own
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def count(self, name: str, value: int = 1) -> None:
+        '''Adds value to counter name.'''
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> dict:
+        '''Phases and counters as a JSON-ready dict.'''
+        return {'phases': dict(self.phases), 'counters': dict(self.counters)}
+
+
+@contextmanager
+def profiling():
+    '''
+    Records the phases and counters of everything run inside the with
+    block into a new Profile.
+
+    >>> with profiling() as profile:
+    ...     count('euler.edges_popped', 3)
+    >>> profile.counters
+    {'euler.edges_popped': 3}
+    >>> count('euler.edges_popped')     # profiling is off again: ignored
+    >>> profile.counters
+    {'euler.edges_popped': 3}
+    '''
+    global _active
+    previous, _active = _active, Profile()
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+def phase(name: str):
+    '''Context manager that times phase name while profiling is on.'''
+    return _OFF if _active is None else _active.phase(name)
+
+
+def count(name: str, value: int = 1) -> None:
+    '''Adds value to counter name while profiling is on.'''
+    if _active is not None:
+        _active.count(name, value)
+
+
+def counting_budget(budget: Budget | None) -> Budget | None:
+    '''
+    budget, or an unlimited Budget while profiling is on, so that a
+    search counts its expansions only when someone reads them.
+    '''
+    if budget is None and _active is not None:
+        return Budget()
+    return budget
+
+
+def solve(function):
+    '''Decorator: the call of an algorithm is the 'solve' phase.'''
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _active is None:
+            return function(*args, **kwargs)
+        with _active.phase('solve'):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+if __name__ == '__main__':
+    import doctest
+    print(doctest.testmod())
@@ -1,3 +1,16 @@
+import os
+from array import array
+from collections import Counter
+from typing import Iterable, Iterator, NamedTuple
+
+import numpy as np
+
+from .csr_graph import CSRGraph, LabelTable, sorted_unique
+
+# bytes of a CSV file parsed by one worker of read_graph_from_csv_parallel
+DEFAULT_CHUNK_BYTES = 64 * 2 ** 20
+
+
 def read_graph_from_csv_to_dict(filename:str, oriented:str='undirected')\
       -> dict[str, set[str]]:
     """
@@ -16,37 +29,32 @@ def read_graph_from_csv_to_dict(filename:str, oriented:str='undirected')\
                   values are sets of neighbors.
     """
 
-    try:
-        with open(filename, 'r', encoding='utf-8') as file:
-            file = file.readlines()
-    except FileNotFoundError:
-        return 'Не існує файлу з такою назвою в поточній директорії.'
+    if oriented not in ('directed', 'undirected'):
+        return 'Вкажіть "directed" у полі вводу, якщо граф орієнтований'
 
     connections = {}
 
-    for line in file:
+    try:
+        # the file is streamed line by line, not read whole with readlines()
+        with open(filename, 'r', encoding='utf-8') as file:
+            for line in file:
 
-        # Nodes are written by comma
-        line = line.strip().split(',')
-        length = len(line)
+                # Nodes are written by comma
+                line = line.strip().split(',')
+                length = len(line)
 
-        # There are no more or less than 2 nodes in each line
-        if length != 2:
-              raise ValueError('Програма зчитує лише один граф')
-        elif line[-1] == '' or line[0] == '':
-              raise ValueError('Програма не зчитує граф із ізольованими вершинами')
-        note1, note2 = line[0], line[-1]
-        if note1 in connections:
-            connections[note1] |= {note2}
-        else:
-            connections |= {note1: {note2}}
-        if oriented == 'undirected':
-            if note2 in connections:
-                connections[note2] |= {note1}
-            else:
-                connections |= {note2: {note1}}
-        elif oriented != 'directed':
-            return 'Вкажіть "directed" у полі вводу, якщо граф орієнтований'
+                # There are no more or less than 2 nodes in each line
+                if length != 2:
+                      raise ValueError('Програма зчитує лише один граф')
+                elif line[-1] == '' or line[0] == '':
+                      raise ValueError('Програма не зчитує граф із ізольованими вершинами')
+                note1, note2 = line[0], line[-1]
+                # add() instead of |= {note2}: no temporary set per edge
+                connections.setdefault(note1, set()).add(note2)
+                if oriented == 'undirected':
+                    connections.setdefault(note2, set()).add(note1)
+    except FileNotFoundError:
+        return 'Не існує файлу з такою назвою в поточній директорії.'
 
     return connections
 
@@ -95,3 +103,317 @@ def read_graph_from_csv_to_set(filename:str, oriented:str='undirected')\
             return 'Вкажіть "directed" у полі вводу, якщо граф орієнтований'
 
     return edges
+
+
+def _is_undirected(oriented: str) -> bool:
+    if oriented not in ('directed', 'undirected'):
+        raise ValueError('Вкажіть "directed" у полі вводу, якщо граф орієнтований')
+    return oriented == 'undirected'
+
+
+def iter_edges(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """
+    Yields (NodeA, NodeB) for every line 'NodeA,NodeB'.\
+          Empty lines are skipped.
+
+    Raises:
+        ValueError: If a line does not have exactly two non-empty nodes.
+
+    >>> list(iter_edges(['A,B', '', ' C , D ']))
+    [('A', 'B'), ('C', 'D')]
+    """
+    for i, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+
+        # Nodes are written by comma
+        parts = line.split(',')
+        if len(parts) != 2:
+            raise ValueError(f'Row {i}: В ребрі мають бути 2 вершини.')
+        node1, node2 = parts[0].strip(), parts[1].strip()
+        if node1 == '' or node2 == '':
+            raise ValueError(f'Row {i}: В ребрі мають бути 2 вершини.')
+        yield node1, node2
+
+
+class Graph(NamedTuple):
+    """
+    A graph read in a single pass: adjacency dict and edge set together.
+
+    It is a plain tuple, so it can be passed to find_euler_cycle as
+    (connections, edges) and unpacked the same way.
+
+    In a multigraph the values of connections are Counters (neighbor ->
+    number of parallel edges) and edges is a Counter of (source, destination).
+    """
+    connections: dict[str, set[str]] | dict[str, Counter]
+    edges: set[tuple[str, str]] | Counter
+
+
+def parse_graph_lines(lines: Iterable[str], oriented: str = 'undirected',
+                      multigraph: bool = False) -> Graph:
+    """
+    Builds the adjacency dict and the edge set from lines 'NodeA,NodeB'
+    in one pass. Lines are consumed lazily, so an open file can be passed
+    without reading it into memory first. Empty lines are skipped.
+
+    Args:
+        lines (Iterable[str]): Lines of the edge list.
+        oriented (str, optional): 'directed' or 'undirected'.\
+              Defaults to 'undirected'.
+        multigraph (bool, optional): Keep repeated lines as parallel edges,\
+              counted in Counters. A loop 'A,A' is one edge of A.
+
+    Returns:
+        Graph: (connections, edges). Every node is a key of connections,\
+              even if it has no outgoing edges.
+
+    >>> graph = parse_graph_lines(['A,B', 'B,C', ''], 'directed')
+    >>> graph.connections == {'A': {'B'}, 'B': {'C'}, 'C': set()}
+    True
+    >>> sorted(graph.edges)
+    [('A', 'B'), ('B', 'C')]
+    >>> sorted(parse_graph_lines(['A, B']).edges)
+    [('A', 'B'), ('B', 'A')]
+    >>> parse_graph_lines(['A,B,C'])
+    Traceback (most recent call last):
+    ...
+    ValueError: Row 1: В ребрі мають бути 2 вершини.
+    >>> multigraph = parse_graph_lines(['A,B', 'A,B', 'B,C'], multigraph=True)
+    >>> multigraph.connections['B'], multigraph.edges[('B', 'A')]
+    (Counter({'A': 2, 'C': 1}), 2)
+    """
+    undirected = _is_undirected(oriented)
+    if multigraph:
+        return _parse_multigraph_lines(lines, undirected)
+
+    connections = {}
+    edges = set()
+
+    for node1, node2 in iter_edges(lines):
+        connections.setdefault(node1, set()).add(node2)
+        neighbors2 = connections.setdefault(node2, set())
+        edges.add((node1, node2))
+        if undirected:
+            neighbors2.add(node1)
+            edges.add((node2, node1))
+
+    return Graph(connections, edges)
+
+
+def _parse_multigraph_lines(lines: Iterable[str], undirected: bool) -> Graph:
+    """parse_graph_lines for multigraphs: neighbors and edges are counted."""
+    connections = {}
+    edges = Counter()
+
+    for node1, node2 in iter_edges(lines):
+        connections.setdefault(node1, Counter())[node2] += 1
+        neighbors2 = connections.setdefault(node2, Counter())
+        edges[node1, node2] += 1
+        if undirected and node1 != node2:
+            neighbors2[node1] += 1
+            edges[node2, node1] += 1
+
+    return Graph(connections, edges)
+
+
+def read_graph_from_csv(filename: str, oriented: str = 'undirected',
+                        multigraph: bool = False) -> Graph:
+    """
+    Reads a graph from a CSV file (NodeA,NodeB per line) into an adjacency\
+          dict and an edge set at once.
+
+    Unlike calling read_graph_from_csv_to_dict and read_graph_from_csv_to_set\
+          one after another, the file is opened and streamed only once.
+
+    Args:
+        filename (str): Path to the CSV file.
+        oriented (str, optional): If 'directed', the graph is\
+              directed. Defaults to 'undirected'.
+        multigraph (bool, optional): Keep repeated lines as parallel edges.
+
+    Returns:
+        Graph: (connections, edges).
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If a line is not 'NodeA,NodeB'.
+    """
+    with open(filename, 'r', encoding='utf-8') as file:
+        return parse_graph_lines(file, oriented, multigraph)
+
+
+def read_graph_from_csv_to_csr(filename: str, oriented: str = 'undirected',
+                               multigraph: bool = False) -> CSRGraph:
+    """
+    Reads a graph from a CSV file (NodeA,NodeB per line) straight into\
+          a CSRGraph, without building a dict of sets first.
+
+    Labels are interned to ids while the file is streamed. Repeated\
+          edges are merged, as in the other readers, unless multigraph\
+          is set: then every line is its own arc (and its own pair of\
+          arcs if undirected; a loop is one arc).
+
+    Args:
+        filename (str): Path to the CSV file.
+        oriented (str, optional): If 'directed', the graph is\
+              directed. Defaults to 'undirected'.
+        multigraph (bool, optional): Keep repeated lines as parallel arcs.
+
+    Returns:
+        CSRGraph: The graph with neighbors sorted by node id.
+    """
+    undirected = _is_undirected(oriented)
+    table = LabelTable()
+    intern = table.intern
+    sources, targets = array('q'), array('q')
+
+    with open(filename, 'r', encoding='utf-8') as file:
+        for node1, node2 in iter_edges(file):
+            sources.append(intern(node1))
+            targets.append(intern(node2))
+
+    return _arcs_to_csr(np.frombuffer(sources, dtype=np.int64),
+                        np.frombuffer(targets, dtype=np.int64), table, undirected, multigraph)
+
+
+def read_graph_from_csv_parallel(filename: str, oriented: str = 'undirected',
+                                 multigraph: bool = False, workers: int | None = None,
+                                 chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> CSRGraph:
+    """
+    read_graph_from_csv_to_csr for large files: the file is cut into\
+          byte ranges of about chunk_bytes at line boundaries and every\
+          range is parsed in its own worker process.
+
+    A worker interns the labels of its range into local ids; the parent\
+          maps the local labels of every range, in file order, to global\
+          ids, so the nodes get the same ids as with\
+          read_graph_from_csv_to_csr and only the distinct labels of a\
+          range cross the process boundary, besides its id arrays.\
+          A file of one range is parsed without starting a pool.
+
+    Args:
+        filename (str): Path to the CSV file.
+        oriented (str, optional): If 'directed', the graph is\
+              directed. Defaults to 'undirected'.
+        multigraph (bool, optional): Keep repeated lines as parallel arcs.
+        workers (int, optional): Worker processes; None means one per core.
+        chunk_bytes (int, optional): Approximate size of a range.
+
+    Returns:
+        CSRGraph: The same graph as read_graph_from_csv_to_csr.
+
+    Raises:
+        ValueError: If a line is not 'NodeA,NodeB' (with its row number).
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'graph.csv')
+    >>> _ = open(path, 'w').write('A,B\\nB,C\\n\\nC,A\\nD,A\\n')
+    >>> graph = read_graph_from_csv_parallel(path, chunk_bytes=4, workers=2)
+    >>> graph.to_dict() == read_graph_from_csv_to_csr(path).to_dict()
+    True
+    >>> list(graph.labels)
+    ['A', 'B', 'C', 'D']
+    >>> _ = open(path, 'a').write('E\\n')
+    >>> read_graph_from_csv_parallel(path, chunk_bytes=4, workers=2)
+    Traceback (most recent call last):
+    ...
+    ValueError: Row 6: В ребрі мають бути 2 вершини.
+    """
+    undirected = _is_undirected(oriented)
+    ranges = _chunk_ranges(filename, chunk_bytes)
+    tasks = [(filename, start, end) for start, end in ranges]
+    if len(tasks) <= 1 or workers == 1:
+        return _merge_chunks(map(_parse_chunk, tasks), undirected, multigraph)
+
+    from concurrent.futures import ProcessPoolExecutor     # small files never start a pool
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return _merge_chunks(executor.map(_parse_chunk, tasks), undirected, multigraph)
+
+
+def _chunk_ranges(filename: str, chunk_bytes: int) -> list[tuple[int, int]]:
+    """Byte ranges of about chunk_bytes that start and end at line boundaries."""
+    size = os.path.getsize(filename)
+    ranges = []
+    start = 0
+    with open(filename, 'rb') as file:
+        while start < size:
+            end = start + max(chunk_bytes, 1)
+            if end < size:
+                # move the end past the next newline
+                file.seek(end - 1)
+                file.readline()
+                end = file.tell()
+            end = min(end, size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _parse_chunk(task) -> tuple:
+    """
+    Parses one byte range (in a worker process). Returns its labels in\
+          order of first appearance, the local ids of the arc ends, its\
+          number of lines and the row (within the range) of the first\
+          bad line, or None.
+    """
+    filename, start, end = task
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8')
+    # the newlines of a file opened in text mode
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    if lines[-1] == '':
+        lines.pop()
+
+    ids = {}
+    intern = ids.setdefault
+    sources, targets = array('i'), array('i')
+    for row, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        parts = line.split(',')
+        if len(parts) != 2:
+            return list(ids), sources, targets, len(lines), row
+        node1, node2 = parts[0].strip(), parts[1].strip()
+        if node1 == '' or node2 == '':
+            return list(ids), sources, targets, len(lines), row
+        sources.append(intern(node1, len(ids)))
+        targets.append(intern(node2, len(ids)))
+    return list(ids), sources, targets, len(lines), None
+
+
+def _merge_chunks(chunks, undirected: bool, multigraph: bool) -> CSRGraph:
+    """Maps the local ids of the parsed ranges, in file order, to global ones."""
+    table = LabelTable()
+    sources, targets = [], []
+    rows = 0
+    for labels, chunk_sources, chunk_targets, num_lines, bad_row in chunks:
+        if bad_row is not None:
+            raise ValueError(f'Row {rows + bad_row}: В ребрі мають бути 2 вершини.')
+        rows += num_lines
+        mapping = np.fromiter(map(table.intern, labels), dtype=np.int64, count=len(labels))
+        sources.append(mapping[np.frombuffer(chunk_sources, dtype=np.int32)])
+        targets.append(mapping[np.frombuffer(chunk_targets, dtype=np.int32)])
+    if not sources:
+        return _arcs_to_csr(np.empty(0, np.int64), np.empty(0, np.int64), table,
+                            undirected, multigraph)
+    return _arcs_to_csr(np.concatenate(sources), np.concatenate(targets), table,
+                        undirected, multigraph)
+
+
+def _arcs_to_csr(sources: np.ndarray, targets: np.ndarray, table: LabelTable,
+                 undirected: bool, multigraph: bool) -> CSRGraph:
+    """CSRGraph of the arcs read from a file, sorted and merged as the readers promise."""
+    if undirected:
+        # a loop gets no reverse arc: it is a single arc in the CSR form
+        back = sources != targets if multigraph else slice(None)
+        sources, targets = (np.concatenate((sources, targets[back])),
+                            np.concatenate((targets, sources[back])))
+    num_nodes = max(len(table), 1)
+    keys = sources * num_nodes + targets
+    keys = np.sort(keys) if multigraph else sorted_unique(keys)
+    return CSRGraph.from_arcs(keys // num_nodes, keys % num_nodes, table)
@@ -0,0 +1,229 @@
+'''Cache of algorithm results keyed by the content of the input graph'''
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from . import profiling
+from .budget import SearchUnknown
+from .csr_graph import as_csr
+
+# results kept in memory
+DEFAULT_MEMORY_ITEMS = 128
+# size cap of the on-disk layer in bytes
+DEFAULT_MAX_BYTES = 256 * 2 ** 20
+# changes whenever stored results stop being valid, so that old ones are dropped
+CACHE_VERSION = 3
+# marks a missing entry, because None is a valid result
+_MISSING = object()
+
+
+def graph_digest(graph) -> str:
+    '''
+    sha256 hex digest of the labeled arc multiset of a graph: the same
+    graph read from lines in any order, from a dict or from a binary
+    file gets the same digest. Unlike graph_fingerprint it depends on
+    the labels, since the results name nodes by their labels.
+
+    >>> graph_digest({'a': ['b'], 'b': []}) == graph_digest({'b': [], 'a': ['b']})
+    True
+    >>> graph_digest({'a': ['b'], 'b': []}) == graph_digest({'b': ['a'], 'a': []})
+    False
+    >>> graph_digest({1: [2], 2: []}) == graph_digest({'1': ['2'], '2': []})
+    False
+    '''
+    csr = as_csr(graph)
+    n = len(csr)
+    names = [repr(label) for label in csr.labels]
+    order = sorted(range(n), key=names.__getitem__)
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    arcs = np.sort(rank[csr.sources()] * n + rank[np.asarray(csr.neighbors, dtype=np.int64)])
+
+    digest = hashlib.sha256(f'{n}:{csr.num_arcs}:'.encode())
+    digest.update('\0'.join(names[node] for node in order).encode())
+    digest.update(arcs.astype('<i8').tobytes())
+    return digest.hexdigest()
+
+
+def cache_key(digest: str, action: str, oriented: bool = False, **params) -> str:
+    '''
+    Key of one result: the graph digest, the action, the oriented flag
+    and the parameters that change the answer.
+
+    >>> cache_key('d', 'coloring', colors=3) == cache_key('d', 'coloring', colors=4)
+    False
+    '''
+    text = json.dumps([CACHE_VERSION, digest, action, oriented, params],
+                      sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    '''
+    Two-level cache of results: an LRU dict of memory_items results in
+    memory and, if directory is given, an SQLite file there that keeps at
+    most max_bytes of pickled results and evicts the least recently used
+    ones.
+
+    SearchUnknown results are not stored, because they depend on the
+    budget; a finished answer does not. Cached results are shared
+    between the calls that get them, so they must not be modified.
+    The disk layer unpickles its entries, so it must not be shared with
+    untrusted users.
+
+    >>> import tempfile
+    >>> directory = tempfile.mkdtemp()
+    >>> calls = []
+    >>> def solve():
+    ...     calls.append(1)
+    ...     return ['a', 'b', 'a']
+    >>> graph = {'a': ['b'], 'b': ['a']}
+    >>> with ResultCache(directory) as cache:
+    ...     cache.solve('euler', graph, solve), cache.solve('euler', graph, solve)
+    (['a', 'b', 'a'], ['a', 'b', 'a'])
+    >>> with ResultCache(directory) as cache:    # a new process: from disk
+    ...     cache.solve('euler', {'b': ['a'], 'a': ['b']}, solve), cache.hits
+    (['a', 'b', 'a'], 1)
+    >>> len(calls)
+    1
+    '''
+    FILENAME = 'results.sqlite'
+
+    def __init__(self, directory: str | None = None,
+                 memory_items: int = DEFAULT_MEMORY_ITEMS,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.memory = OrderedDict()
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        # one cache may serve several threads (e.g. the Streamlit sessions)
+        self._lock = threading.Lock()
+        self.connection = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(os.path.join(directory, self.FILENAME),
+                                              check_same_thread=False)
+            self.connection.executescript('''
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS results_used ON results (used);
+            ''')
+            row = self.connection.execute(
+                "SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or int(row[0]) != CACHE_VERSION:
+                with self.connection:
+                    self.connection.execute('DELETE FROM results')
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO meta VALUES ('version', ?)",
+                        (str(CACHE_VERSION),))
+
+    def solve(self, action: str, graph, compute, oriented: bool = False, **params):
+        '''
+        Result of compute() (a function without arguments that runs
+        action on graph) from the cache, or computed and stored.
+        '''
+        with profiling.phase('cache'):
+            key = cache_key(graph_digest(graph), action, oriented, **params)
+            value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+        value = compute()
+        if not isinstance(value, SearchUnknown):
+            with profiling.phase('cache'):
+                self.put(key, value)
+        return value
+
+    def get(self, key: str, default=None):
+        '''Result stored under key, or default.'''
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def _lookup(self, key: str):
+        with self._lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key]
+            if self.connection is not None:
+                row = self.connection.execute(
+                    'SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    with self.connection:
+                        self.connection.execute(
+                            'UPDATE results SET used = ? WHERE key = ?', (time.time(), key))
+                    value = pickle.loads(row[0])
+                    self._remember(key, value)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return _MISSING
+
+    def put(self, key: str, value) -> None:
+        '''Stores value in memory and, if it fits under max_bytes, on disk.'''
+        with self._lock:
+            self._remember(key, value)
+            if self.connection is None:
+                return
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(data) > self.max_bytes:
+                return
+            with self.connection:
+                self.connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                                        (key, data, len(data), time.time()))
+                self._evict()
+
+    def _remember(self, key: str, value) -> None:
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def _evict(self) -> None:
+        '''Deletes the least recently used results until the file fits max_bytes.'''
+        total = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in self.connection.execute('SELECT key, size FROM results ORDER BY used'):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.connection.executemany('DELETE FROM results WHERE key = ?', stale)
+
+    def clear(self) -> None:
+        '''Forgets all results, in memory and on disk.'''
+        with self._lock:
+            self.memory.clear()
+            if self.connection is not None:
+                with self.connection:
+                    self.connection.execute('DELETE FROM results')
+
+    def close(self) -> None:
+        '''Closes the database file.'''
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == '__main__':
+    import doctest
+    print(doctest.testmod())
@@ -0,0 +1,588 @@
+'''Local asyncio HTTP/JSON service that runs the algorithms as jobs in a process pool'''
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from .batch import ACTIONS as BATCH_ACTIONS, jsonable, run_action
+from .binary_graph import load_binary_graph, write_binary_graph
+from .budget import Budget, CancellationToken, SearchUnknown
+from .csr_graph import as_csr
+from .read_graph_from_csv import parse_graph_lines
+from .result_cache import cache_key, graph_digest
+
+# actions a job can run: those of the batch mode and isomorphism with a second graph
+ACTIONS = BATCH_ACTIONS + ('isomorphism',)
+# jobs that may be queued or running at once; more are refused with 503
+DEFAULT_MAX_JOBS = 64
+# finished jobs whose results are kept for the clients
+DEFAULT_KEEP_JOBS = 1024
+# largest request body in bytes
+MAX_BODY = 256 * 2 ** 20
+# opened graphs every worker keeps between jobs
+WORKER_GRAPHS = 8
+
+# set in every worker by _init_worker
+_cancel_flags = None
+_worker_graphs = OrderedDict()
+
+
+class ServiceError(Exception):
+    '''Error of a request, answered with the HTTP status and the message.'''
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Job:
+    '''
+    One action on an uploaded graph. status is 'queued', 'running',
+    'done', 'cancelled' or 'error'; result is the JSON-ready result of
+    the action, in the format of the batch mode.
+    '''
+    __slots__ = ('id', 'graph', 'action', 'other', 'status', 'result', 'slot',
+                 'future', 'cancel_requested', 'cached', 'created', 'finished')
+
+    def __init__(self, job_id: str, graph: str, action: str, other: str | None = None):
+        self.id = job_id
+        self.graph = graph
+        self.action = action
+        self.other = other
+        self.status = 'queued'
+        self.result = None
+        self.slot = None
+        self.future = None
+        self.cancel_requested = False
+        self.cached = False
+        self.created = time.time()
+        self.finished = None
+
+    @property
+    def state(self) -> str:
+        '''
+        status, with 'running' once the pool took the job and 'cancelled'
+        as soon as its future is, before _finish runs in the loop.
+        '''
+        if self.status == 'queued' and self.future is not None:
+            if self.future.cancelled():
+                return 'cancelled'
+            if self.future.running():
+                return 'running'
+        return self.status
+
+    def to_dict(self, with_result: bool = False) -> dict:
+        '''The job as a JSON-ready dict.'''
+        data = {'id': self.id, 'graph': self.graph, 'action': self.action,
+                'status': self.state, 'cached': self.cached}
+        if self.other is not None:
+            data['other'] = self.other
+        if self.finished is not None:
+            data['seconds'] = round(self.finished - self.created, 6)
+        if with_result:
+            data['result'] = self.result
+        return data
+
+
+class SolverService:
+    '''
+    Uploaded graphs and the jobs that run on them in a ProcessPoolExecutor
+    of workers processes, served over HTTP by start().
+
+    A graph is stored once, as a memory-mapped binary file named after
+    its content, so uploading it again or from another client costs
+    nothing, and a job only sends the path of the file to a worker.
+    Workers import the algorithms when they start and keep the last
+    opened graphs, so the pool stays warm between jobs. At most max_jobs
+    jobs are queued or running; a job with a result in cache (a
+    ResultCache, shared with main.py --cache) finishes without a worker.
+
+    A queued job is cancelled at once. A running search is asked to stop
+    through a CancellationToken backed by a flag in shared memory and
+    ends as SearchUnknown('cancelled'); the polynomial actions always
+    run to the end.
+
+    A worker that dies (e.g. killed by the system for memory) breaks
+    its pool: the jobs that were queued or running in it end with an
+    error, and the next jobs go to a new pool.
+
+    >>> import threading
+    >>> service = SolverService(workers=1)
+    >>> loop = asyncio.new_event_loop()
+    >>> server = loop.run_until_complete(service.start('127.0.0.1', 0))
+    >>> threading.Thread(target=loop.run_forever, daemon=True).start()
+    >>> url = 'http://127.0.0.1:%d' % server.sockets[0].getsockname()[1]
+    >>> status, graph = request(url + '/graphs', 'POST', {'edges': 'A,B\\nB,C\\nC,A'})
+    >>> status, graph['nodes'], graph['arcs']
+    (201, 3, 6)
+    >>> status, job = request(url + '/jobs', 'POST', {'graph': graph['id'], 'action': 'euler'})
+    >>> status, job['action']
+    (202, 'euler')
+    >>> status, job = request(url + f"/jobs/{job['id']}/result?wait=60")
+    >>> status, job['status'], len(job['result']['result'])
+    (200, 'done', 4)
+    >>> request(url + '/jobs/unknown')
+    (404, {'error': 'Невідоме завдання: unknown'})
+    >>> request(url + '/jobs', 'POST', {'graph': [graph['id']], 'action': 'euler'})
+    (400, {'error': 'graph має бути рядком'})
+    >>> _ = loop.call_soon_threadsafe(loop.stop)
+    >>> service.close()
+    '''
+
+    def __init__(self, directory: str | None = None, workers: int | None = None,
+                 max_jobs: int = DEFAULT_MAX_JOBS, keep_jobs: int = DEFAULT_KEEP_JOBS,
+                 cache=None):
+        self._own_directory = directory is None
+        self.directory = directory if directory is not None else \
+            tempfile.mkdtemp(prefix='graph-service-')
+        os.makedirs(self.directory, exist_ok=True)
+        self.workers = workers or os.cpu_count()
+        self.max_jobs = max_jobs
+        self.keep_jobs = keep_jobs
+        self.cache = cache
+        self.graphs = {}
+        self.jobs = OrderedDict()
+        self._ids = itertools.count(1)
+        self._free_slots = list(range(max_jobs))
+        # spawn, not fork: the service process has the event loop and threads
+        self._context = multiprocessing.get_context('spawn')
+        self._flags = self._context.RawArray('b', max_jobs)
+        self._start_pool()
+
+    def _start_pool(self) -> None:
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context,
+                                            initializer=_init_worker,
+                                            initargs=(self._flags,))
+
+    def _replace_pool(self, broken: ProcessPoolExecutor) -> None:
+        '''Starts a new pool instead of a broken one, unless that is done already.'''
+        if broken is self.executor:
+            broken.shutdown(wait=False)
+            self._start_pool()
+
+    # graphs
+
+    def add_graph(self, edges: str, oriented: bool = False, multigraph: bool = False) -> dict:
+        '''
+        Parses an edge list ('NodeA,NodeB' lines) and stores the graph.
+        Returns its description; the id only depends on the content.
+        '''
+        return self._store_graph(self._convert_graph(edges, oriented, multigraph))
+
+    def _convert_graph(self, edges: str, oriented: bool, multigraph: bool) -> dict:
+        '''
+        Parses the edges and writes them to a temporary binary file. It
+        touches no state of the service, so the HTTP handler runs it in
+        a thread; _store_graph then registers the result in the loop.
+        '''
+        try:
+            graph = parse_graph_lines(edges.splitlines(),
+                                      'directed' if oriented else 'undirected', multigraph)
+        except ValueError as error:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, str(error)) from None
+        csr = as_csr(graph.connections)
+        digest = graph_digest(csr)
+        descriptor, path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        os.close(descriptor)
+        write_binary_graph(csr, path, oriented=oriented)
+        return {'id': cache_key(digest, 'graph', oriented)[:32], 'digest': digest, 'path': path,
+                'nodes': len(csr), 'arcs': csr.num_arcs,
+                'oriented': oriented, 'multigraph': multigraph}
+
+    def _store_graph(self, info: dict) -> dict:
+        '''Registers a converted graph, or drops its file if the graph is already stored.'''
+        graph_id = info['id']
+        if graph_id in self.graphs:
+            os.remove(info['path'])
+        else:
+            path = os.path.join(self.directory, f'{graph_id}.bin')
+            os.replace(info['path'], path)
+            self.graphs[graph_id] = {**info, 'path': path}
+        return self.graph_info(graph_id)
+
+    def graph_info(self, graph_id: str) -> dict:
+        '''Description of a stored graph.'''
+        info = self._graph(graph_id)
+        return {key: value for key, value in info.items() if key not in ('digest', 'path')}
+
+    def remove_graph(self, graph_id: str) -> None:
+        '''
+        Forgets a graph and deletes its file. Refused with 409 while a
+        queued or running job uses it, since the job opens the file only
+        when a worker takes it.
+        '''
+        self._graph(graph_id)
+        busy = [job.id for job in self.jobs.values()
+                if job.finished is None and graph_id in (job.graph, job.other)]
+        if busy:
+            raise ServiceError(HTTPStatus.CONFLICT,
+                               f'Граф використовують завдання: {", ".join(busy)}')
+        os.remove(self.graphs.pop(graph_id)['path'])
+
+    def _graph(self, graph_id) -> dict:
+        if graph_id not in self.graphs:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f'Невідомий граф: {graph_id}')
+        return self.graphs[graph_id]
+
+    # jobs
+
+    def submit(self, graph_id: str, action: str, other: str | None = None,
+               timeout: float | None = None, max_steps: int | None = None) -> Job:
+        '''
+        Queues action on a stored graph (and on the graph other for
+        isomorphism). timeout and max_steps limit the exponential searches.
+        Must be called in the event loop of the service.
+        '''
+        if action not in ACTIONS:
+            raise ServiceError(HTTPStatus.BAD_REQUEST,
+                               f'Невідома дія: {action}. Можливі: {", ".join(ACTIONS)}')
+        info = self._graph(graph_id)
+        other_info = None
+        if action == 'isomorphism':
+            if other is None:
+                raise ServiceError(HTTPStatus.BAD_REQUEST, 'Для ізоморфізму потрібен other')
+            other_info = self._graph(other)
+
+        job = Job(str(next(self._ids)), graph_id, action, other)
+        key = self._cache_key(info, action, other_info)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            job.status, job.result, job.cached = 'done', cached, True
+            job.finished = job.created
+            self._keep(job)
+            return job
+
+        if not self._free_slots:
+            raise ServiceError(HTTPStatus.SERVICE_UNAVAILABLE,
+                               f'Черга заповнена: {self.max_jobs} завдань')
+        job.slot = self._free_slots.pop()
+        self._flags[job.slot] = 0
+        task = (_run_job, info['path'], action, info['oriented'],
+                other_info['path'] if other_info else None, timeout, max_steps, job.slot)
+        try:
+            job.future = self.executor.submit(*task)
+        except BrokenProcessPool:
+            # a worker died while no job was there to notice it
+            self._replace_pool(self.executor)
+            job.future = self.executor.submit(*task)
+        self.jobs[job.id] = job
+        # the callback runs in a pool thread, the bookkeeping in the event loop
+        loop, executor = asyncio.get_running_loop(), self.executor
+        job.future.add_done_callback(
+            lambda future: loop.call_soon_threadsafe(self._finish, job, key, executor))
+        return job
+
+    def job(self, job_id: str) -> Job:
+        '''A queued, running or kept finished job.'''
+        if job_id not in self.jobs:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f'Невідоме завдання: {job_id}')
+        return self.jobs[job_id]
+
+    def cancel(self, job_id: str) -> Job:
+        '''Cancels a queued job, or asks a running search to stop.'''
+        job = self.job(job_id)
+        if job.future is not None and not job.future.done():
+            job.cancel_requested = True
+            if not job.future.cancel():
+                self._flags[job.slot] = 1
+        return job
+
+    async def wait(self, job_id: str, timeout: float | None = None) -> Job:
+        '''The job once it is finished, or as it is after timeout seconds.'''
+        job = self.job(job_id)
+        if job.future is not None and job.status == 'queued':
+            done = asyncio.wrap_future(job.future)
+            try:
+                await asyncio.wait_for(asyncio.shield(done), timeout)
+            except Exception:       # a timeout, or the error that is the result of the job
+                pass
+            # let _finish, scheduled by the pool thread, update the job
+            await asyncio.sleep(0)
+        return job
+
+    def _finish(self, job: Job, key: str, executor: ProcessPoolExecutor) -> None:
+        future = job.future
+        self._free_slots.append(job.slot)
+        job.finished = time.time()
+        if future.cancelled():
+            job.status = 'cancelled'
+        elif isinstance(future.exception(), BrokenProcessPool):
+            self._replace_pool(executor)
+            job.status = 'error'
+            job.result = {'status': 'error', 'error': 'Процес пулу аварійно завершився, '
+                                                      'завдання можна поставити ще раз'}
+        elif future.exception() is not None:
+            error = future.exception()
+            job.status = 'error'
+            job.result = {'status': 'error', 'error': f'{type(error).__name__}: {error}'}
+        else:
+            job.result = future.result()
+            if job.result['status'] == 'error':
+                job.status = 'error'
+            elif job.cancel_requested and job.result['status'] == 'unknown':
+                job.status = 'cancelled'
+            else:
+                job.status = 'done'
+            if job.result['status'] == 'ok' and self.cache is not None:
+                self.cache.put(key, job.result)
+        self._keep(job)
+
+    def _keep(self, job: Job) -> None:
+        '''Stores a finished job, dropping the oldest finished ones over keep_jobs.'''
+        self.jobs[job.id] = job
+        self.jobs.move_to_end(job.id)
+        finished = [job_id for job_id, kept in self.jobs.items() if kept.finished is not None]
+        for job_id in finished[:max(0, len(finished) - self.keep_jobs)]:
+            del self.jobs[job_id]
+
+    @staticmethod
+    def _cache_key(info: dict, action: str, other_info: dict | None) -> str:
+        # format='json': main.py keeps raw results under the same actions
+        return cache_key(info['digest'], action, info['oriented'], format='json',
+                         other=other_info['digest'] if other_info else None)
+
+    def stats(self) -> dict:
+        '''Number of jobs in every state and of stored graphs.'''
+        counts = {}
+        for job in self.jobs.values():
+            counts[job.state] = counts.get(job.state, 0) + 1
+        return {'status': 'ok', 'graphs': len(self.graphs), 'jobs': counts,
+                'workers': self.workers, 'max_jobs': self.max_jobs}
+
+    # HTTP
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8000) -> asyncio.Server:
+        '''Starts listening; the server runs in the current event loop.'''
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''Serves the requests of one connection (HTTP/1.1 keep-alive).'''
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, version = line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                if length > MAX_BODY:
+                    status, payload = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {
+                        'error': f'Тіло запиту більше за {MAX_BODY} байт'}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = await self._respond(method, target, body)
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                writer.write(
+                    f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                    f'Content-Type: application/json; charset=utf-8\r\n'
+                    f'Content-Length: {len(data)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'
+                    .encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass        # a broken request or a client that went away
+        finally:
+            writer.close()
+
+    async def _respond(self, method: str, target: str, body: bytes) -> tuple:
+        '''(HTTPStatus, JSON payload) of one request.'''
+        try:
+            return await self._route(method, target, body)
+        except ServiceError as error:
+            return HTTPStatus(error.status), {'error': str(error)}
+        except Exception as error:      # every request gets an answer, even on a bug
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f'{type(error).__name__}: {error}'}
+
+    async def _route(self, method: str, target: str, body: bytes) -> tuple:
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+
+        if parts == ['health'] and method == 'GET':
+            return HTTPStatus.OK, self.stats()
+        if parts == ['graphs'] and method == 'POST':
+            data = _json_body(body)
+            if not isinstance(data.get('edges'), str):
+                raise ServiceError(HTTPStatus.BAD_REQUEST, 'Потрібне поле edges: рядки "A,B"')
+            # parsing a large graph must not stop the other connections
+            info = await asyncio.get_running_loop().run_in_executor(
+                None, self._convert_graph, data['edges'], bool(data.get('oriented')),
+                bool(data.get('multigraph')))
+            return HTTPStatus.CREATED, self._store_graph(info)
+        if len(parts) == 2 and parts[0] == 'graphs':
+            if method == 'GET':
+                return HTTPStatus.OK, self.graph_info(parts[1])
+            if method == 'DELETE':
+                self.remove_graph(parts[1])
+                return HTTPStatus.OK, {'id': parts[1], 'deleted': True}
+        if parts == ['jobs'] and method == 'POST':
+            data = _json_body(body)
+            job = self.submit(_string(data, 'graph'), _string(data, 'action'),
+                              _string(data, 'other', required=False),
+                              _number(data, 'timeout', float), _number(data, 'max_steps', int))
+            return HTTPStatus.ACCEPTED, job.to_dict(with_result=job.status != 'queued')
+        if parts == ['jobs'] and method == 'GET':
+            return HTTPStatus.OK, {'jobs': [job.to_dict() for job in self.jobs.values()]}
+        if len(parts) == 2 and parts[0] == 'jobs':
+            if method == 'GET':
+                return HTTPStatus.OK, self.job(parts[1]).to_dict()
+            if method == 'DELETE':
+                return HTTPStatus.OK, self.cancel(parts[1]).to_dict()
+        if len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'result' and method == 'GET':
+            job = await self.wait(parts[1], _number(query, 'wait', float) or 0)
+            if job.finished is None:
+                return HTTPStatus.ACCEPTED, job.to_dict()
+            return HTTPStatus.OK, job.to_dict(with_result=True)
+        raise ServiceError(HTTPStatus.NOT_FOUND, f'Невідомий запит: {method} {url.path}')
+
+    def close(self) -> None:
+        '''Stops the running searches and the workers, removes the stored graphs.'''
+        for job in self.jobs.values():
+            if job.future is not None and not job.future.done():
+                self._flags[job.slot] = 1
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        if self._own_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+async def serve(service: SolverService, host: str = '127.0.0.1', port: int = 8000) -> None:
+    '''Runs the service until the task is cancelled (Ctrl+C in asyncio.run).'''
+    server = await service.start(host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def request(url: str, method: str = 'GET', data: dict | None = None,
+            timeout: float | None = None) -> tuple[int, dict]:
+    '''
+    Minimal client: sends data as JSON and returns (status, JSON answer),
+    also for the error statuses.
+    '''
+    body = None if data is None else json.dumps(data).encode('utf-8')
+    prepared = urllib.request.Request(url, data=body, method=method,
+                                      headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(prepared, timeout=timeout) as answer:
+            return answer.status, json.loads(answer.read())
+    except urllib.error.HTTPError as error:
+        with error:
+            return error.code, json.loads(error.read())
+
+
+def _json_body(body: bytes) -> dict:
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, 'Тіло запиту не є JSON') from None
+    if not isinstance(data, dict):
+        raise ServiceError(HTTPStatus.BAD_REQUEST, 'Тіло запиту має бути JSON-об\'єктом')
+    return data
+
+
+def _string(data: dict, name: str, required: bool = True):
+    value = data.get(name)
+    if value is None and not required:
+        return None
+    if not isinstance(value, str):
+        raise ServiceError(HTTPStatus.BAD_REQUEST, f'{name} має бути рядком')
+    return value
+
+
+def _number(data: dict, name: str, kind):
+    value = data.get(name)
+    if value is None:
+        return None
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ServiceError(HTTPStatus.BAD_REQUEST, f'{name} має бути числом') from None
+
+
+# worker side
+
+class _CancelFlag:
+    '''Event-like view of one flag of the shared array, for CancellationToken.'''
+    __slots__ = ('slot',)
+
+    def __init__(self, slot: int):
+        self.slot = slot
+
+    def is_set(self) -> bool:
+        return bool(_cancel_flags[self.slot])
+
+    def set(self) -> None:
+        _cancel_flags[self.slot] = 1
+
+
+def _init_worker(flags) -> None:
+    '''Keeps the shared cancel flags and imports the algorithms before the first job.'''
+    global _cancel_flags
+    _cancel_flags = flags
+    # Ctrl+C stops the service, which then stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from . import euler_cycle, gamilton, graph_painting, isomorphism    # noqa: F401
+
+
+def _open_graph(path: str):
+    '''A binary graph file, mapped once per worker.'''
+    if path in _worker_graphs:
+        _worker_graphs.move_to_end(path)
+        return _worker_graphs[path]
+    graph = _worker_graphs[path] = load_binary_graph(path)
+    while len(_worker_graphs) > WORKER_GRAPHS:
+        _worker_graphs.popitem(last=False)
+    return graph
+
+
+def _run_job(path: str, action: str, oriented: bool, other_path: str | None,
+             timeout: float | None, max_steps: int | None, slot: int) -> dict:
+    '''Result of one job as a JSON-ready dict (in a worker process).'''
+    started = time.perf_counter()
+    budget = Budget(timeout=timeout, max_steps=max_steps,
+                    token=CancellationToken(_CancelFlag(slot)))
+    try:
+        graph = _open_graph(path)
+        if action == 'isomorphism':
+            from .isomorphism import are_isomorphic
+            found = are_isomorphic(graph, _open_graph(other_path), budget)
+            if isinstance(found, SearchUnknown):
+                result = {'status': 'unknown', 'reason': found.reason,
+                          'nodes_expanded': found.nodes_expanded}
+            else:
+                result = {'status': 'ok', 'result': bool(found)}
+        else:
+            result = run_action(action, graph, oriented, budget)
+    except Exception as error:      # reported to the client, the worker goes on
+        result = {'status': 'error', 'error': f'{type(error).__name__}: {error}'}
+    result['seconds'] = round(time.perf_counter() - started, 6)
+    return jsonable(result)
+
+
+if __name__ == '__main__':
+    import doctest
+    print(doctest.testmod())
@@ -0,0 +1,169 @@
+'''Linear-time breadth-first traversal over CSR graphs'''
+from array import array
+from typing import NamedTuple
+
+import numpy as np
+
+from .csr_graph import CSRGraph
+
+
+class BFSForest(NamedTuple):
+    '''
+    One BFS over every node of a graph.
+
+    order lists nodes in the order they were reached; nodes of one
+    component are contiguous in it. parent is -1 for the root of every
+    component, depth is the distance from that root and component is the
+    number of the component (0..count-1, in order of the roots).
+    '''
+    order: np.ndarray
+    parent: np.ndarray
+    depth: np.ndarray
+    component: np.ndarray
+    count: int
+
+    def component_nodes(self) -> list[np.ndarray]:
+        '''Nodes of every component, each in BFS order.'''
+        ends = np.flatnonzero(np.diff(self.component[self.order])) + 1
+        return np.split(self.order, ends) if len(self.order) else []
+
+
+def bfs_forest(graph: CSRGraph) -> BFSForest:
+    '''
+    Breadth-first search from every unvisited node in id order, following
+    out-arcs. Pass graph.undirected() to get the components of the
+    underlying undirected graph.
+
+    The frontier is a preallocated array with a read and a write position,
+    so every node is enqueued and dequeued in O(1) and nothing is
+    allocated per node.
+
+    >>> forest = bfs_forest(CSRGraph.from_dict({0: [1, 2], 1: [0], 2: [0], 3: []}))
+    >>> forest.order.tolist(), forest.parent.tolist(), forest.depth.tolist()
+    ([0, 1, 2, 3], [-1, 0, 0, -1], [0, 1, 1, 0])
+    >>> forest.component.tolist(), forest.count
+    ([0, 0, 0, 1], 2)
+    >>> [nodes.tolist() for nodes in forest.component_nodes()]
+    [[0, 1, 2], [3]]
+    '''
+    n = len(graph)
+    offsets, neighbors = graph.offsets_view, graph.neighbors_view
+    order = array('q', bytes(8 * n))
+    parent = array('q', [-1]) * n
+    depth = array('q', bytes(8 * n))
+    component = array('q', [-1]) * n
+
+    tail = 0
+    count = 0
+    for root in range(n):
+        if component[root] >= 0:
+            continue
+        component[root] = count
+        order[tail] = root
+        head, tail = tail, tail + 1
+        while head < tail:
+            node = order[head]
+            head += 1
+            next_depth = depth[node] + 1
+            for arc in range(offsets[node], offsets[node + 1]):
+                neighbor = neighbors[arc]
+                if component[neighbor] < 0:
+                    component[neighbor] = count
+                    parent[neighbor] = node
+                    depth[neighbor] = next_depth
+                    order[tail] = neighbor
+                    tail += 1
+        count += 1
+
+    return BFSForest(*(np.frombuffer(values, dtype=np.int64)
+                       for values in (order, parent, depth, component)), count)
+
+
+def connected_components(graph: CSRGraph) -> tuple[np.ndarray, int]:
+    '''
+    Component number of every node of the underlying undirected graph,
+    and the number of components.
+
+    >>> labels, count = connected_components(CSRGraph.from_dict({0: [1], 2: [1], 3: []}))
+    >>> labels.tolist(), count      # node ids: 0, 2, 3, 1
+    ([0, 0, 1, 0], 2)
+    '''
+    forest = bfs_forest(graph.undirected())
+    return forest.component, forest.count
+
+
+def articulation_points(graph: CSRGraph) -> np.ndarray:
+    '''
+    Nodes whose removal splits their component, for an undirected graph
+    (pass graph.undirected() otherwise). Iterative Tarjan low-link DFS
+    with an explicit stack, O(V + E).
+
+    >>> articulation_points(CSRGraph.from_dict({0: [1], 1: [0, 2], 2: [1]})).tolist()
+    [1]
+    >>> articulation_points(CSRGraph.from_dict({0: [1, 2], 1: [0, 2], 2: [0, 1]})).tolist()
+    []
+    '''
+    n = len(graph)
+    offsets, neighbors = graph.offsets_view, graph.neighbors_view
+    order = [-1] * n     # DFS discovery number
+    low = [0] * n
+    cut = bytearray(n)
+    counter = 0
+
+    for root in range(n):
+        if order[root] >= 0:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        root_children = 0
+        # every entry: [node, parent, next arc to look at]
+        stack = [[root, -1, offsets[root]]]
+        while stack:
+            entry = stack[-1]
+            node, parent, arc = entry
+            if arc < offsets[node + 1]:
+                entry[2] = arc + 1
+                neighbor = neighbors[arc]
+                if order[neighbor] < 0:
+                    order[neighbor] = low[neighbor] = counter
+                    counter += 1
+                    stack.append([neighbor, node, offsets[neighbor]])
+                elif neighbor != parent and order[neighbor] < low[node]:
+                    low[node] = order[neighbor]
+                continue
+            stack.pop()
+            if parent < 0:
+                continue
+            if low[node] < low[parent]:
+                low[parent] = low[node]
+            if parent == root:
+                root_children += 1
+            elif low[node] >= order[parent]:
+                cut[parent] = 1
+        if root_children > 1:
+            cut[root] = 1
+
+    return np.flatnonzero(np.frombuffer(cut, dtype=np.uint8))
+
+
+def odd_cycle(forest: BFSForest, u: int, v: int) -> list[int]:
+    '''
+    Closes the BFS tree paths of the arc u -> v, where u and v have depths
+    of the same parity, into an odd cycle [u, ..., v, u].
+    '''
+    parent, depth = forest.parent, forest.depth
+    left, right = [u], [v]
+    while depth[left[-1]] > depth[right[-1]]:
+        left.append(int(parent[left[-1]]))
+    while depth[right[-1]] > depth[left[-1]]:
+        right.append(int(parent[right[-1]]))
+    while left[-1] != right[-1]:
+        left.append(int(parent[left[-1]]))
+        right.append(int(parent[right[-1]]))
+    # left goes u..common ancestor, right goes v..common ancestor
+    return left + right[-2::-1] + [u]
+
+
+if __name__ == '__main__':
+    import doctest
+    print(doctest.testmod())
@@ -1,58 +1,59 @@
+import hashlib
+import os
+from collections import Counter
+
 import streamlit as st
 import networkx as nx
+import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 
 from algorithms.euler_cycle import find_euler_cycle
 from algorithms.gamilton import make_way
 from algorithms.graph_painting import is_bipartite, three_coloring
 from algorithms.isomorphism import are_isomorphic
+from algorithms.read_graph_from_csv import parse_graph_lines
+from algorithms.result_cache import ResultCache, graph_digest
+
+# Кеш результатів спільний для всіх сесій; з GRAPH_CACHE_DIR він ще й
+# зберігається на диску між перезапусками застосунку
+@st.cache_resource
+def get_result_cache():
+    '''Один ResultCache на процес Streamlit.'''
+    return ResultCache(os.environ.get('GRAPH_CACHE_DIR'))
+
+# з цієї кількості вершин граф малюється в режимі великого графа
+LARGE_GRAPH_NODES = 1000
+# скільки вершин показує вибірка великого графа за замовчуванням
+SAMPLE_NODES = 300
+# скільки елементів результату (циклу, частини) виводиться текстом
+PREVIEW_ITEMS = 200
+
+def text_key(text: str) -> str:
+    '''Хеш тексту графа - ключ кешу розміщення й результатів.'''
+    return hashlib.sha256(text.encode()).hexdigest()
 
 # Зчитування графу
-def parse_graph_input(text_input: str, oriented: bool):
+# cache_resource, а не cache_data: великий граф не копіюється при кожному
+# перезапуску скрипта, тому його можна лише читати
+@st.cache_resource(show_spinner='Зчитування графу...', max_entries=8)
+def parse_graph_input(text_input: str, oriented: bool, multigraph: bool = False):
     '''
     Парсить текст у форматі CSV (NodeA,NodeB).
+    Для мультиграфа повторені рядки - паралельні ребра (Counter замість set).
+    Результат кешується за текстом і прапорцями, тож натискання інших
+    віджетів не парсить граф знову.
     Повертає: (connections: dict, edges: set, error: str)
     '''
-    lines = text_input.strip().split('\n')
     if not text_input.strip():
         return None, None, 'Введіть дані графу або завантажте файл.'
 
-    connections = {}
-    edges = set()
-
-    for i, line in enumerate(lines, 1):
-        parts = line.strip().split(',')
-        length = len(parts)
-
-        # Перевірка на кількість вузлів
-        if length != 2:
-            return None, None, f'Row {i}: В ребрі мають бути 2 вершини.'
-
-        node1, node2 = parts[0].strip(), parts[1].strip()
-
-        if node1 == '' or node2 == '':
-            return None, None, f'Row {i}: В ребрі мають бути 2 вершини.'
-
-        if node1 in connections:
-            connections[node1].add(node2)
-        else:
-            connections[node1] = {node2}
-
-        edges.add((node1, node2))
-
-        if not oriented:
-            if node2 in connections:
-                connections[node2].add(node1)
-            else:
-                connections[node2] = {node1}
-            edges.add((node2, node1))
-
-    # у NetworkX усі вузли мають бути ключами в dict
-    for u, v in list(edges):
-        if v not in connections:
-            connections[v] = set()
-        if u not in connections:
-            connections[u] = set()
+    mode = 'directed' if oriented else 'undirected'
+    try:
+        # той самий однопрохідний парсер, що й для CSV-файлів
+        connections, edges = parse_graph_lines(text_input.splitlines(), mode, multigraph)
+    except ValueError as error:
+        return None, None, str(error)
 
     return connections, edges, None
 
@@ -72,12 +73,119 @@ def get_input_data(label, default_text, suf):
 
     return text_val
 
+# Результати
+@st.cache_data(show_spinner='Обчислення...', max_entries=64)
+def run_algorithm(action, key, oriented, multigraph, key_2, _graph, _edges, _graph_2):
+    '''
+    Результат дії для графа з хешем тексту key (key_2 - другий граф для
+    ізоморфізму). Перезапуски Streamlit беруть його звідси за хешем, не
+    хешуючи сам граф; новий граф проходить через ResultCache.
+    '''
+    cache = get_result_cache()
+    if action == 'euler':
+        return cache.solve('euler', _graph,
+                           lambda: find_euler_cycle((_graph, _edges), oriented=oriented), oriented)
+    if action == 'hamilton':
+        return cache.solve('hamilton', _graph, lambda: make_way(_graph), oriented, method='auto')
+    if action == 'bipartite':
+        return cache.solve('bipartite', _graph, lambda: is_bipartite(_graph), oriented)
+    if action == 'coloring':
+        return cache.solve('coloring', _graph, lambda: three_coloring(_graph), oriented)
+    return cache.solve('are_isomorphic', _graph, lambda: are_isomorphic(_graph, _graph_2),
+                       oriented, other=graph_digest(_graph_2) if _graph_2 else None)
+
+def preview(items, separator=', '):
+    '''Перші PREVIEW_ITEMS елементів результату текстом.'''
+    if len(items) <= PREVIEW_ITEMS:
+        return separator.join(items)
+    return f'{separator.join(items[:PREVIEW_ITEMS])} … (усього {len(items)})'
+
 # Візуалізація графу
-def draw_graph(graph_dict, oriented, path_edges=None, node_colors=None):
+def sample_nodes(graph_dict, size):
+    '''
+    Вибірка для великого графа: пошук у ширину від вершини найбільшого
+    степеня (і далі від наступних, якщо компонента менша), поки не
+    набереться size вершин. Сусіди залишаються поруч, тож видно
+    справжню локальну структуру графа.
+    '''
+    seen = {}
+    for root in sorted(graph_dict, key=lambda node: -len(graph_dict[node])):
+        if len(seen) >= size:
+            break
+        if root in seen:
+            continue
+        seen[root] = None
+        queue = [root]
+        for node in queue:
+            for neighbor in graph_dict.get(node, ()):
+                if len(seen) >= size:
+                    break
+                if neighbor not in seen:
+                    seen[neighbor] = None
+                    queue.append(neighbor)
+    return list(seen)
+
+@st.cache_data(show_spinner='Розміщення вершин...', max_entries=32)
+def graph_layout(key, oriented, multigraph, sample_size, _graph_dict):
+    '''
+    Позиції вершин (spring layout) для графа з хешем тексту key: усіх
+    вершин або вибірки з sample_size вершин (0 - весь граф).
+    '''
+    nodes = sample_nodes(_graph_dict, sample_size) if sample_size else list(_graph_dict)
+    keep = set(nodes)
+    g = nx.Graph()
+    g.add_nodes_from(nodes)
+    g.add_edges_from((u, v) for u in nodes for v in _graph_dict.get(u, ()) if v in keep)
+    pos = nx.spring_layout(g, seed=42)
+    return {node: (float(x), float(y)) for node, (x, y) in pos.items()}
+
+def is_large(graph_dict):
+    '''Чи малювати граф лише вибіркою незалежно від перемикача.'''
+    return len(graph_dict) > LARGE_GRAPH_NODES
+
+def show_graph(graph_dict, key, path_edges=None, node_colors=None):
+    '''
+    Малює граф повністю або, якщо він великий чи увімкнено режим
+    великого графа, його вибірку. Режим вибирається для кожного графа.
+    '''
+    if force_large or is_large(graph_dict):
+        pos = graph_layout(key, is_oriented, is_multigraph, sample_size, graph_dict)
+        draw_large_graph(graph_dict, pos, path_edges, node_colors)
+        st.caption(f'Показано {len(pos)} з {len(graph_dict)} вершин')
+    else:
+        pos = graph_layout(key, is_oriented, is_multigraph, 0, graph_dict)
+        draw_graph(graph_dict, is_oriented, pos, path_edges, node_colors)
+
+def draw_large_graph(graph_dict, pos, path_edges=None, node_colors=None):
+    '''
+    Швидке малювання вибірки: усі ребра - одна LineCollection, усі
+    вершини - один scatter, без підписів і стрілок.
+    '''
+    fig, ax = plt.subplots(figsize=(6, 4))
+    segments = [(pos[u], pos[v]) for u in pos for v in graph_dict.get(u, ()) if v in pos]
+    ax.add_collection(LineCollection(segments, colors='gray', linewidths=0.4, alpha=0.6))
+    if path_edges:
+        path = [(pos[u], pos[v]) for u, v in path_edges if u in pos and v in pos]
+        ax.add_collection(LineCollection(path, colors='red', linewidths=1.5))
+
+    nodes = list(pos)
+    xy = np.array([pos[node] for node in nodes]).reshape(-1, 2)
+    colors = [node_colors.get(n, '#A0CBE2') for n in nodes] if node_colors else '#A0CBE2'
+    ax.scatter(xy[:, 0], xy[:, 1], s=12, c=colors, edgecolors='none', zorder=2)
+    ax.autoscale()
+    ax.set_axis_off()
+    st.pyplot(fig, width=700)
+    plt.close(fig)
+
+def draw_graph(graph_dict, oriented, pos, path_edges=None, node_colors=None):
     '''Малюємо граф'''
-    g = nx.DiGraph(graph_dict) if oriented else nx.Graph(graph_dict)
+    if any(isinstance(neighbors, Counter) for neighbors in graph_dict.values()):
+        # мультиграф: кожне паралельне ребро малюється окремо
+        graph_dict = {node: list(neighbors.elements()) for node, neighbors in graph_dict.items()}
+        g = nx.MultiDiGraph(graph_dict) if oriented else nx.MultiGraph(graph_dict)
+    else:
+        g = nx.DiGraph(graph_dict) if oriented else nx.Graph(graph_dict)
 
-    pos = nx.spring_layout(g, seed=42)
     fig, ax = plt.subplots(figsize=(6, 4))
 
     # Кольори вузлів
@@ -93,6 +201,7 @@ def draw_graph(graph_dict, oriented, path_edges=None, node_colors=None):
                                edge_color='red', width=2, arrows=oriented)
 
     st.pyplot(fig, width=700)
+    plt.close(fig)
 
 # Інтерфейс
 st.set_page_config(page_title='Graph Library Project', layout='wide')
@@ -102,6 +211,7 @@ st.title('Бібліотека для роботи з графами')
 st.sidebar.header('Налаштування роботи')
 algo = st.sidebar.radio('Алгоритм', ['Перегляд', 'Ейлеровий цикл', 'Гамільтоновий цикл', 'Дводольність', '3-фарбування', 'Ізоморфізм'])
 is_oriented = st.sidebar.checkbox('Орієнтований', value=False)
+is_multigraph = st.sidebar.checkbox('Мультиграф (паралельні ребра)', value=False)
 input_txt = get_input_data('Граф 1', '1,2\n2,3\n3,1', 'g1')
 
 # Друге вікно тільки для ізоморфізму
@@ -113,8 +223,23 @@ if algo == 'Ізоморфізм':
 # Основна частина
 col1, col2 = st.columns([2, 1])
 
-# Парсинг основного графа
-g_dict, g_edges, error = parse_graph_input(input_txt, is_oriented)
+# Парсинг основного графа (і другого для ізоморфізму)
+g_dict, g_edges, error = parse_graph_input(input_txt, is_oriented, is_multigraph)
+key = text_key(input_txt)
+g_dict_2, error_2, key_2 = None, None, None
+if algo == 'Ізоморфізм':
+    g_dict_2, _, error_2 = parse_graph_input(input_txt_2, is_oriented, is_multigraph)
+    key_2 = text_key(input_txt_2)
+
+# Великий граф малюється вибіркою: nx.draw з тисячами вершин триває хвилинами.
+# Малий граф можна перемкнути у цей режим вручну
+shown = [graph for graph in (g_dict, g_dict_2) if graph]
+force_large = False
+if shown and not all(is_large(graph) for graph in shown):
+    force_large = st.sidebar.checkbox('Режим великого графа', value=False)
+sample_size = 0
+if force_large or any(is_large(graph) for graph in shown):
+    sample_size = st.sidebar.slider('Вершин у вибірці', 50, 2000, SAMPLE_NODES, step=50)
 
 if error:
     st.error(error)
@@ -126,65 +251,74 @@ elif g_dict:
         if algo == 'Перегляд':
             st.info('Візуалізація графу')
             with col1:
-                draw_graph(g_dict, is_oriented)
+                show_graph(g_dict, key)
 
         elif algo == 'Ейлеровий цикл':
-            res = find_euler_cycle((g_dict, g_edges), oriented=is_oriented)
+            res = run_algorithm('euler', key, is_oriented, is_multigraph, None, g_dict, g_edges, None)
             if res:
-                st.success(f'Цикл: {', '.join(res)}')
+                st.success(f'Цикл: {preview(res)}')
                 path = [(res[i], res[i+1]) for i in range(len(res)-1)]
                 with col1:
-                    draw_graph(g_dict, is_oriented, path_edges=path)
+                    show_graph(g_dict, key, path_edges=path)
             else:
                 st.warning('Ейлеровий цикл не існує.')
                 with col1:
-                    draw_graph(g_dict, is_oriented)
+                    show_graph(g_dict, key)
 
         elif algo == 'Гамільтоновий цикл':
-            res = make_way(g_dict)
+            res = run_algorithm('hamilton', key, is_oriented, is_multigraph, None, g_dict, g_edges, None)
             if res:
-                st.success(f'Цикл: {', '.join(res)}')
+                st.success(f'Цикл: {preview(res)}')
                 path = [(res[i], res[i+1]) for i in range(len(res)-1)]
                 with col1:
-                    draw_graph(g_dict, is_oriented, path_edges=path)
+                    show_graph(g_dict, key, path_edges=path)
             else:
                 st.error('Гамільтоновий цикл не існує.')
                 with col1:
-                    draw_graph(g_dict, is_oriented)
+                    show_graph(g_dict, key)
 
         elif algo == 'Дводольність':
-            res = is_bipartite(g_dict)
+            res = run_algorithm('bipartite', key, is_oriented, is_multigraph, None, g_dict, g_edges, None)
             if res:
                 st.success('Граф дводольний')
+                st.write(f'Частини: {preview(res.parts[0])} | {preview(res.parts[1])}')
+                first = set(res.parts[0])
+                with col1:
+                    show_graph(g_dict, key,
+                               node_colors={n: '#ff9999' if n in first else '#9999ff'
+                                            for n in g_dict})
             else:
                 st.error('Граф не дводольний')
-            with col1:
-                draw_graph(g_dict, is_oriented)
+                st.write(f'Непарний цикл: {preview(res.odd_cycle, " → ")}')
+                path = [(res.odd_cycle[i], res.odd_cycle[i+1]) for i in range(len(res.odd_cycle)-1)]
+                with col1:
+                    show_graph(g_dict, key, path_edges=path)
 
         elif algo == '3-фарбування':
-            res = three_coloring(g_dict)
+            res = run_algorithm('coloring', key, is_oriented, is_multigraph, None, g_dict, g_edges, None)
             if isinstance(res, list):
                 st.success('Розфарбовано!')
                 color_map = {n: {'r':'#ff9999','g':'#99ff99','b':'#9999ff'}.get(c,'gray') for n, c in res}
                 with col1:
-                    draw_graph(g_dict, is_oriented, node_colors=color_map)
+                    show_graph(g_dict, key, node_colors=color_map)
             else:
                 st.error(res)
                 with col1:
-                    draw_graph(g_dict, is_oriented)
+                    show_graph(g_dict, key)
 
         elif algo == 'Ізоморфізм':
-            g_dict_2, _, error_2 = parse_graph_input(input_txt_2, is_oriented)
+            # без другого графа відповіді немає: показується лише його помилка
             if error_2:
                 st.error(f'Граф 2: {error_2}')
-            elif g_dict_2:
+            else:
                 with col1:
                     st.write("Граф 1")
-                    draw_graph(g_dict, is_oriented)
+                    show_graph(g_dict, key)
                     st.write("Граф 2")
-                    draw_graph(g_dict_2, is_oriented)
-            res = are_isomorphic(g_dict, g_dict_2)
-            if res:
-                st.success('Графи ізоморфні.')
-            else:
-                st.error('Графи не ізоморфні.')
+                    show_graph(g_dict_2, key_2)
+                res = run_algorithm('isomorphism', key, is_oriented, is_multigraph,
+                                    key_2, g_dict, g_edges, g_dict_2)
+                if res:
+                    st.success('Графи ізоморфні.')
+                else:
+                    st.error('Графи не ізоморфні.')
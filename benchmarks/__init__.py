@@ -0,0 +1 @@
+'''Benchmark suite: graph generators, timing of the algorithms and regression checks'''
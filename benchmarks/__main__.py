@@ -0,0 +1,62 @@
+'''
+Запуск бенчмарків: python -m benchmarks
+
+Вимірює час (perf_counter, найкращий і медіана з --repeat запусків) і пікову
+пам'ять (tracemalloc) для кожного публічного алгоритму, зберігає результати
+в JSON і з --baseline завершується з кодом 1, якщо щось стало повільнішим.
+'''
+import argparse
+import json
+import sys
+
+from .suite import DEFAULT_THRESHOLD, SIZES, eager_imports, find_regressions, run_suite
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки бібліотеки графів.')
+    parser.add_argument('--size', choices=sorted(SIZES), default='small',
+                        help='Розмір згенерованих графів')
+    parser.add_argument('--repeat', type=int, default=5, help='Кількість запусків кожного випадку')
+    parser.add_argument('--only', type=str, default=None,
+                        help='Запускати лише випадки, назва яких містить цей рядок')
+    parser.add_argument('--output', type=str, default=None, help='Зберегти результати в JSON')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='JSON попереднього запуску для порівняння')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Допустиме сповільнення (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    def report(name, result):
+        print(f"{name:40} {result['min'] * 1000:10.2f} мс {result['median'] * 1000:10.2f} мс "
+              f"{result['peak_bytes'] / 2 ** 20:9.2f} МБ")
+
+    print(f"{'випадок':40} {'найкращий':>13} {'медіана':>13} {'пік пам.':>12}")
+    current = run_suite(args.size, args.repeat, args.only, report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(current, file, indent=2, ensure_ascii=False)
+
+    if any(name.startswith('startup/') for name in current['results']):
+        eager = eager_imports()
+        if eager:
+            print(f"import main завантажує модулі, які мають імпортуватися ліниво: {', '.join(eager)}")
+            sys.exit(1)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline.get('size') != current['size']:
+            print(f"Базовий запуск має інший розмір: {baseline.get('size')}")
+            sys.exit(2)
+        regressions = find_regressions(current, baseline, args.threshold)
+        if regressions:
+            print('Регресії:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print('Регресій немає.')
+
+
+if __name__ == '__main__':
+    main()
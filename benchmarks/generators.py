@@ -0,0 +1,164 @@
+'''Seeded generators of undirected test graphs for the benchmarks'''
+import math
+import random
+
+from algorithms.gamilton import generate_graph_n
+from algorithms.read_graph_from_csv import Graph
+
+
+def erdos_renyi(n: int, p: float, seed: int = 0) -> dict:
+    '''
+    G(n, p): every pair of the n nodes is an edge with probability p.
+    Pairs without an edge are skipped with geometric jumps, so a sparse
+    graph takes time proportional to its edges, not to n ** 2.
+
+    >>> graph = erdos_renyi(5, 1.0)
+    >>> sorted(graph[0]), sum(len(neighbors) for neighbors in graph.values())
+    ([1, 2, 3, 4], 20)
+    '''
+    graph = {node: set() for node in range(n)}
+    for index in _sample_pairs(n * (n - 1) // 2, p, seed):
+        # pair number index of the sequence (1, 0), (2, 0), (2, 1), (3, 0), ...
+        v = (1 + math.isqrt(1 + 8 * index)) // 2
+        while v * (v - 1) // 2 > index:
+            v -= 1
+        _add_edge(graph, v, index - v * (v - 1) // 2)
+    return graph
+
+
+def grid(rows: int, cols: int) -> dict:
+    '''
+    rows x cols lattice; node r * cols + c is joined to its right and
+    lower neighbors.
+
+    >>> sorted(grid(2, 2)[0]), sorted(grid(2, 2)[3])
+    ([1, 2], [1, 2])
+    '''
+    graph = {node: set() for node in range(rows * cols)}
+    for r in range(rows):
+        for c in range(cols):
+            node = r * cols + c
+            if c + 1 < cols:
+                _add_edge(graph, node, node + 1)
+            if r + 1 < rows:
+                _add_edge(graph, node, node + cols)
+    return graph
+
+
+def random_regular(n: int, d: int, seed: int = 0) -> dict:
+    '''
+    Random simple d-regular graph by the pairing model: n * d half-edges
+    are matched at random, and the matching is drawn again while it has
+    a loop or a parallel edge.
+
+    >>> graph = random_regular(10, 3, seed=1)
+    >>> {len(neighbors) for neighbors in graph.values()}
+    {3}
+    '''
+    if n * d % 2 or d >= n:
+        raise ValueError(f'no simple {d}-regular graph on {n} nodes')
+    rng = random.Random(seed)
+    while True:
+        stubs = [node for node in range(n) for _ in range(d)]
+        rng.shuffle(stubs)
+        graph = {node: set() for node in range(n)}
+        for u, v in zip(stubs[::2], stubs[1::2]):
+            if u == v or v in graph[u]:
+                break
+            _add_edge(graph, u, v)
+        else:
+            return graph
+
+
+def circulant(n: int) -> dict:
+    '''
+    The ring with chords to the second neighbors that
+    algorithms.gamilton.analise uses (nodes 1..n).
+
+    >>> circulant(6)[1]
+    {2, 3, 6}
+    '''
+    return {node: set(neighbors) for node, neighbors in generate_graph_n(n).items()}
+
+
+def random_bipartite(n1: int, n2: int, p: float, seed: int = 0) -> dict:
+    '''
+    Nodes 0..n1-1 on one side and n1..n1+n2-1 on the other; every pair
+    across the sides is an edge with probability p.
+
+    >>> graph = random_bipartite(2, 3, 1.0)
+    >>> sorted(graph[0]), sorted(graph[4])
+    ([2, 3, 4], [0, 1])
+    '''
+    graph = {node: set() for node in range(n1 + n2)}
+    for index in _sample_pairs(n1 * n2, p, seed):
+        _add_edge(graph, index // n2, n1 + index % n2)
+    return graph
+
+
+def random_planar(rows: int, cols: int, seed: int = 0) -> dict:
+    '''
+    Planar graph: a grid where every cell also gets one of its two
+    diagonals at random, so it is a triangulated lattice.
+
+    >>> graph = random_planar(2, 2)
+    >>> sum(len(neighbors) for neighbors in graph.values()) // 2
+    5
+    '''
+    rng = random.Random(seed)
+    graph = grid(rows, cols)
+    for r in range(rows - 1):
+        for c in range(cols - 1):
+            node = r * cols + c
+            if rng.random() < 0.5:
+                _add_edge(graph, node, node + cols + 1)
+            else:
+                _add_edge(graph, node + 1, node + cols)
+    return graph
+
+
+def to_graph(graph: dict) -> Graph:
+    '''
+    The (connections, edges) form that find_euler_cycle takes.
+
+    >>> sorted(to_graph({0: {1}, 1: {0}}).edges)
+    [(0, 1), (1, 0)]
+    '''
+    return Graph(graph, {(u, v) for u, neighbors in graph.items() for v in neighbors})
+
+
+def to_lines(graph: dict) -> list[str]:
+    '''
+    CSV lines 'NodeA,NodeB' with every undirected edge once.
+
+    >>> to_lines({0: {1}, 1: {0}})
+    ['0,1']
+    '''
+    return [f'{u},{v}' for u, neighbors in graph.items() for v in sorted(neighbors) if u < v]
+
+
+def _sample_pairs(count: int, p: float, seed: int):
+    '''Numbers of the pairs 0..count-1 that are kept with probability p.'''
+    rng = random.Random(seed)
+    if p >= 1:
+        yield from range(count)
+        return
+    if p <= 0:
+        return
+    log_q = math.log(1 - p)
+    index = -1
+    while True:
+        index += 1 + int(math.log(1 - rng.random()) / log_q)
+        if index >= count:
+            return
+        yield index
+
+
+def _add_edge(graph: dict, u, v) -> None:
+    graph[u].add(v)
+    graph[v].add(u)
+
+
+if __name__ == '__main__':
+    import doctest
+    print(doctest.testmod())
@@ -0,0 +1,274 @@
+'''Benchmark cases for the public algorithms, timing and regression checks'''
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from algorithms import (
+    Budget,
+    CSRGraph,
+    DynamicGraph,
+    FingerprintIndex,
+    are_isomorphic,
+    articulation_points,
+    as_csr,
+    bfs_forest,
+    chromatic_number,
+    component_subgraphs,
+    connected_components,
+    find_euler_cycle,
+    find_euler_path,
+    find_isomorphism,
+    find_postman_tour,
+    graph_fingerprint,
+    greedy_coloring,
+    held_karp,
+    is_biconnected,
+    is_bipartite,
+    k_coloring,
+    load_binary_graph,
+    make_way,
+    parse_graph_lines,
+    read_graph_from_csv_parallel,
+    read_graph_from_csv_to_csr,
+    three_coloring,
+    write_binary_graph,
+    write_euler_cycle,
+)
+from . import generators
+
+# a case is slower than its baseline if it takes this much longer (0.25 = 25 %)
+DEFAULT_THRESHOLD = 0.25
+# differences below this many seconds are timer noise, not regressions
+NOISE_SECONDS = 0.005
+# exact searches stop after this many steps, so a case always ends
+SEARCH_STEPS = 200_000
+
+# the repository root, where main.py is
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# modules that `import main` must not load before an action needs them
+LAZY_MODULES = ('matplotlib', 'concurrent.futures.process', 'sqlite3',
+                'algorithms.gamilton', 'algorithms.graph_painting', 'algorithms.isomorphism')
+
+# node counts of the generated graphs for every size
+SIZES = {
+    'small': {'n': 2_000, 'side': 40, 'ring': 500, 'dense': 14, 'postman': 5},
+    'large': {'n': 50_000, 'side': 250, 'ring': 5_000, 'dense': 18, 'postman': 6},
+}
+
+
+class Case(NamedTuple):
+    '''
+    One benchmark: setup builds the arguments (not timed), run is timed.
+    '''
+    name: str
+    setup: Callable[[], tuple]
+    run: Callable
+
+
+def build_cases(size: str = 'small') -> list[Case]:
+    '''Benchmark cases for every public algorithm on graphs of the given size.'''
+    params = SIZES[size]
+    n, side, ring = params['n'], params['side'], params['ring']
+    workdir = tempfile.mkdtemp(prefix='graph-bench-')
+
+    er = generators.erdos_renyi(n, 8 / n, seed=1)
+    regular = generators.random_regular(n, 3, seed=2)
+    lattice = generators.grid(side, side)
+    planar = generators.random_planar(side, side, seed=3)
+    bipartite = generators.random_bipartite(n // 2, n // 2, 8 / n, seed=4)
+    circulant = generators.circulant(ring)
+    dense = generators.erdos_renyi(params['dense'], 0.6, seed=5)
+    postman = generators.grid(params['postman'], params['postman'])
+    forest = {}
+    for i in range(n // 50):
+        part = generators.erdos_renyi(50, 0.08, seed=100 + i)
+        forest.update({50 * i + u: {50 * i + v for v in vs} for u, vs in part.items()})
+
+    def permuted(graph):
+        nodes = list(graph)
+        np.random.default_rng(6).shuffle(nodes)
+        rename = dict(zip(graph, nodes))
+        return {rename[u]: {rename[v] for v in vs} for u, vs in graph.items()}
+
+    def csr(graph):
+        return lambda: (as_csr(graph),)
+
+    def budget():
+        return Budget(max_steps=SEARCH_STEPS)
+
+    binary_path = os.path.join(workdir, 'graph.bin')
+
+    def binary_roundtrip(graph):
+        write_binary_graph(graph, binary_path)
+        return load_binary_graph(binary_path)
+
+    cycle_path = os.path.join(workdir, 'cycle.bin')
+    index_dir = os.path.join(workdir, 'index')
+
+    def index_graphs(graphs):
+        with FingerprintIndex(index_dir) as index:
+            for number, graph in enumerate(graphs):
+                index.add(str(number), graph)
+
+    er_path = os.path.join(workdir, 'erdos_renyi.csv')
+    with open(er_path, 'w', encoding='utf-8') as file:
+        file.writelines(line + '\n' for line in generators.to_lines(er))
+
+    def edit_bipartite(graph, edges):
+        # every insertion is followed by the query; the batch removal restores the graph
+        for node1, node2 in edges:
+            graph.add_edge(node1, node2)
+            graph.is_bipartite()
+        graph.remove_edges(edges)
+
+    tiny_path = os.path.join(workdir, 'tiny.csv')
+    with open(tiny_path, 'w', encoding='utf-8') as file:
+        file.write('A,B\nB,C\n')
+
+    return [
+        # a fresh interpreter every run: the time a shell script pays per call
+        Case('startup/import algorithms', lambda: ([sys.executable, '-c', 'import algorithms'],),
+             _run_process),
+        Case('startup/main --show',
+             lambda: ([sys.executable, os.path.join(ROOT, 'main.py'), tiny_path, '--show'],),
+             _run_process),
+        Case('parse_graph_lines/erdos_renyi', lambda: (generators.to_lines(er),), parse_graph_lines),
+        Case('read_graph_from_csv_to_csr/erdos_renyi', lambda: (er_path,),
+             read_graph_from_csv_to_csr),
+        # 1 MB chunks, so that the large size already runs several workers
+        Case('read_graph_from_csv_parallel/erdos_renyi', lambda: (er_path,),
+             lambda path: read_graph_from_csv_parallel(path, chunk_bytes=2 ** 20)),
+        Case('CSRGraph.from_dict/erdos_renyi', lambda: (er,), CSRGraph.from_dict),
+        Case('binary_graph/erdos_renyi', csr(er), binary_roundtrip),
+        Case('find_euler_cycle/circulant', lambda: (generators.to_graph(circulant),),
+             find_euler_cycle),
+        Case('find_euler_path/grid', lambda: (generators.to_graph(lattice),), find_euler_path),
+        Case('find_postman_tour/grid', lambda: (generators.to_graph(postman),), find_postman_tour),
+        Case('write_euler_cycle/circulant', lambda: (generators.to_graph(circulant), cycle_path),
+             lambda graph, path: write_euler_cycle(graph, path, binary=True)),
+        Case('make_way/circulant', csr(circulant), lambda graph: make_way(graph, budget=budget())),
+        Case('held_karp/dense', csr(dense), held_karp),
+        Case('is_biconnected/planar', csr(planar), is_biconnected),
+        Case('is_bipartite/bipartite', csr(bipartite), is_bipartite),
+        Case('is_bipartite/planar', csr(planar), is_bipartite),
+        Case('three_coloring/planar', csr(planar),
+             lambda graph: three_coloring(graph, budget=budget())),
+        Case('k_coloring/planar', csr(planar), lambda graph: k_coloring(graph, 4, budget())),
+        Case('chromatic_number/bipartite', csr(bipartite),
+             lambda graph: chromatic_number(graph, budget())),
+        Case('DynamicGraph/bipartite',
+             lambda: (DynamicGraph.from_graph(bipartite),
+                      [(u, v) for u, v in zip(range(0, n // 2, 2), range(n // 2, n, 3))]),
+             edit_bipartite),
+        Case('greedy_coloring/erdos_renyi', lambda: (as_csr(er).undirected().adjacency(),),
+             greedy_coloring),
+        Case('graph_fingerprint/erdos_renyi', csr(er), graph_fingerprint),
+        Case('are_isomorphic/erdos_renyi', lambda: (er, permuted(er)), are_isomorphic),
+        # refinement cannot split a regular graph, so this one runs out of budget
+        Case('are_isomorphic/random_regular', lambda: (regular, permuted(regular)),
+             lambda graph1, graph2: are_isomorphic(graph1, graph2, budget())),
+        Case('find_isomorphism/grid', lambda: (lattice, permuted(lattice)), find_isomorphism),
+        Case('FingerprintIndex/circulant', lambda: ([circulant, permuted(circulant)],),
+             index_graphs),
+        Case('bfs_forest/grid', csr(lattice), bfs_forest),
+        Case('connected_components/forest', csr(forest), connected_components),
+        Case('articulation_points/planar', lambda: (as_csr(planar).undirected(),),
+             articulation_points),
+        Case('component_subgraphs/forest', lambda: (as_csr(forest).undirected(),),
+             component_subgraphs),
+    ]
+
+
+def eager_imports() -> list[str]:
+    '''LAZY_MODULES that `import main` loads in a fresh interpreter.'''
+    code = f"import sys, main; print(*[m for m in {LAZY_MODULES!r} if m in sys.modules])"
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                            capture_output=True, text=True)
+    return result.stdout.split()
+
+
+def _run_process(command: list[str]) -> None:
+    subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+
+
+def measure(case: Case, repeat: int = 5) -> dict:
+    '''
+    Runs a case repeat times with perf_counter, then once more under
+    tracemalloc for the peak of memory allocated during the run.
+    '''
+    args = case.setup()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        case.run(*args)
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        case.run(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'min': min(times), 'median': statistics.median(times), 'peak_bytes': peak}
+
+
+def run_suite(size: str = 'small', repeat: int = 5, only: str | None = None,
+              report: Callable[[str, dict], None] | None = None) -> dict:
+    '''
+    Measures every case (or the cases whose name contains only) and
+    returns the results with a description of the machine.
+    '''
+    results = {}
+    for case in build_cases(size):
+        if only and only not in case.name:
+            continue
+        results[case.name] = measure(case, repeat)
+        if report is not None:
+            report(case.name, results[case.name])
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.platform(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'size': size,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def find_regressions(current: dict, baseline: dict,
+                     threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    '''
+    Cases of current that are more than threshold slower (best time) or
+    use more than threshold more peak memory than in baseline. Cases
+    missing from either run are skipped.
+
+    >>> base = {'results': {'a': {'min': 1.0, 'peak_bytes': 100}}}
+    >>> find_regressions({'results': {'a': {'min': 1.1, 'peak_bytes': 100}}}, base)
+    []
+    >>> find_regressions({'results': {'a': {'min': 1.5, 'peak_bytes': 300}}}, base)
+    ['a: час 1.0000 -> 1.5000 с (+50%)', "a: пам'ять 100 -> 300 Б (+200%)"]
+    '''
+    regressions = []
+    for name, now in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        if now['min'] > before['min'] * (1 + threshold) and \
+                now['min'] - before['min'] > NOISE_SECONDS:
+            regressions.append(f"{name}: час {before['min']:.4f} -> {now['min']:.4f} с "
+                               f"(+{now['min'] / before['min'] - 1:.0%})")
+        if now['peak_bytes'] > before['peak_bytes'] * (1 + threshold):
+            regressions.append(f"{name}: пам'ять {before['peak_bytes']} -> {now['peak_bytes']} Б "
+                               f"(+{now['peak_bytes'] / max(before['peak_bytes'], 1) - 1:.0%})")
+    return regressions
@@ -1,11 +1,107 @@
 import argparse
+import contextlib
+import json
+import os
+import time
 
-from algorithms.read_graph_from_csv import read_graph_from_csv_to_dict
-from algorithms.read_graph_from_csv import read_graph_from_csv_to_set
-from algorithms.euler_cycle import find_euler_cycle
-from algorithms.graph_painting import is_bipartite, three_coloring
-from algorithms.isomorphism import are_isomorphic
-from algorithms.gamilton import make_way
+# Тут лише те, що потрібно для зчитування графу. Алгоритми імпортуються
+# у гілці своєї дії, тож, наприклад, --show не платить за решту бібліотеки.
+from algorithms.read_graph_from_csv import read_graph_from_csv
+from algorithms.batch import ACTIONS, DEFAULT_CHUNKSIZE, expand_inputs, run_batch
+from algorithms.binary_graph import convert_csv_to_binary, is_binary_graph_file, load_binary_graph
+from algorithms.csr_graph import CSRGraph
+from algorithms.budget import Budget, SearchUnknown
+from algorithms.profiling import phase as profiling_phase, profiling
+
+
+def load_graph(filename, mode_str, multigraph=False):
+    '''
+    Зчитує граф з CSV за один прохід або відкриває бінарний файл графу.
+    Для мультиграфа повторені рядки залишаються паралельними ребрами.
+    Повертає None, якщо зчитати не вдалося.
+    '''
+    try:
+        with profiling_phase('load'):
+            if is_binary_graph_file(filename):
+                return load_binary_graph(filename)
+            return read_graph_from_csv(filename, mode_str, multigraph)
+    except FileNotFoundError:
+        print('Не існує файлу з такою назвою в поточній директорії.')
+    except ValueError as error:
+        print(f'Помилка формату файлу: {error}')
+    return None
+
+def make_budget(args):
+    '''Budget з --timeout і --max-steps, або None, якщо обмежень немає.'''
+    if args.timeout is None and args.max_steps is None:
+        return None
+    return Budget(timeout=args.timeout, max_steps=args.max_steps)
+
+
+def print_unknown(result):
+    '''Виводить результат пошуку, який зупинився через обмеження.'''
+    print(f"Невідомо: пошук зупинено ({result.reason})")
+    print(f"Розглянуто вершин: {result.nodes_expanded}, найбільша глибина: {result.max_depth}")
+    print(f"Найкращий частковий результат: {result.partial}")
+
+
+def open_cache(args):
+    '''
+    Кеш результатів у директорії --cache, або порожній контекст (None),
+    якщо кеш не потрібен. sqlite3 імпортується лише тоді, коли кеш є.
+    '''
+    if not args.cache:
+        return contextlib.nullcontext()
+    from algorithms.result_cache import ResultCache
+    return ResultCache(args.cache, max_bytes=int(args.cache_size * 2 ** 20))
+
+
+def solve(cache, action, graph, compute, oriented=False, **params):
+    '''
+    Результат compute() з кешу, якщо такий самий граф уже розв'язувався
+    цією дією з тими самими параметрами, інакше обчислює його.
+    '''
+    if cache is None:
+        return compute()
+    return cache.solve(action, graph, compute, oriented, **params)
+
+
+def print_profile(profile, total):
+    '''Виводить час кожної фази і лічильники алгоритмів після --profile.'''
+    print(f"Профіль: усього {total:.4f} с")
+    for name, seconds in sorted(profile.phases.items(), key=lambda item: -item[1]):
+        print(f"  {name:12} {seconds:.4f} с")
+    for name, value in sorted(profile.counters.items()):
+        print(f"  {name:28} {value}")
+
+
+def index_graphs(path, index_dir, mode_str, multigraph=False):
+    '''
+    Додає граф або всі файли директорії path до індексу ізоморфізму
+    і виводить, які з них ізоморфні вже відомим графам.
+    '''
+    from algorithms.isomorphism_index import FingerprintIndex
+
+    if os.path.isdir(path):
+        files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                       if os.path.isfile(os.path.join(path, name)))
+    else:
+        files = [path]
+
+    new = duplicates = 0
+    with FingerprintIndex(index_dir) as index:
+        for filename in files:
+            graph = load_graph(filename, mode_str, multigraph)
+            if graph is None:
+                continue
+            duplicate = index.add(os.path.abspath(filename), graph)
+            if duplicate is None:
+                new += 1
+            else:
+                duplicates += 1
+                print(f"{filename}: ізоморфний {duplicate}")
+        total = len(index)
+    print(f"Нових графів: {new}, дублікатів: {duplicates}, усього в індексі: {total}")
 
 
 def main():
@@ -16,8 +112,11 @@ def main():
     )
 
     #Аргументи
-    parser.add_argument('file', type=str, help='Шлях до CSV файлу з графом')
+    parser.add_argument('file', type=str,
+                        help='Шлях до CSV або бінарного файлу з графом (для --isomorph-index - або директорії)')
     parser.add_argument('--oriented', action='store_true', help='Прапорець: вважати граф орієнтованим')
+    parser.add_argument('--multigraph', action='store_true',
+                        help='Прапорець: повторені рядки CSV - паралельні ребра (мультиграф)')
 
     #дії
     action_group = parser.add_mutually_exclusive_group(required=True)
@@ -25,78 +124,295 @@ def main():
     action_group.add_argument('--euler', action='store_true', help='Знайти Ейлерів цикл')
     action_group.add_argument('--hamilton', action='store_true', help='Знайти Гамільтонів цикл')
     action_group.add_argument('--bipartite', action='store_true', help='Перевірити на дводольність')
-    action_group.add_argument('--coloring', action='store_true', help='Виконати 3-розфарбування')
+    action_group.add_argument('--coloring', action='store_true',
+                              help='Виконати 3-розфарбування (або в --colors кольорів)')
+    action_group.add_argument('--chromatic', action='store_true', help='Знайти хроматичне число')
     action_group.add_argument('--isomorph', action='store_true', help='Перевірити ізоморфізм')
+    action_group.add_argument('--isomorph-index', type=str, metavar='DIR', default=None,
+                              help='Додати граф (або всі графи з директорії file) до індексу\n'
+                                   'ізоморфізму в DIR і вивести знайдені дублікати')
+    action_group.add_argument('--convert', type=str, metavar='OUTPUT', default=None,
+                              help='Перетворити CSV у бінарний формат і записати у OUTPUT')
+    action_group.add_argument('--batch', type=str, metavar='OUTPUT', default=None,
+                              help='Пакетний режим: file - директорія, glob-шаблон або список файлів;\n'
+                                   'дії --actions виконуються для кожного графа в пулі процесів,\n'
+                                   'результати записуються в OUTPUT у форматі JSON Lines')
+
+    parser.add_argument('--method', choices=['auto', 'backtrack', 'dp'], default='auto',
+                        help='Пошук Гамільтонового циклу: перебір, динамічне програмування '
+                             '(Гельда-Карпа, до 25 вершин) або автоматичний вибір')
+
+    parser.add_argument('--colors', type=int, default=None,
+                        help='Кількість кольорів для --coloring (за замовчуванням 3)')
+
+    #обмеження для експоненційних пошуків (Гамільтон, розфарбування)
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='Максимальний час пошуку в секундах. Діє на пошуки (Гамільтон,\n'
+                             'розфарбування, хроматичне число), а не на Ейлера чи дводольність;\n'
+                             'у --batch ще й обмежує весь файл, див. --file-timeout')
+    parser.add_argument('--max-steps', type=int, default=None,
+                        help='Максимальна кількість кроків пошуку')
+
+    parser.add_argument('--euler-mode', choices=['cycle', 'path', 'postman'], default='cycle',
+                        help='Для --euler: Ейлерів цикл, Ейлерів шлях або маршрут листоноші\n'
+                             '(цикл з найменшою кількістю повторених ребер)')
+    parser.add_argument('--output', type=str, metavar='PATH', default=None,
+                        help='Записувати Ейлерів цикл у файл під час пошуку, не тримаючи його в пам\'яті\n'
+                             '(PATH з розширенням .bin - бінарні номери вершин, інакше CSV)')
+
+    #пакетний режим
+    parser.add_argument('--actions', type=str, default=','.join(ACTIONS),
+                        help=f'Дії для --batch через кому (за замовчуванням {",".join(ACTIONS)})')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Кількість процесів для --batch (за замовчуванням - кількість ядер);\n'
+                             'для --bipartite, --coloring і --chromatic компоненти зв\'язності\n'
+                             'обробляються паралельно в стількох процесах, а для --convert\n'
+                             'у стількох процесах частинами зчитується CSV')
+    parser.add_argument('--file-timeout', type=float, default=None,
+                        help='Жорстке обмеження часу на один файл --batch у секундах: процес, що\n'
+                             'не вклався, зупиняється, а файл записується з помилкою (за\n'
+                             'замовчуванням з --timeout - --timeout на кожну дію плюс 30 с)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help='Скільки файлів --batch одразу передається одному процесу')
 
     #додатковий файл для ізоморфізму
     parser.add_argument('--file2', type=str, help='Шлях до другого файлу (для ізоморфізму)', default=None)
 
+    parser.add_argument('--profile', type=str, nargs='?', const='', default=None, metavar='PATH',
+                        help='Вивести час фаз (load, normalize, solve) і лічильники алгоритмів;\n'
+                             'з PATH.json - ще й записати їх у JSON, з іншим PATH - записати\n'
+                             'статистику cProfile (читається через python -m pstats PATH)')
+
+    #кеш результатів між запусками
+    parser.add_argument('--cache', type=str, metavar='DIR', default=None,
+                        help='Брати результати з кешу в DIR і зберігати туди нові: той самий граф\n'
+                             '(з будь-яким порядком рядків) з тією самою дією не розв\'язується вдруге')
+    parser.add_argument('--cache-size', type=float, default=256,
+                        help='Найбільший розмір кешу на диску в МБ (давні результати видаляються)')
+
     args = parser.parse_args()
+    with open_cache(args) as cache:
+        if args.profile is None:
+            run(args, cache)
+            return
+
+        profiler = None
+        if args.profile and not args.profile.endswith('.json'):
+            import cProfile
+            profiler = cProfile.Profile()
+        with profiling() as profile:
+            started = time.perf_counter()
+            if profiler is not None:
+                profiler.enable()
+            try:
+                run(args, cache)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+            total = time.perf_counter() - started
+    print_profile(profile, total)
+    if profiler is not None:
+        profiler.dump_stats(args.profile)
+    elif args.profile:
+        with open(args.profile, 'w', encoding='utf-8') as file:
+            json.dump({'total': total, **profile.to_dict()}, file, indent=2)
 
+
+def run(args, cache=None):
+    '''Виконує дію, вибрану аргументами командного рядка (з кешем cache, якщо він є).'''
     #Підготовка даних
     #перетвор bool  у str ('directed'/'undirected') для функцій зчитування
     mode_str = 'directed' if args.oriented else 'undirected'
 
+    if args.convert:
+        try:
+            graph = convert_csv_to_binary(args.file, args.convert, mode_str, args.multigraph,
+                                          args.workers)
+        except FileNotFoundError:
+            print('Не існує файлу з такою назвою в поточній директорії.')
+            return
+        except ValueError as error:
+            print(f'Помилка формату файлу: {error}')
+            return
+        print(f"Збережено {args.convert}: {len(graph)} вершин, {graph.num_arcs} дуг")
+        return
+
+    if args.batch:
+        paths = expand_inputs(args.file)
+        try:
+            counts = run_batch(paths, args.batch, actions=args.actions.split(','),
+                               oriented=args.oriented, multigraph=args.multigraph,
+                               timeout=args.timeout, max_steps=args.max_steps,
+                               workers=args.workers, chunksize=args.chunksize,
+                               file_timeout=args.file_timeout)
+        except ValueError as error:
+            print(f'Помилка: {error}')
+            return
+        print(f"Оброблено файлів: {len(paths)}, успішно: {counts['ok']}, "
+              f"з помилкою: {counts['error']}. Результати: {args.batch}")
+        return
+
+    if args.isomorph_index:
+        index_graphs(args.file, args.isomorph_index, mode_str, args.multigraph)
+        return
 
     #Виконання
     if args.euler:
-        #Ейлеру потрібен кортеж (dict, set)
-        graph_dict = read_graph_from_csv_to_dict(args.file, mode_str)
-        graph_edges = read_graph_from_csv_to_set(args.file, mode_str)
+        from algorithms.euler_cycle import (
+            find_euler_cycle,
+            find_euler_path,
+            find_postman_tour,
+            write_euler_cycle,
+        )
 
-        if graph_dict is None or graph_edges is None:
+        #Ейлеру потрібен кортеж (dict, set) - Graph і є таким кортежем
+        graph = load_graph(args.file, mode_str, args.multigraph)
+        if graph is None:
             return #вихід бо помилка читання
 
-        graph_tuple = (graph_dict, graph_edges)
-
-        #oriented як bool, бо функція Ейлера чекає bool
-        result = find_euler_cycle(graph_tuple, oriented=args.oriented)
+        #oriented як bool, бо функція Ейлера чекає bool.
+        #Бінарний файл сам пам'ятає, чи граф орієнтований
+        oriented = getattr(graph, 'oriented', args.oriented)
+        if args.euler_mode == 'path':
+            result = solve(cache, 'euler_path', graph,
+                           lambda: find_euler_path(graph, oriented=oriented), oriented)
+            print(f"Ейлерів шлях: {result}")
+            return
+        if args.euler_mode == 'postman':
+            try:
+                result = solve(cache, 'postman', graph,
+                               lambda: find_postman_tour(graph, oriented=oriented), oriented)
+            except ValueError as error:
+                print(f"Помилка: {error}")
+                return
+            if result is None:
+                print("Маршрут листоноші: None (граф не зв'язний)")
+            else:
+                tour, extra = result
+                print(f"Маршрут листоноші: {tour}")
+                print(f"Повторені ребра ({len(extra)}): {extra}")
+            return
+        if args.output:
+            count = write_euler_cycle(graph, args.output, oriented=oriented,
+                                      binary=args.output.endswith('.bin'))
+            if count is None:
+                print("Ейлерів цикл: None")
+            else:
+                print(f"Ейлерів цикл записано у {args.output}: {count} вершин")
+            return
+        result = solve(cache, 'euler', graph,
+                       lambda: find_euler_cycle(graph, oriented=oriented), oriented)
         print(f"Ейлерів цикл: {result}")
 
     elif args.hamilton:
-        graph_dict = read_graph_from_csv_to_dict(args.file, mode_str)
-        if graph_dict is None:
+        from algorithms.gamilton import make_way
+
+        graph = load_graph(args.file, mode_str, args.multigraph)
+        if graph is None:
             return
-        result = make_way(graph_dict)
-        print(f"Гамільтонів цикл: {result}")
+        result = solve(cache, 'hamilton', graph,
+                       lambda: make_way(graph, method=args.method, budget=make_budget(args)),
+                       args.oriented, method=args.method)
+        if isinstance(result, SearchUnknown):
+            print_unknown(result)
+        else:
+            print(f"Гамільтонів цикл: {result}")
 
     elif args.bipartite:
-        # Приймає dict
-        graph_dict = read_graph_from_csv_to_dict(args.file, mode_str)
-        if graph_dict is None:
+        from algorithms.graph_painting import is_bipartite
+
+        # Приймає (dict, set) або CSRGraph
+        graph = load_graph(args.file, mode_str, args.multigraph)
+        if graph is None:
             return
 
-        result = is_bipartite(graph_dict)
-        print(f"Граф дводольний: {result}")
+        result = solve(cache, 'bipartite', graph,
+                       lambda: is_bipartite(graph, workers=args.workers or 1), args.oriented)
+        print(f"Граф дводольний: {bool(result)}")
+        if result:
+            print(f"Частини: {result.parts[0]} | {result.parts[1]}")
+        else:
+            print(f"Непарний цикл: {result.odd_cycle}")
 
     elif args.coloring:
-        # Приймає dict
-        graph_dict = read_graph_from_csv_to_dict(args.file, mode_str)
-        if graph_dict is None:
+        from algorithms.graph_painting import k_coloring, labeled_coloring, three_coloring
+
+        # Приймає (dict, set) або CSRGraph
+        graph = load_graph(args.file, mode_str, args.multigraph)
+        if graph is None:
             return
 
-        result = three_coloring(graph_dict)
-        print(f"Розфарбування: {result}")
+        if args.colors is None:
+            result = solve(cache, 'coloring', graph,
+                           lambda: three_coloring(graph, budget=make_budget(args),
+                                                  workers=args.workers or 1), args.oriented)
+        else:
+            #у кеш іде {мітка: колір}: номери вершин залежать від порядку рядків, а ключ - ні
+            result = solve(cache, 'k_coloring', graph,
+                           lambda: labeled_coloring(graph, k_coloring(
+                               graph, args.colors, budget=make_budget(args),
+                               workers=args.workers or 1)),
+                           args.oriented, colors=args.colors)
+        if isinstance(result, SearchUnknown):
+            print_unknown(result)
+        elif result is None:
+            print(f"Розфарбування в {args.colors} кольорів неможливе")
+        else:
+            print(f"Розфарбування: {result}")
+
+    elif args.chromatic:
+        from algorithms.graph_painting import chromatic_number, labeled_coloring
+
+        graph = load_graph(args.file, mode_str, args.multigraph)
+        if graph is None:
+            return
+
+        result = solve(cache, 'chromatic', graph,
+                       lambda: labeled_coloring(graph, chromatic_number(
+                           graph, budget=make_budget(args), workers=args.workers or 1)),
+                       args.oriented)
+        if isinstance(result, SearchUnknown):
+            lower, upper, _ = result.partial
+            print(f"Невідомо: пошук зупинено ({result.reason}), хроматичне число від {lower} до {upper}")
+        elif result is None:
+            print("Граф має петлю, його неможливо розфарбувати")
+        else:
+            number, colors = result
+            print(f"Хроматичне число: {number}")
+            print(f"Розфарбування: {colors}")
 
     elif args.isomorph:
+        from algorithms.isomorphism import find_isomorphism
+        from algorithms.result_cache import graph_digest
+
         #потребує двох файлів
         if not args.file2:
             print("Помилка: Для ізоморфізму вкажіть другий файл через --file2")
             return
 
-        graph1 = read_graph_from_csv_to_dict(args.file, mode_str)
-        graph2 = read_graph_from_csv_to_dict(args.file2, mode_str)
+        graph1 = load_graph(args.file, mode_str, args.multigraph)
+        graph2 = load_graph(args.file2, mode_str, args.multigraph)
 
         if graph1 is None or graph2 is None:
             return
 
-        result = are_isomorphic(graph1, graph2)
-        print(f"Графи ізоморфні: {result}")
+        #другий граф входить у ключ кешу своїм хешем
+        other = None if cache is None else graph_digest(graph2)
+        result = solve(cache, 'isomorphism', graph1,
+                       lambda: find_isomorphism(graph1, graph2, budget=make_budget(args)),
+                       args.oriented, other=other)
+        if isinstance(result, SearchUnknown):
+            print_unknown(result)
+        else:
+            print(f"Графи ізоморфні: {result is not None}")
+            if result is not None:
+                print(f"Відповідність вершин: {result}")
 
     elif args.show:
-        graph_dict = read_graph_from_csv_to_dict(args.file, mode_str)
-        if graph_dict is None:
+        graph = load_graph(args.file, mode_str, args.multigraph)
+        if graph is None:
             return
+        graph_dict = graph.to_dict() if isinstance(graph, CSRGraph) else graph.connections
         print(f"Зчитаний граф: {graph_dict}")
 
 if __name__ == "__main__":
@@ -0,0 +1,47 @@
+'''
+Локальний HTTP/JSON сервіс алгоритмів: python server.py --port 8000
+
+Графи завантажуються один раз (POST /graphs), а завдання (POST /jobs)
+виконуються в пулі процесів, тож довгий пошук не блокує інших клієнтів.
+'''
+import argparse
+import asyncio
+import contextlib
+
+from algorithms.service import DEFAULT_MAX_JOBS, SolverService, serve
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сервіс алгоритмів на графах (HTTP/JSON).',
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Адреса, яку слухати')
+    parser.add_argument('--port', type=int, default=8000, help='Порт, який слухати')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Кількість процесів для завдань (за замовчуванням - усі ядра)')
+    parser.add_argument('--max-jobs', type=int, default=DEFAULT_MAX_JOBS,
+                        help='Скільки завдань може чекати й виконуватися одночасно;\n'
+                             'нові понад це отримують 503')
+    parser.add_argument('--graphs-dir', type=str, metavar='DIR', default=None,
+                        help='Де зберігати завантажені графи (за замовчуванням - тимчасова директорія)')
+    parser.add_argument('--cache', type=str, metavar='DIR', default=None,
+                        help='Кеш результатів у DIR (спільний з main.py --cache)')
+    parser.add_argument('--cache-size', type=float, default=256,
+                        help='Найбільший розмір кешу на диску в МБ')
+    args = parser.parse_args()
+
+    cache = contextlib.nullcontext()
+    if args.cache:
+        from algorithms.result_cache import ResultCache
+        cache = ResultCache(args.cache, max_bytes=int(args.cache_size * 2 ** 20))
+
+    with cache as results:
+        service = SolverService(args.graphs_dir, args.workers, args.max_jobs, cache=results)
+        print(f'Сервіс слухає http://{args.host}:{args.port} ({service.workers} процесів)')
+        try:
+            asyncio.run(serve(service, args.host, args.port))
+        except KeyboardInterrupt:
+            print('Сервіс зупинено.')
+
+
+if __name__ == '__main__':
+    main()
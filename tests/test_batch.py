@@ -0,0 +1,84 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from algorithms import batch
+
+# the patched _run_file reaches the workers only if they are forked from this process
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                                reason='the workers must inherit the patched module')
+
+_run_file = batch._run_file
+
+
+def crashing_run_file(task):
+    '''
+    Kills its worker on crash.csv, as the system would kill it for
+    memory, while the other workers still run their files.
+    '''
+    if os.path.basename(task[0]) == 'crash.csv':
+        time.sleep(0.1)
+        os._exit(1)
+    time.sleep(0.3)
+    return _run_file(task)
+
+
+def slow_run_file(task):
+    '''Never finishes slow.csv.'''
+    if os.path.basename(task[0]) == 'slow.csv':
+        time.sleep(60)
+    return _run_file(task)
+
+
+def make_files(directory, special):
+    '''Seven triangle files, the fourth of them named special.'''
+    names = [f'{i}.csv' for i in range(6)]
+    names.insert(3, special)
+    paths = []
+    for name in names:
+        path = directory / name
+        path.write_text('A,B\nB,C\nC,A\n')
+        paths.append(str(path))
+    return paths
+
+
+def read_records(output):
+    with open(output, encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+
+@pytest.mark.parametrize('file_timeout, chunksize', [(None, 2), (None, 1), (30.0, 1)])
+def test_dead_worker_fails_only_its_file(tmp_path, monkeypatch, file_timeout, chunksize):
+    monkeypatch.setattr(batch, '_run_file', crashing_run_file)
+    paths = make_files(tmp_path, 'crash.csv')
+    output = tmp_path / 'results.jsonl'
+
+    counts = batch.run_batch(paths, output, actions=('euler',), workers=3,
+                             chunksize=chunksize, file_timeout=file_timeout)
+
+    assert counts == {'ok': 6, 'error': 1}
+    records = read_records(output)
+    assert [record['file'] for record in records] == paths
+    assert [record['status'] for record in records] == ['ok'] * 3 + ['error'] + ['ok'] * 3
+    assert not multiprocessing.active_children()
+
+
+def test_file_over_its_time_is_killed(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, '_run_file', slow_run_file)
+    paths = make_files(tmp_path, 'slow.csv')
+    output = tmp_path / 'results.jsonl'
+
+    started = time.monotonic()
+    counts = batch.run_batch(paths, output, actions=('euler',), workers=2, file_timeout=1.0)
+
+    assert time.monotonic() - started < 30
+    assert counts == {'ok': 6, 'error': 1}
+    assert read_records(output)[3]['error'].startswith('Перевищено час на файл')
+    assert not multiprocessing.active_children()
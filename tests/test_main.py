@@ -0,0 +1,157 @@
+import ast
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import main
+
+TRIANGLE_WITH_TAIL = 'A,B\nB,C\nC,A\nC,D\n'
+# the same edges, so the same cache key, but other node ids
+REORDERED = 'C,D\nC,A\nB,C\nA,B\n'
+EDGES = [('A', 'B'), ('B', 'C'), ('C', 'A'), ('C', 'D')]
+
+
+def run_main(monkeypatch, capsys, *argv):
+    '''Output of main.py with command line arguments argv.'''
+    monkeypatch.setattr(sys, 'argv', ['main.py', *map(str, argv)])
+    main.main()
+    return capsys.readouterr().out
+
+
+def coloring_of(output):
+    '''The dict after "Розфарбування: " in the output.'''
+    line = next(line for line in output.splitlines() if line.startswith('Розфарбування: '))
+    return ast.literal_eval(line.removeprefix('Розфарбування: '))
+
+
+def assert_proper(colors):
+    assert set(colors) == {'A', 'B', 'C', 'D'}
+    for node1, node2 in EDGES:
+        assert colors[node1] != colors[node2], (node1, node2, colors)
+
+
+def test_cached_coloring_of_reordered_file(tmp_path, monkeypatch, capsys):
+    first, second = tmp_path / 'a.csv', tmp_path / 'b.csv'
+    first.write_text(TRIANGLE_WITH_TAIL)
+    second.write_text(REORDERED)
+    cache = tmp_path / 'cache'
+
+    for action in (['--coloring', '--colors', 3], ['--chromatic']):
+        assert_proper(coloring_of(run_main(monkeypatch, capsys, first, *action, '--cache', cache)))
+        # the second file is answered from the cache
+        assert_proper(coloring_of(run_main(monkeypatch, capsys, second, *action, '--cache', cache)))
+
+
+def count_calls(monkeypatch, module, name):
+    '''Replaces module.name by a wrapper; returns the list that gets one item per call.'''
+    calls = []
+    function = getattr(module, name)
+
+    def counted(*args, **kwargs):
+        calls.append(1)
+        return function(*args, **kwargs)
+    monkeypatch.setattr(module, name, counted)
+    return calls
+
+
+def test_cache_answers_a_second_run(tmp_path, monkeypatch, capsys):
+    from algorithms import euler_cycle
+
+    graph = tmp_path / 'triangle.csv'
+    graph.write_text('A,B\nB,C\nC,A\n')
+    calls = count_calls(monkeypatch, euler_cycle, 'find_euler_cycle')
+
+    first = run_main(monkeypatch, capsys, graph, '--euler', '--cache', tmp_path / 'cache')
+    second = run_main(monkeypatch, capsys, graph, '--euler', '--cache', tmp_path / 'cache')
+    assert first == second
+    assert first.startswith('Ейлерів цикл: [')
+    assert len(calls) == 1
+
+
+def test_cache_size_keeps_too_large_results_off_disk(tmp_path, monkeypatch, capsys):
+    from algorithms import euler_cycle
+
+    graph = tmp_path / 'triangle.csv'
+    graph.write_text('A,B\nB,C\nC,A\n')
+    calls = count_calls(monkeypatch, euler_cycle, 'find_euler_cycle')
+
+    for _ in range(2):
+        run_main(monkeypatch, capsys, graph, '--euler',
+                 '--cache', tmp_path / 'cache', '--cache-size', 1e-6)
+    assert len(calls) == 2
+
+
+def test_batch_writes_one_record_per_file(tmp_path, monkeypatch, capsys):
+    (tmp_path / 'a.csv').write_text(TRIANGLE_WITH_TAIL)
+    (tmp_path / 'broken.csv').write_text('A,B,C\n')
+    output = tmp_path / 'results.jsonl'
+
+    out = run_main(monkeypatch, capsys, tmp_path, '--batch', output,
+                   '--actions', 'euler,chromatic', '--workers', 1)
+
+    assert 'Оброблено файлів: 2, успішно: 1, з помилкою: 1' in out
+    records = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+    assert [record['status'] for record in records] == ['ok', 'error']
+    number, colors = records[0]['results']['chromatic']['result']
+    assert number == 3
+    assert_proper(colors)
+
+
+def test_convert_keeps_the_graph(tmp_path, monkeypatch, capsys):
+    graph, binary = tmp_path / 'a.csv', tmp_path / 'a.bin'
+    graph.write_text(TRIANGLE_WITH_TAIL)
+
+    assert run_main(monkeypatch, capsys, graph, '--convert', binary).startswith('Збережено')
+    csv_colors = coloring_of(run_main(monkeypatch, capsys, graph, '--chromatic'))
+    binary_colors = coloring_of(run_main(monkeypatch, capsys, binary, '--chromatic'))
+    assert csv_colors == binary_colors
+    assert_proper(binary_colors)
+
+
+def test_euler_modes(tmp_path, monkeypatch, capsys):
+    graph = tmp_path / 'path.csv'
+    graph.write_text('A,B\nB,C\nC,D\n')
+
+    out = run_main(monkeypatch, capsys, graph, '--euler', '--euler-mode', 'cycle')
+    assert out == 'Ейлерів цикл: None\n'
+    out = run_main(monkeypatch, capsys, graph, '--euler', '--euler-mode', 'path')
+    assert out in ("Ейлерів шлях: ['A', 'B', 'C', 'D']\n", "Ейлерів шлях: ['D', 'C', 'B', 'A']\n")
+    out = run_main(monkeypatch, capsys, graph, '--euler', '--euler-mode', 'postman')
+    assert 'Повторені ребра (3)' in out
+
+
+def test_chromatic(tmp_path, monkeypatch, capsys):
+    graph = tmp_path / 'a.csv'
+    graph.write_text(TRIANGLE_WITH_TAIL)
+
+    out = run_main(monkeypatch, capsys, graph, '--chromatic')
+    assert out.startswith('Хроматичне число: 3\n')
+    assert_proper(coloring_of(out))
+
+
+def test_profile_writes_json(tmp_path, monkeypatch, capsys):
+    graph, profile = tmp_path / 'a.csv', tmp_path / 'profile.json'
+    graph.write_text(TRIANGLE_WITH_TAIL)
+
+    out = run_main(monkeypatch, capsys, graph, '--chromatic', '--profile', profile)
+    assert 'Профіль: усього' in out
+    data = json.loads(profile.read_text(encoding='utf-8'))
+    assert data['total'] > 0
+    assert 'load' in data['phases']
+
+
+def test_isomorph_index_finds_a_reordered_copy(tmp_path, monkeypatch, capsys):
+    graphs = tmp_path / 'graphs'
+    graphs.mkdir()
+    (graphs / 'a.csv').write_text(TRIANGLE_WITH_TAIL)
+    (graphs / 'b.csv').write_text(REORDERED)
+    index = tmp_path / 'index'
+
+    out = run_main(monkeypatch, capsys, graphs, '--isomorph-index', index)
+    assert 'b.csv: ізоморфний' in out
+    assert 'Нових графів: 1, дублікатів: 1, усього в індексі: 1' in out
+    # a graph that is already in the index is reported as a duplicate
+    out = run_main(monkeypatch, capsys, graphs / 'a.csv', '--isomorph-index', index)
+    assert 'Нових графів: 0, дублікатів: 1' in out
@@ -0,0 +1,125 @@
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from algorithms.service import SolverService, request
+
+TRIANGLE = 'A,B\nB,C\nC,A'
+
+
+def hard_graph(nodes=600, degree=4.7, seed=2):
+    '''Edges of a random graph that three_coloring does not finish for many seconds.'''
+    rng = random.Random(seed)
+    edges = set()
+    while len(edges) < int(nodes * degree / 2):
+        node1, node2 = rng.sample(range(nodes), 2)
+        edges.add((min(node1, node2), max(node1, node2)))
+    return '\n'.join(f'{node1},{node2}' for node1, node2 in edges)
+
+
+@pytest.fixture
+def service():
+    '''(service, url) of a service with one worker running in a background loop.'''
+    solver = SolverService(workers=1, max_jobs=3)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(solver.start('127.0.0.1', 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield solver, 'http://127.0.0.1:%d' % server.sockets[0].getsockname()[1]
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    solver.close()
+
+
+def upload(url, edges):
+    status, graph = request(url + '/graphs', 'POST', {'edges': edges})
+    assert status == 201
+    return graph['id']
+
+
+def submit(url, graph_id, action):
+    status, job = request(url + '/jobs', 'POST', {'graph': graph_id, 'action': action})
+    assert status == 202, job
+    return job['id']
+
+
+def result(url, job_id):
+    status, job = request(url + f'/jobs/{job_id}/result?wait=60')
+    assert status == 200, job
+    return job
+
+
+def wait_running(url, job_id):
+    deadline = time.monotonic() + 30
+    while request(url + f'/jobs/{job_id}')[1]['status'] != 'running':
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def kill_workers():
+    for process in multiprocessing.active_children():
+        os.kill(process.pid, signal.SIGKILL)
+
+
+def test_running_job_of_a_killed_worker_fails_and_the_next_one_runs(service):
+    _, url = service
+    hard = submit(url, upload(url, hard_graph()), 'coloring')
+    wait_running(url, hard)
+    kill_workers()
+
+    assert result(url, hard)['status'] == 'error'
+    job = result(url, submit(url, upload(url, TRIANGLE), 'euler'))
+    assert job['status'] == 'done'
+
+
+def test_idle_worker_killed_between_jobs(service):
+    _, url = service
+    triangle = upload(url, TRIANGLE)
+    assert result(url, submit(url, triangle, 'euler'))['status'] == 'done'
+    kill_workers()
+    time.sleep(0.5)     # the pool notices the dead worker on its own
+
+    assert result(url, submit(url, triangle, 'bipartite'))['status'] == 'done'
+
+
+def test_cancel_running_and_queued_jobs(service):
+    _, url = service
+    hard = upload(url, hard_graph())
+    running = submit(url, hard, 'coloring')
+    wait_running(url, running)
+    # the pool already holds one more job than it has workers
+    preloaded = submit(url, hard, 'coloring')
+    queued = submit(url, hard, 'coloring')
+
+    status, job = request(url + f'/jobs/{queued}', 'DELETE')
+    assert (status, job['status']) == (200, 'cancelled')
+    for job_id in (running, preloaded):
+        request(url + f'/jobs/{job_id}', 'DELETE')
+        job = result(url, job_id)
+        assert job['status'] == 'cancelled'
+        assert (job['result']['status'], job['result']['reason']) == ('unknown', 'cancelled')
+
+
+def test_jobs_over_max_jobs_are_refused(service):
+    solver, url = service
+    hard = upload(url, hard_graph())
+    jobs = [submit(url, hard, 'coloring') for _ in range(solver.max_jobs)]
+
+    status, answer = request(url + '/jobs', 'POST', {'graph': hard, 'action': 'coloring'})
+    assert status == 503, answer
+    for job_id in jobs:
+        request(url + f'/jobs/{job_id}', 'DELETE')
+    for job_id in jobs:
+        assert result(url, job_id)['status'] == 'cancelled'
+    # the slots are free again
+    assert result(url, submit(url, upload(url, TRIANGLE), 'euler'))['status'] == 'done'